@@ -1,13 +1,13 @@
 # must be built with scons
 from .messaging_pyx import Context, Poller, SubSocket, PubSocket, SocketEventHandle, toggle_fake_events, \
-                                set_fake_prefix, get_fake_prefix, delete_fake_prefix, wait_for_one_event
+                                set_fake_prefix, get_fake_prefix, delete_fake_prefix, wait_for_one_event, drain_socks_raw
 from .messaging_pyx import MultiplePublishersError, MessagingError
 
 import os
 import capnp
 import time
 
-from typing import Optional, List, Union, Dict, Deque
+from typing import Optional, List, Tuple, Union, Dict, Deque
 from collections import deque
 
 from cereal import log
@@ -20,9 +20,11 @@ assert set_fake_prefix
 assert get_fake_prefix
 assert delete_fake_prefix
 assert wait_for_one_event
+assert drain_socks_raw
 
 NO_TRAVERSAL_LIMIT = 2**64-1
 AVG_FREQ_HISTORY = 100
+LATENCY_TRACE = bool(int(os.getenv("LATENCY_TRACE", "0")))
 
 context = Context()
 
@@ -53,6 +55,46 @@ def new_message(service: Optional[str] = None, size: Optional[int] = None) -> ca
   return dat
 
 
+class LatencyTracer:
+  """Stamps the messages a process publishes with the inputs of the processing step that produced them.
+
+  A step starts with the first message received after the previous send. Its inputs are added
+  by SubMaster.update_msgs and the drain functions, and PubMaster.send writes it into the
+  latencyTrace of every message it sends, builders and serialized messages alike. Only used
+  with LATENCY_TRACE=1, see selfdrive/debug/latency_trace.py for the analysis.
+  """
+  def __init__(self):
+    self.start_time = 0
+    self.inputs: List[Tuple[str, int, int]] = []
+    self.sent = False
+
+  def add(self, service: str, log_mono_time: int, rcv_time: int) -> None:
+    if self.sent:
+      self.inputs = []
+      self.sent = False
+    if not self.inputs:
+      self.start_time = rcv_time
+    self.inputs.append((service, log_mono_time, rcv_time))
+
+  def add_msgs(self, msgs: List[capnp.lib.capnp._DynamicStructReader]) -> None:
+    rcv_time = int(time.monotonic() * 1e9)
+    for msg in msgs:
+      self.add(msg.which(), msg.logMonoTime, rcv_time)
+
+  def stamp(self, dat: capnp.lib.capnp._DynamicStructBuilder) -> None:
+    trace = dat.latencyTrace
+    trace.sendMonoTime = int(time.monotonic() * 1e9)
+    trace.startMonoTime = self.start_time
+    for inp, (service, log_mono_time, rcv_time) in zip(trace.init('inputs', len(self.inputs)), self.inputs):
+      inp.service = service
+      inp.logMonoTime = log_mono_time
+      inp.rcvMonoTime = rcv_time
+    self.sent = True
+
+
+tracer = LatencyTracer()
+
+
 def pub_sock(endpoint: str) -> PubSocket:
   sock = PubSocket()
   sock.connect(context, endpoint)
@@ -74,37 +116,26 @@ def sub_sock(endpoint: str, poller: Optional[Poller] = None, addr: str = "127.0.
 
 def drain_sock_raw(sock: SubSocket, wait_for_one: bool = False) -> List[bytes]:
   """Receive all message currently available on the queue"""
-  ret: List[bytes] = []
-  while 1:
-    if wait_for_one and len(ret) == 0:
-      dat = sock.receive()
-    else:
-      dat = sock.receive(non_blocking=True)
-
-    if dat is None:
-      break
-
-    ret.append(dat)
-
-  return ret
+  dats = sock.receive_all(wait_for_one)
+  if LATENCY_TRACE:
+    tracer.add_msgs([log_from_bytes(dat) for dat in dats])
+  return dats
 
 
 def drain_sock(sock: SubSocket, wait_for_one: bool = False) -> List[capnp.lib.capnp._DynamicStructReader]:
   """Receive all message currently available on the queue"""
-  ret: List[capnp.lib.capnp._DynamicStructReader] = []
-  while 1:
-    if wait_for_one and len(ret) == 0:
-      dat = sock.receive()
-    else:
-      dat = sock.receive(non_blocking=True)
-
-    if dat is None:  # Timeout hit
-      break
+  msgs = [log_from_bytes(dat) for dat in sock.receive_all(wait_for_one)]
+  if LATENCY_TRACE:
+    tracer.add_msgs(msgs)
+  return msgs
 
-    dat = log_from_bytes(dat)
-    ret.append(dat)
 
-  return ret
+def drain_socks(socks: List[SubSocket]) -> List[capnp.lib.capnp._DynamicStructReader]:
+  """Receive all messages currently available on the queues of all sockets"""
+  msgs = [log_from_bytes(dat) for dat in drain_socks_raw(socks)]
+  if LATENCY_TRACE:
+    tracer.add_msgs(msgs)
+  return msgs
 
 
 # TODO: print when we drop packets?
@@ -191,6 +222,8 @@ class SubMaster:
       self.logMonoTime[s] = 0
       self.valid[s] = data.valid
 
+    self.non_polled_socks = [self.sock[s] for s in self.non_polled_services if s in self.sock]
+
   def __getitem__(self, s: str) -> capnp.lib.capnp._DynamicStructReader:
     return self.data[s]
 
@@ -199,14 +232,13 @@ class SubMaster:
             and (s not in self.ignore_average_freq)
 
   def update(self, timeout: int = 1000) -> None:
-    msgs = []
-    for sock in self.poller.poll(timeout):
-      msgs.append(recv_one_or_none(sock))
+    # the sockets are conflated, so this is the latest message of every ready socket
+    msgs = self.poller.poll_drain(timeout)
 
     # non-blocking receive for non-polled sockets
-    for s in self.non_polled_services:
-      msgs.append(recv_one_or_none(self.sock[s]))
-    self.update_msgs(time.monotonic(), msgs)
+    if self.non_polled_socks:
+      msgs += drain_socks_raw(self.non_polled_socks)
+    self.update_msgs(time.monotonic(), [log_from_bytes(dat) for dat in msgs])
 
   def update_msgs(self, cur_time: float, msgs: List[capnp.lib.capnp._DynamicStructReader]) -> None:
     self.frame += 1
@@ -217,6 +249,8 @@ class SubMaster:
 
       s = msg.which()
       self.updated[s] = True
+      if LATENCY_TRACE:
+        tracer.add(s, msg.logMonoTime, int(cur_time * 1e9))
 
       if self._check_avg_freq(s):
         self.recv_dts[s].append(cur_time - self.rcv_time[s])
@@ -276,6 +310,81 @@ class SubMaster:
            and self.all_valid(service_list=service_list)
 
 
+class SlotSubMaster(SubMaster):
+  """SubMaster with the per update bookkeeping done in slots prepared at construction.
+
+  Only the services updated in the previous call are reset, the recv_dts averages are
+  running sums and freq_ok is only evaluated for services that received a message, since
+  it can't change otherwise. The alive thresholds are computed once, leaving one comparison
+  per service and update. The dicts are updated in place and hold the same values as SubMaster's.
+  """
+  def __init__(self, services: List[str], poll: Optional[List[str]] = None,
+               ignore_alive: Optional[List[str]] = None, ignore_avg_freq: Optional[List[str]] = None,
+               addr: str = "127.0.0.1"):
+    super().__init__(services, poll, ignore_alive, ignore_avg_freq, addr)
+    self.prev_updated: List[str] = []
+    self.check_avg_freq = {s: self.freq[s] > 1e-5 and (s not in self.non_polled_services) and (s not in self.ignore_average_freq)
+                           for s in self.data}
+    self.expected_dt = {s: 1 / (self.freq[s] * 0.90) for s in self.data if self.check_avg_freq[s]}
+    self.recv_dts_sum = {s: 0. for s in self.data}
+    self.recv_dts_count = {s: 0 for s in self.data}
+    # (service, alive threshold) of the services with a frequency, the others are always alive
+    self.alive_slots = [(s, 10. / self.freq[s]) for s in self.data if self.freq[s] > 1e-5]
+    self.first_update = True
+
+  def update_msgs(self, cur_time: float, msgs: List[capnp.lib.capnp._DynamicStructReader]) -> None:
+    self.frame += 1
+    updated, rcv_time = self.updated, self.rcv_time
+    for s in self.prev_updated:
+      updated[s] = False
+    self.prev_updated = prev_updated = []
+
+    if self.first_update and not self.simulation:
+      self.first_update = False
+      for s in self.data:
+        self.freq_ok[s] = True
+        self.alive[s] = True
+
+    for msg in msgs:
+      if msg is None:
+        continue
+
+      s = msg.which()
+      updated[s] = True
+      prev_updated.append(s)
+      if LATENCY_TRACE:
+        tracer.add(s, msg.logMonoTime, int(cur_time * 1e9))
+
+      check_avg_freq = self.check_avg_freq[s]
+      if check_avg_freq and rcv_time[s] > 1e-5:
+        dts = self.recv_dts[s]
+        dt = cur_time - rcv_time[s]
+        if len(dts) == dts.maxlen:
+          self.recv_dts_sum[s] -= dts[0]
+        dts.append(dt)
+        # summed again once per history length, so the running sum doesn't drift
+        self.recv_dts_count[s] += 1
+        self.recv_dts_sum[s] = self.recv_dts_sum[s] + dt if self.recv_dts_count[s] % AVG_FREQ_HISTORY else sum(dts)
+
+      rcv_time[s] = cur_time
+      self.rcv_frame[s] = self.frame
+      self.data[s] = getattr(msg, s)
+      self.logMonoTime[s] = msg.logMonoTime
+      self.valid[s] = msg.valid
+
+      if self.simulation:
+        self.freq_ok[s] = True
+        self.alive[s] = True
+      elif check_avg_freq and cur_time > 1e-5:
+        dts = self.recv_dts[s]
+        self.freq_ok[s] = len(dts) > 0 and self.recv_dts_sum[s] / len(dts) < self.expected_dt[s]
+
+    if not self.simulation:
+      alive = self.alive
+      for s, alive_dt in self.alive_slots:
+        alive[s] = (cur_time - rcv_time[s]) < alive_dt
+
+
 class PubMaster:
   def __init__(self, services: List[str]):
     self.sock = {}
@@ -283,6 +392,11 @@ class PubMaster:
       self.sock[s] = pub_sock(s)
 
   def send(self, s: str, dat: Union[bytes, capnp.lib.capnp._DynamicStructBuilder]) -> None:
+    if LATENCY_TRACE:
+      if isinstance(dat, bytes):
+        # serialized messages, like sendcan from can_list_to_can_capnp, are copied to be stamped
+        dat = log_from_bytes(dat).as_builder()
+      tracer.stamp(dat)
     if not isinstance(dat, bytes):
       dat = dat.to_bytes()
     self.sock[s].send(dat)
@@ -45,6 +45,24 @@ def delete_fake_prefix():
   cppSocketEventHandle.set_fake_prefix(b"")
 
 
+cdef void receive_all(cppSubSocket * socket, vector[cppMessage*] &msgs) nogil:
+  cdef cppMessage * msg
+  while True:
+    msg = socket.receive(True)
+    if msg == NULL:
+      break
+    msgs.push_back(msg)
+
+
+cdef list to_bytes(vector[cppMessage*] &msgs):
+  cdef cppMessage * msg
+  ret = []
+  for msg in msgs:
+    ret.append(msg.getData()[:msg.getSize()])
+    del msg
+  return ret
+
+
 def wait_for_one_event(list events, int timeout=-1):
   cdef vector[cppEvent] items
   for event in events:
@@ -160,6 +178,20 @@ cdef class Poller:
 
     return sockets
 
+  def poll_drain(self, timeout):
+    """Polls and receives all messages available on the ready sockets, in one call without the GIL"""
+    cdef int t = timeout
+    cdef vector[cppSubSocket*] result
+    cdef vector[cppMessage*] msgs
+    cdef size_t i
+
+    with nogil:
+      result = self.poller.poll(t)
+      for i in range(result.size()):
+        receive_all(result[i], msgs)
+
+    return to_bytes(msgs)
+
 
 cdef class SubSocket:
   cdef cppSubSocket * socket
@@ -212,6 +244,41 @@ cdef class SubSocket:
 
       return m
 
+  def receive_all(self, bool wait_for_one=False):
+    """All messages currently available, optionally blocking for the first one"""
+    cdef vector[cppMessage*] msgs
+    cdef cppMessage * msg
+
+    with nogil:
+      if wait_for_one:
+        msg = self.socket.receive(False)
+        if msg != NULL:
+          msgs.push_back(msg)
+
+    if wait_for_one and msgs.empty():
+      if errno.errno == errno.EINTR:
+        print("SIGINT received, exiting")
+        sys.exit(1)
+      return []
+
+    with nogil:
+      receive_all(self.socket, msgs)
+    return to_bytes(msgs)
+
+
+def drain_socks_raw(list sockets):
+  """All messages currently available on the sockets, received in one call without the GIL"""
+  cdef vector[cppSubSocket*] socks
+  cdef vector[cppMessage*] msgs
+  cdef size_t i
+  for sock in sockets:
+    socks.push_back((<SubSocket>sock).socket)
+
+  with nogil:
+    for i in range(socks.size()):
+      receive_all(socks[i], msgs)
+  return to_bytes(msgs)
+
 
 cdef class PubSocket:
   cdef cppPubSocket * socket
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+import argparse
+import random
+import time
+
+import capnp
+import cereal.messaging as messaging
+from cereal.services import SERVICE_LIST
+
+# controlsd's subscriptions
+SERVICES = ['deviceState', 'pandaStates', 'peripheralState', 'modelV2', 'liveCalibration', 'driverMonitoringState',
+            'longitudinalPlan', 'lateralPlan', 'liveLocationKalman', 'managerState', 'liveParameters', 'radarState',
+            'liveTorqueParameters', 'testJoystick', 'liveENaviData', 'liveMapData', 'roadCameraState', 'driverCameraState',
+            'wideRoadCameraState', 'accelerometer', 'gyroscope']
+IGNORE_ALIVE = ['accelerometer', 'gyroscope', 'testJoystick']
+IGNORE_AVG_FREQ = ['radarState', 'testJoystick', 'liveENaviData', 'liveMapData']
+RATE = 100.
+
+
+def message_schedule(n, seed=0):
+  """Messages received each controlsd frame, at every service's rate with some jitter, drops and a lost service"""
+  rng = random.Random(seed)
+  msgs = {}
+  for s in SERVICES:
+    try:
+      msgs[s] = messaging.new_message(s)
+    except capnp.lib.capnp.KjException:  # pylint: disable=c-extension-no-member
+      msgs[s] = messaging.new_message(s, 0)  # lists
+
+  schedule = []
+  for frame in range(n):
+    t = frame / RATE + rng.uniform(0, 1e-3)
+    frame_msgs = []
+    for s in SERVICES:
+      freq = SERVICE_LIST[s].frequency
+      if freq < 1e-5 or int(frame * freq / RATE) == int((frame - 1) * freq / RATE):
+        continue
+      # modelV2 lags for a second every 20 seconds
+      if s == 'modelV2' and frame % 2000 > 1900:
+        continue
+      if rng.random() < 0.02:
+        continue
+      frame_msgs.append(msgs[s])
+    schedule.append((t, frame_msgs))
+  return schedule
+
+
+def check_same(a, b):
+  for attr in ('frame', 'updated', 'rcv_time', 'rcv_frame', 'alive', 'freq_ok', 'valid', 'logMonoTime'):
+    assert getattr(a, attr) == getattr(b, attr), attr
+  assert a.all_checks() == b.all_checks()
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Per-frame CPU of SubMaster.update_msgs at controlsd's services and rate")
+  parser.add_argument("-n", type=int, default=10000, help="frames")
+  args = parser.parse_args()
+
+  schedule = message_schedule(args.n)
+  kwargs = dict(ignore_alive=IGNORE_ALIVE, ignore_avg_freq=IGNORE_AVG_FREQ, addr=None)
+
+  sm, slot_sm = messaging.SubMaster(SERVICES, **kwargs), messaging.SlotSubMaster(SERVICES, **kwargs)
+  for t, msgs in schedule:
+    sm.update_msgs(t, msgs)
+    slot_sm.update_msgs(t, msgs)
+    check_same(sm, slot_sm)
+
+  for cls in (messaging.SubMaster, messaging.SlotSubMaster):
+    sm = cls(SERVICES, **kwargs)
+    t0 = time.process_time()
+    for t, msgs in schedule:
+      sm.update_msgs(t, msgs)
+    dt = (time.process_time() - t0) / args.n
+    print(f"{cls.__name__:>13}: {dt*1e6:6.1f} us/frame")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+import unittest
+from unittest import mock
+
+import cereal.messaging as messaging
+from openpilot.selfdrive.boardd.boardd import can_list_to_can_capnp
+
+
+def inputs(dat):
+  return [(i.service, i.logMonoTime, i.rcvMonoTime) for i in dat.latencyTrace.inputs]
+
+
+class TestLatencyTracer(unittest.TestCase):
+  def setUp(self):
+    self.tracer = messaging.LatencyTracer()
+
+  def test_step(self):
+    self.tracer.add('can', 100, 1000)
+    self.tracer.add('carState', 200, 1500)
+
+    # every message sent in a step carries all of its inputs
+    for s in ('carState', 'controlsState'):
+      dat = messaging.new_message(s)
+      self.tracer.stamp(dat)
+      self.assertEqual(inputs(dat), [('can', 100, 1000), ('carState', 200, 1500)])
+      self.assertEqual(dat.latencyTrace.startMonoTime, 1000)
+      self.assertGreater(dat.latencyTrace.sendMonoTime, 0)
+
+    # the first input after a send starts the next step
+    self.tracer.add('can', 300, 2000)
+    dat = messaging.new_message('sendcan', 1)
+    self.tracer.stamp(dat)
+    self.assertEqual(inputs(dat), [('can', 300, 2000)])
+    self.assertEqual(dat.latencyTrace.startMonoTime, 2000)
+
+  def test_add_msgs(self):
+    msgs = []
+    for log_mono_time, s in ((10, 'pandaStates'), (20, 'carState')):
+      msg = messaging.new_message(s, 1) if s == 'pandaStates' else messaging.new_message(s)
+      msg.logMonoTime = log_mono_time
+      msgs.append(messaging.log_from_bytes(msg.to_bytes()))
+    self.tracer.add_msgs(msgs)
+
+    dat = messaging.new_message('carControl')
+    self.tracer.stamp(dat)
+    (s0, t0, rcv0), (s1, t1, rcv1) = inputs(dat)
+    self.assertEqual((s0, t0, s1, t1), ('pandaStates', 10, 'carState', 20))
+    self.assertEqual(rcv0, rcv1)
+    self.assertEqual(dat.latencyTrace.startMonoTime, rcv0)
+
+  def test_pub_master_stamps(self):
+    can_sends = [[0x340, 0, b"\x01\x02", 0], [0x341, 0, b"\x03", 1]]
+    for trace in (False, True):
+      tracer = messaging.LatencyTracer()
+      with mock.patch.object(messaging, 'LATENCY_TRACE', trace), mock.patch.object(messaging, 'tracer', tracer):
+        pm = messaging.PubMaster([])
+        pm.sock = {'sendcan': mock.Mock(), 'carState': mock.Mock()}
+        tracer.add('can', 100, 1000)
+
+        # builders and serialized messages, like controlsd's sendcan
+        raw = can_list_to_can_capnp(can_sends, msgtype='sendcan')
+        pm.send('sendcan', raw)
+        pm.send('carState', messaging.new_message('carState'))
+
+        sent_raw = pm.sock['sendcan'].send.call_args[0][0]
+        sendcan = messaging.log_from_bytes(sent_raw)
+        carstate = messaging.log_from_bytes(pm.sock['carState'].send.call_args[0][0])
+        self.assertEqual([(c.address, c.dat, c.src) for c in sendcan.sendcan], [tuple(c[i] for i in (0, 2, 3)) for c in can_sends])
+        if trace:
+          self.assertEqual(inputs(sendcan), [('can', 100, 1000)])
+          self.assertEqual(inputs(carstate), [('can', 100, 1000)])
+        else:
+          self.assertEqual(sent_raw, raw)
+          self.assertEqual(sendcan.latencyTrace.sendMonoTime, 0)
+          self.assertEqual(carstate.latencyTrace.sendMonoTime, 0)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -102,6 +102,9 @@ services: dict[str, tuple] = {
   # opkr
   "liveENaviData": (False, 0.),
   "liveMapData": (False, 0.),
+
+  # debug, after the opkr services to keep their ports
+  "controlsStageTimings": (True, 1.),
 }
 SERVICE_LIST = {name: Service(new_port(idx), *vals) for
                 idx, (name, vals) in enumerate(services.items())}
@@ -1,19 +1,82 @@
+from bisect import bisect_left
+
+import numpy as np
+
+# from this many points, interp of a float64 array is computed with numpy
+INTERP_NUMPY_MIN_SIZE = 48
+
+
 def clip(x, lo, hi):
-  return max(lo, min(hi, x))
+  # same as max(lo, min(hi, x)), without the builtin calls
+  x = x if x < hi else hi
+  return x if x > lo else lo
+
+
+def _interp(xv, xp, fp):
+  # xp has to be increasing, xp[hi - 1] < xv <= xp[hi]
+  hi = bisect_left(xp, xv)
+  if hi == 0:
+    return fp[0]
+  if hi == len(xp):
+    return fp[-1]
+  low = hi - 1
+  return (xv - xp[low]) * (fp[hi] - fp[low]) / (xp[hi] - xp[low]) + fp[low]
+
+
+def _interp_array(x, xp, fp):
+  """interp of a float64 array in numpy, evaluated in the same order as _interp so the results are identical"""
+  xp = np.asarray(xp, dtype=np.float64)
+  fp = np.asarray(fp, dtype=np.float64)
+  hi = np.searchsorted(xp, x, side='left')
+  # NaN sorts last, but isn't greater than any breakpoint
+  hi[np.isnan(x)] = 0
+
+  inner = np.clip(hi, 1, len(xp) - 1)
+  low = inner - 1
+  with np.errstate(divide='ignore', invalid='ignore'):
+    y = (x - xp[low]) * (fp[inner] - fp[low]) / (xp[inner] - xp[low]) + fp[low]
+  y[hi == 0] = fp[0]
+  y[hi == len(xp)] = fp[-1]
+  return y.tolist()
+
 
 def interp(x, xp, fp):
-  N = len(xp)
-
-  def get_interp(xv):
-    hi = 0
-    while hi < N and xv > xp[hi]:
-      hi += 1
-    low = hi - 1
-    return fp[-1] if hi == N and xv > xp[low] else (
-      fp[0] if hi == 0 else
-      (xv - xp[low]) * (fp[hi] - fp[low]) / (xp[hi] - xp[low]) + fp[low])
-
-  return [get_interp(v) for v in x] if hasattr(x, '__iter__') else get_interp(x)
+  if hasattr(x, '__iter__'):
+    if isinstance(x, np.ndarray) and x.dtype == np.float64 and x.ndim == 1:
+      if x.size >= INTERP_NUMPY_MIN_SIZE and len(xp) > 1:
+        return _interp_array(x, xp, fp)
+      # python floats are faster to compute with than numpy scalars, and float64 gives the same results
+      x = x.tolist()
+    return [_interp(v, xp, fp) for v in x]
+  return _interp(x, xp, fp)
+
+
+def interp_table(xp, fp):
+  """interp with constant breakpoints, for the tables evaluated every frame.
+
+  The breakpoints are checked once and the differences between them precomputed,
+  returns a function of x with results identical to interp(x, xp, fp).
+  """
+  if len(xp) != len(fp) or len(xp) == 0:
+    raise ValueError("xp and fp must have the same, nonzero length")
+  if any(b < a for a, b in zip(xp, xp[1:])):
+    raise ValueError("xp must be increasing")
+
+  xp, fp = tuple(xp), tuple(fp)
+  n, first, last = len(xp), fp[0], fp[-1]
+  # (xp[low], fp[hi] - fp[low], xp[hi] - xp[low], fp[low]) by hi
+  segments = [None] + [(xp[i - 1], fp[i] - fp[i - 1], xp[i] - xp[i - 1], fp[i - 1]) for i in range(1, n)]
+
+  def table(x):
+    if hasattr(x, '__iter__'):
+      return interp(x, xp, fp)
+    hi = bisect_left(xp, x)
+    if 0 < hi < n:
+      x_low, df, dx, f_low = segments[hi]
+      return (x - x_low) * df / dx + f_low
+    return first if hi == 0 else last
+  return table
+
 
 def mean(x):
   return sum(x) / len(x)
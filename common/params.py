@@ -1,3 +1,11 @@
+import ctypes
+import os
+import struct
+import threading
+from collections import namedtuple
+from decimal import Decimal
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
 from openpilot.common.params_pyx import Params, ParamKeyType, UnknownKeyName, put_nonblocking, \
                                         put_bool_nonblocking
 assert Params
@@ -6,6 +14,267 @@ assert UnknownKeyName
 assert put_nonblocking
 assert put_bool_nonblocking
 
+# inotify(7)
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class ParamsWatcher:
+  """Watches a params directory with inotify, counting changes of every key.
+
+  A background thread reads the events, so checking for a change is a dict lookup.
+  If inotify isn't available or the watch is lost, available is False and
+  CachedParams falls back to stat.
+  """
+  def __init__(self, path: str):
+    self.path = path
+    self.generation = 0
+    self.key_generations: Dict[str, int] = {}
+    self.available = False
+
+    try:
+      libc = ctypes.CDLL(None, use_errno=True)
+      self.fd = libc.inotify_init1(os.O_CLOEXEC)
+      mask = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+      if self.fd < 0 or libc.inotify_add_watch(self.fd, path.encode(), mask) < 0:
+        return
+    except (AttributeError, OSError):
+      return
+
+    self.available = True
+    threading.Thread(target=self._watch, daemon=True, name="params_watcher").start()
+
+  def key_generation(self, key: str) -> Tuple[int, int]:
+    return self.generation, self.key_generations.get(key, 0)
+
+  def _changed(self, key: str):
+    self.key_generations[key] = self.key_generations.get(key, 0) + 1
+
+  def _watch(self):
+    try:
+      self._read_events()
+    finally:
+      # however the watch ended, everything cached is stale and CachedParams has to stat again
+      self.generation += 1
+      self.available = False
+
+  def _read_events(self):
+    while True:
+      try:
+        buf = os.read(self.fd, 64 * 1024)
+      except InterruptedError:
+        continue
+      except OSError:
+        return
+
+      pos = 0
+      while pos < len(buf):
+        _, mask, _, name_len = INOTIFY_EVENT.unpack_from(buf, pos)
+        name = buf[pos + INOTIFY_EVENT.size:pos + INOTIFY_EVENT.size + name_len].rstrip(b'\0').decode()
+        pos += INOTIFY_EVENT.size + name_len
+
+        if mask & (IN_Q_OVERFLOW | IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+          # lost track of changes, everything is stale
+          self.generation += 1
+          if not mask & IN_Q_OVERFLOW:
+            return
+        elif name:
+          self._changed(name)
+
+
+Parser = Callable[[Optional[bytes]], Any]
+
+
+def parse_bool() -> Parser:
+  return lambda v: v == b"1"
+
+
+def parse_int(default=0) -> Parser:
+  return lambda v: default if v is None else int(v)
+
+
+def parse_float(scale='1', default=0.) -> Parser:
+  """Scaled like float(Decimal(value) * Decimal(scale)), as the tuning params are stored"""
+  return lambda v: default if v is None else float(Decimal(v.decode()) * Decimal(scale))
+
+
+def parse_int_list(default=None) -> Parser:
+  """Comma separated ints, as a tuple"""
+  return lambda v: default if v is None else tuple(map(int, v.decode().split(',')))
+
+
+def parse_float_list(default=None) -> Parser:
+  """Comma separated floats, as a tuple"""
+  return lambda v: default if v is None else tuple(map(float, v.decode().split(',')))
+
+
+def parse_str(encoding='utf8', default=None) -> Parser:
+  return lambda v: default if v is None else v.decode(encoding)
+
+
+class ParamSpec(NamedTuple):
+  key: str
+  parse: Parser
+  # an unset required param fails ParamsSchema.load instead of being parsed
+  required: bool = False
+
+
+# bools are False when unset, as with Params.get_bool. The other params are
+# required unless a default is given.
+def bool_param(key) -> ParamSpec:
+  return ParamSpec(key, parse_bool())
+
+
+def int_param(key, default=None) -> ParamSpec:
+  return ParamSpec(key, parse_int(default), default is None)
+
+
+def float_param(key, scale='1', default=None) -> ParamSpec:
+  return ParamSpec(key, parse_float(scale, default), default is None)
+
+
+def int_list_param(key, default=None) -> ParamSpec:
+  return ParamSpec(key, parse_int_list(default), default is None)
+
+
+def float_list_param(key, default=None) -> ParamSpec:
+  return ParamSpec(key, parse_float_list(default), default is None)
+
+
+def str_param(key, encoding='utf8', default=None) -> ParamSpec:
+  return ParamSpec(key, parse_str(encoding, default), default is None)
+
+
+class ParamsSchema:
+  """Typed declaration of the params a process reads.
+
+  load reads all of them with one Params.get_many call and returns the parsed
+  values as an immutable namedtuple, with the fields named as the specs. An unset
+  required param or a value that doesn't parse raises a ValueError naming the key,
+  so a bad param fails at startup rather than in the loop:
+
+    CONTROLS_PARAMS = ParamsSchema("ControlsParams", is_metric=bool_param("IsMetric"),
+                                   steer_ratio_max=float_param("SteerRatioMaxAdj", '0.01'))
+    p = CONTROLS_PARAMS.load(params)
+    p.steer_ratio_max
+  """
+  def __init__(self, name: str, **specs: ParamSpec):
+    self.specs = specs
+    self.values_type = namedtuple(name, specs.keys())  # type: ignore[misc]
+
+  def load(self, params=None):
+    params = Params() if params is None else params
+    raw = params.get_many(spec.key for spec in self.specs.values())
+    values = []
+    for spec in self.specs.values():
+      if raw[spec.key] is None and spec.required:
+        raise ValueError(f"param {spec.key} is not set")
+      try:
+        values.append(spec.parse(raw[spec.key]))
+      except (ValueError, ArithmeticError) as e:
+        raise ValueError(f"param {spec.key}: {raw[spec.key]!r} doesn't parse") from e
+    return self.values_type(*values)
+
+
+_watchers: Dict[str, ParamsWatcher] = {}
+_watchers_lock = threading.Lock()
+
+
+def get_params_watcher(path: str) -> ParamsWatcher:
+  with _watchers_lock:
+    if path not in _watchers or not _watchers[path].available:
+      _watchers[path] = ParamsWatcher(path)
+    return _watchers[path]
+
+
+class CachedParams:
+  """Params reader for control loops, keeping values in memory until they change on disk.
+
+  Changes are picked up through a ParamsWatcher, so a repeated get is a dict lookup.
+  Parsed values of get_int, get_float and get_int_list are cached as well, so live
+  tune values aren't parsed again every frame. Other Params methods are passed through.
+  """
+  def __init__(self, d=""):
+    self._params = Params(d)
+    self._path = self._params.get_param_path()
+    self._watcher = get_params_watcher(self._path)
+    # key -> (generation, {parser: value})
+    self._cache: Dict[str, Tuple[Any, Dict[Any, Any]]] = {}
+
+  def __getattr__(self, name):
+    return getattr(self._params, name)
+
+  def _version(self, key: str):
+    if self._watcher.available:
+      return self._watcher.key_generation(key)
+    try:
+      st = os.stat(os.path.join(self._path, key))
+      return st.st_ino, st.st_mtime_ns, st.st_size
+    except FileNotFoundError:
+      return None
+
+  def _get(self, key, parser, make_parser: Callable[..., Parser], *args):
+    entry = self._cache.get(key)
+    if entry is not None and entry[0] == self._version(key):
+      values = entry[1]
+      if parser in values:
+        return values[parser]
+    else:
+      self._params.check_key(key)
+      # the version is taken before reading, so a write in between only causes another read
+      values = {}
+      self._cache[key] = (self._version(key), values)
+
+    value = values[parser] = make_parser(*args)(self._params.get(key))
+    return value
+
+  def get(self, key, block=False, encoding=None):
+    if block:
+      return self._params.get(key, block=True, encoding=encoding)
+    return self._get(key, ('raw', encoding), lambda: lambda v: v if v is None or encoding is None else v.decode(encoding))
+
+  def get_bool(self, key, block=False):
+    if block:
+      return self._params.get_bool(key, block=True)
+    return self._get(key, 'bool', parse_bool)
+
+  def get_int(self, key, default=0):
+    return self._get(key, ('int', default), parse_int, default)
+
+  def get_float(self, key, scale='1', default=0.):
+    return self._get(key, ('float', scale, default), parse_float, scale, default)
+
+  def get_int_list(self, key, default=None):
+    return self._get(key, ('int_list', default), parse_int_list, default)
+
+  def _invalidate(self, key):
+    self._cache.pop(key if isinstance(key, str) else key.decode(), None)
+
+  def put(self, key, dat):
+    self._params.put(key, dat)
+    self._invalidate(key)
+
+  def put_bool(self, key, val):
+    self._params.put_bool(key, val)
+    self._invalidate(key)
+
+  def remove(self, key):
+    self._params.remove(key)
+    self._invalidate(key)
+
+  def clear_all(self, tx_type=ParamKeyType.ALL):
+    self._params.clear_all(tx_type)
+    self._cache.clear()
+
+
 if __name__ == "__main__":
   import sys
 
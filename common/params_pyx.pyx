@@ -68,6 +68,20 @@ cdef class Params:
 
     return val if encoding is None else val.decode(encoding)
 
+  def get_many(self, keys):
+    """Values of keys read in one call without the GIL, None for unset keys"""
+    keys = list(keys)
+    cdef vector[string] ks
+    for key in keys:
+      ks.push_back(self.check_key(key))
+
+    cdef vector[string] vals
+    cdef size_t i
+    with nogil:
+      for i in range(ks.size()):
+        vals.push_back(self.p.get(ks[i], False))
+    return {key: (val if len(val) else None) for key, val in zip(keys, vals)}
+
   def get_bool(self, key, bool block=False):
     cdef string k = self.check_key(key)
     cdef bool r
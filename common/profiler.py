@@ -1,3 +1,4 @@
+import math
 import time
 
 class Profiler():
@@ -43,3 +44,119 @@ class Profiler():
       else:
         print("%30s: %9.2f  avg: %7.2f  percent: %3.0f" % (n, ms*1000.0, ms*1000.0/self.iter, ms/self.tot*100))
     print(f"Iter clock: {self.tot / self.iter:2.6f}   TOTAL: {self.tot:2.2f}")
+
+
+# log-linear buckets like an HDR histogram: durations below SUB_BUCKETS us are exact,
+# longer ones are kept with a relative precision of 1 / HALF_SUB_BUCKETS
+SUB_BUCKET_BITS = 6
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+HALF_SUB_BUCKETS = SUB_BUCKETS // 2
+HISTOGRAM_MAX_US = 1000000
+
+
+def _bucket(us):
+  if us < SUB_BUCKETS:
+    return us
+  shift = us.bit_length() - SUB_BUCKET_BITS
+  return shift * HALF_SUB_BUCKETS + (us >> shift)
+
+
+def _bucket_start(idx):
+  if idx < SUB_BUCKETS:
+    return idx
+  shift = idx // HALF_SUB_BUCKETS - 1
+  return (idx - shift * HALF_SUB_BUCKETS) << shift
+
+
+HISTOGRAM_BUCKETS = _bucket(HISTOGRAM_MAX_US) + 1
+
+
+class DurationHistogram():
+  """Durations in seconds counted in a fixed number of buckets, so recording never allocates"""
+  def __init__(self):
+    self.counts = [0] * HISTOGRAM_BUCKETS
+    self.count = 0
+    self.max = 0.
+
+  def record(self, dt):
+    us = int(dt * 1e6)
+    self.counts[_bucket(us) if us < HISTOGRAM_MAX_US else HISTOGRAM_BUCKETS - 1] += 1
+    self.count += 1
+    if dt > self.max:
+      self.max = dt
+
+  def percentile(self, p):
+    """Upper end of the bucket holding the p-th percentile, at most the max"""
+    if self.count == 0:
+      return 0.
+    target = max(1, math.ceil(self.count * p / 100.))
+    cum = 0
+    for idx, c in enumerate(self.counts):
+      cum += c
+      if cum >= target:
+        # the last bucket also holds everything over HISTOGRAM_MAX_US
+        return self.max if idx == HISTOGRAM_BUCKETS - 1 else min(_bucket_start(idx + 1) / 1e6, self.max)
+    return self.max
+
+  def reset(self):
+    self.counts[:] = [0] * HISTOGRAM_BUCKETS
+    self.count = 0
+    self.max = 0.
+
+
+class StageProfiler():
+  """Always on profiler of a loop with the checkpoint interface of Profiler.
+
+  Every stage and the whole frame are recorded into DurationHistograms. end_frame
+  counts frames longer than the budget, and which stage took the longest in them.
+  Ignored stages, like waiting for the next frame, are recorded but not counted
+  in the frame time, as with Profiler.tot.
+  """
+  def __init__(self, budget):
+    self.budget = budget
+    self.frame = DurationHistogram()
+    self.stages = {}
+    self.overruns = {}
+    self.frames = 0
+    self.overrun_frames = 0
+    self.last_time = time.monotonic()
+    self.frame_time = 0.
+    self.longest = None
+    self.longest_time = 0.
+
+  def checkpoint(self, name, ignore=False):
+    t = time.monotonic()
+    dt = t - self.last_time
+    self.last_time = t
+
+    if name not in self.stages:
+      self.stages[name] = DurationHistogram()
+      self.overruns[name] = 0
+    self.stages[name].record(dt)
+
+    if not ignore:
+      self.frame_time += dt
+      if dt > self.longest_time:
+        self.longest, self.longest_time = name, dt
+
+  def end_frame(self):
+    """Records the frame since the last end_frame, returns if it overran the budget"""
+    self.frame.record(self.frame_time)
+    self.frames += 1
+    overrun = self.frame_time > self.budget
+    if overrun:
+      self.overrun_frames += 1
+      if self.longest is not None:
+        self.overruns[self.longest] += 1
+
+    self.frame_time = 0.
+    self.longest, self.longest_time = None, 0.
+    return overrun
+
+  def reset(self):
+    self.frame.reset()
+    for name in self.stages:
+      self.stages[name].reset()
+      self.overruns[name] = 0
+    self.frames = 0
+    self.overrun_frames = 0
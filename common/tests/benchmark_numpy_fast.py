@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+import argparse
+import time
+
+import numpy as np
+
+from openpilot.common.numpy_fast import clip, interp, interp_table
+from openpilot.common.numpy_fast_old import clip as clip_old, interp as interp_old
+
+# a speed breakpoint table as used by the planners and carcontrollers
+BP = [0., 5., 10., 20., 30., 40.]
+V = [1.6, 1.4, 1.2, 0.9, 0.7, 0.6]
+
+
+def timeit(f, n):
+  t = time.process_time()
+  for _ in range(n):
+    f()
+  return (time.process_time() - t) / n
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Per-call CPU of numpy_fast interp and clip against the previous implementation")
+  parser.add_argument("-n", type=int, default=200000)
+  args = parser.parse_args()
+
+  table = interp_table(BP, V)
+  results = {
+    "interp old": timeit(lambda: interp_old(17.3, BP, V), args.n),
+    "interp": timeit(lambda: interp(17.3, BP, V), args.n),
+    "interp_table": timeit(lambda: table(17.3), args.n),
+    "clip old": timeit(lambda: clip_old(17.3, -1., 1.), args.n),
+    "clip": timeit(lambda: clip(17.3, -1., 1.), args.n),
+  }
+  for size in (4, 33, 100):
+    x = np.linspace(-1., 45., size)
+    results[f"interp old, {size} points"] = timeit(lambda: interp_old(x, BP, V), args.n // size)
+    results[f"interp, {size} points"] = timeit(lambda: interp(x, BP, V), args.n // size)
+
+  for name, dt in results.items():
+    print(f"{name:>24}: {dt*1e9:8.0f} ns")
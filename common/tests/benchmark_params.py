@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+import argparse
+import tempfile
+import time
+from decimal import Decimal
+
+from openpilot.common.params import CachedParams, Params
+
+
+def timeit(f, n):
+  t = time.monotonic()
+  for _ in range(n):
+    f()
+  return (time.monotonic() - t) / n
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Latency of reading a live tune param, as the lateral controllers do every frame")
+  parser.add_argument("-n", type=int, default=100000)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as d:
+    params = Params(d)
+    params.put("PidKp", "25")
+    params.put_bool("OpkrLiveTunePanelEnable", True)
+    cached = CachedParams(d)
+
+    results = {
+      "Params.get_bool": timeit(lambda: params.get_bool("OpkrLiveTunePanelEnable"), args.n),
+      "Params.get + Decimal": timeit(lambda: float(Decimal(params.get("PidKp", encoding="utf8")) * Decimal('0.01')), args.n),
+      "CachedParams.get_bool": timeit(lambda: cached.get_bool("OpkrLiveTunePanelEnable"), args.n),
+      "CachedParams.get_float": timeit(lambda: cached.get_float("PidKp", '0.01'), args.n),
+    }
+    for name, dt in results.items():
+      print(f"{name:>24}: {dt*1e6:6.2f} us")
+
+    # a write from another process is picked up by the next get
+    Params(d).put("PidKp", "30")
+    t = time.monotonic()
+    while cached.get_float("PidKp", '0.01') != 0.3:
+      time.sleep(1e-4)
+    print(f"{'change visible after':>24}: {(time.monotonic() - t)*1e3:6.2f} ms")
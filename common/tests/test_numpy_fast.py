@@ -0,0 +1,94 @@
+import math
+import random
+import unittest
+
+import numpy as np
+
+from openpilot.common.numpy_fast import INTERP_NUMPY_MIN_SIZE, clip, interp, interp_table
+from openpilot.common.numpy_fast_old import clip as clip_old, interp as interp_old
+
+SPECIAL = [float('nan'), float('inf'), -float('inf'), 0.0, -0.0]
+
+
+def same(a, b):
+  # identical floats, NaN included
+  if isinstance(a, list):
+    return isinstance(b, list) and len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+  if isinstance(a, float) and math.isnan(a):
+    return isinstance(b, float) and math.isnan(b)
+  return type(a) is type(b) and a == b and math.copysign(1, a) == math.copysign(1, b)
+
+
+def random_table():
+  n = random.randint(1, 8)
+  xp = sorted(random.choice([random.uniform(-10, 10), random.randint(-3, 3)]) for _ in range(n))
+  fp = [random.choice([random.uniform(-10, 10), random.randint(-3, 3)]) for _ in range(n)]
+  return xp, fp
+
+
+def random_x(xp):
+  r = random.random()
+  if r < 0.1:
+    return random.choice(SPECIAL)
+  if r < 0.3:
+    return random.choice(xp)
+  if r < 0.4:
+    return random.randint(-12, 12)
+  return random.uniform(xp[0] - 2, xp[-1] + 2)
+
+
+class TestNumpyFast(unittest.TestCase):
+  def setUp(self):
+    random.seed(0)
+
+  def test_clip(self):
+    for _ in range(10000):
+      x, lo, hi = (random.choice(SPECIAL + [random.uniform(-5, 5), random.randint(-5, 5)]) for _ in range(3))
+      self.assertTrue(same(clip(x, lo, hi), clip_old(x, lo, hi)), (x, lo, hi))
+
+  def test_interp_scalar(self):
+    for _ in range(10000):
+      xp, fp = random_table()
+      x = random_x(xp)
+      self.assertTrue(same(interp(x, xp, fp), interp_old(x, xp, fp)), (x, xp, fp))
+
+  def test_interp_iterable(self):
+    for size in (0, 1, 5, INTERP_NUMPY_MIN_SIZE - 1, INTERP_NUMPY_MIN_SIZE, 200):
+      for _ in range(200):
+        xp, fp = random_table()
+        x = [float(random_x(xp)) for _ in range(size)]
+        expected = interp_old(x, xp, fp)
+        self.assertTrue(same(interp(x, xp, fp), expected), (x, xp, fp))
+        self.assertTrue(same(interp(tuple(x), xp, fp), expected), (x, xp, fp))
+        # float64 arrays can give python floats instead of numpy scalars or ints, with the same values
+        expected = [float(v) for v in interp_old(np.array(x), xp, fp)]
+        self.assertTrue(same([float(v) for v in interp(np.array(x), xp, fp)], expected), (x, xp, fp))
+
+  def test_interp_numpy_breakpoints(self):
+    xp, fp = np.linspace(0., 10., 33), np.random.default_rng(0).uniform(-1, 1, 33)
+    x = np.random.default_rng(1).uniform(-1, 11, 100)
+    self.assertTrue(same(interp(x, xp, fp), [float(v) for v in interp_old(x, xp, fp)]))
+    for v in x[:10]:
+      self.assertEqual(interp(float(v), xp, fp), interp_old(float(v), xp, fp))
+
+  def test_interp_table(self):
+    for _ in range(2000):
+      xp, fp = random_table()
+      table = interp_table(xp, fp)
+      for _ in range(5):
+        x = random_x(xp)
+        self.assertTrue(same(table(x), interp_old(x, xp, fp)), (x, xp, fp))
+      x = [float(random_x(xp)) for _ in range(5)]
+      self.assertTrue(same(table(x), interp_old(x, xp, fp)), (x, xp, fp))
+
+  def test_interp_table_invalid(self):
+    with self.assertRaises(ValueError):
+      interp_table([], [])
+    with self.assertRaises(ValueError):
+      interp_table([0., 1.], [0.])
+    with self.assertRaises(ValueError):
+      interp_table([1., 0.], [0., 1.])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,160 @@
+import os
+import tempfile
+import time
+import unittest
+
+from openpilot.common.params import CachedParams, Params, ParamsSchema, ParamsWatcher, bool_param, float_list_param, float_param, int_list_param, \
+                                    int_param, parse_bool, parse_float, parse_float_list, parse_int, parse_int_list, \
+                                    parse_str, str_param
+
+
+class TestParamParsers(unittest.TestCase):
+  def test_parse(self):
+    self.assertIs(parse_bool()(b"1"), True)
+    self.assertIs(parse_bool()(b"0"), False)
+    self.assertIs(parse_bool()(None), False)
+    self.assertEqual(parse_int()(b"-12"), -12)
+    self.assertEqual(parse_int_list()(b"30,60,80"), (30, 60, 80))
+    self.assertEqual(parse_float_list()(b"0,30.5,60"), (0., 30.5, 60.))
+    self.assertEqual(parse_str()("한글".encode()), "한글")
+
+  def test_parse_float_scale(self):
+    # scaled in decimal, as the tuning params always were
+    self.assertEqual(parse_float('0.01')(b"115"), 1.15)
+    self.assertEqual(parse_float('0.001')(b"-35"), -0.035)
+
+  def test_parse_default(self):
+    self.assertEqual(parse_int(3)(None), 3)
+    self.assertEqual(parse_float('0.1', 1.5)(None), 1.5)
+    self.assertIsNone(parse_int_list()(None))
+    self.assertEqual(parse_float_list((1.,))(None), (1.,))
+    self.assertEqual(parse_str(default="")(None), "")
+
+  def test_required(self):
+    self.assertFalse(bool_param("IsMetric").required)
+    self.assertTrue(int_param("OPKRLongAlt").required)
+    self.assertFalse(int_param("OPKRLongAlt", default=0).required)
+    self.assertTrue(float_list_param("SpdLaneWidthSpd").required)
+    self.assertFalse(str_param("RoadList", default="").required)
+
+
+class TestParamsSchema(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.TemporaryDirectory()
+    self.params = Params(self.tmpdir.name)
+
+  def tearDown(self):
+    self.tmpdir.cleanup()
+
+  def test_get_many(self):
+    self.params.put("OPKRLongAlt", "2")
+    self.params.put_bool("IsMetric", True)
+    self.assertEqual(self.params.get_many(["OPKRLongAlt", "IsMetric", "RoadList"]),
+                     {"OPKRLongAlt": b"2", "IsMetric": b"1", "RoadList": None})
+    self.assertEqual(self.params.get_many([]), {})
+
+  def test_get_many_unknown_key(self):
+    with self.assertRaises(Exception):
+      self.params.get_many(["OPKRLongAlt", "NotAParam"])
+
+  def test_load(self):
+    schema = ParamsSchema("TestParams", is_metric=bool_param("IsMetric"), long_alt=int_param("OPKRLongAlt"),
+                          sr_max=float_param("SteerRatioMaxAdj", '0.01'), spam_spd=int_list_param("CruiseSpammingSpd"),
+                          lane_width_spd=float_list_param("SpdLaneWidthSpd"), road_list=str_param("RoadList", default=""))
+    self.params.put("OPKRLongAlt", "1")
+    self.params.put("SteerRatioMaxAdj", "1750")
+    self.params.put("CruiseSpammingSpd", "50,80,110")
+    self.params.put("SpdLaneWidthSpd", "0,31")
+
+    p = schema.load(self.params)
+    self.assertEqual(p, (False, 1, 17.5, (50, 80, 110), (0., 31.), ""))
+    self.assertEqual(p.sr_max, 17.5)
+    self.assertEqual(p.lane_width_spd, (0., 31.))
+    with self.assertRaises(AttributeError):
+      p.long_alt = 2
+
+  def test_load_missing_required(self):
+    schema = ParamsSchema("TestParams", long_alt=int_param("OPKRLongAlt"), spam_spd=int_list_param("CruiseSpammingSpd"))
+    self.params.put("OPKRLongAlt", "1")
+    with self.assertRaisesRegex(ValueError, "CruiseSpammingSpd"):
+      schema.load(self.params)
+
+  def test_load_default(self):
+    schema = ParamsSchema("TestParams", long_alt=int_param("OPKRLongAlt", default=2))
+    self.assertEqual(schema.load(self.params).long_alt, 2)
+
+  def test_load_unparsable(self):
+    schema = ParamsSchema("TestParams", spam_spd=int_list_param("CruiseSpammingSpd"), sr_max=float_param("SteerRatioMaxAdj"))
+    self.params.put("SteerRatioMaxAdj", "1")
+    self.params.put("CruiseSpammingSpd", "50,,110")
+    with self.assertRaisesRegex(ValueError, "CruiseSpammingSpd"):
+      schema.load(self.params)
+    self.params.put("CruiseSpammingSpd", "50")
+    self.params.put("SteerRatioMaxAdj", "abc")
+    with self.assertRaisesRegex(ValueError, "SteerRatioMaxAdj"):
+      schema.load(self.params)
+
+
+def wait_for(f, timeout=2.):
+  t = time.monotonic()
+  while not f():
+    if time.monotonic() - t > timeout:
+      return False
+    time.sleep(0.001)
+  return True
+
+
+class TestCachedParams(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.TemporaryDirectory()
+    self.params = Params(self.tmpdir.name)
+    self.params.put("PidKp", "25")
+    self.cached = CachedParams(self.tmpdir.name)
+
+  def tearDown(self):
+    self.tmpdir.cleanup()
+
+  def test_put_invalidates(self):
+    self.assertEqual(self.cached.get_float("PidKp", '0.01'), 0.25)
+    self.cached.put("PidKp", "30")
+    self.assertEqual(self.cached.get_float("PidKp", '0.01'), 0.3)
+    self.cached.put_bool("OpkrLiveTunePanelEnable", True)
+    self.assertTrue(self.cached.get_bool("OpkrLiveTunePanelEnable"))
+    self.cached.remove("PidKp")
+    self.assertIsNone(self.cached.get("PidKp"))
+
+  def test_external_write(self):
+    self.assertTrue(self.cached._watcher.available)
+    self.assertEqual(self.cached.get_int("PidKp"), 25)
+    # as Params writes, to a temporary file renamed over the param
+    param_path = self.params.get_param_path()
+    tmp = os.path.join(param_path, ".tmp_PidKp")
+    with open(tmp, "w") as f:
+      f.write("35")
+    os.rename(tmp, os.path.join(param_path, "PidKp"))
+    self.assertTrue(wait_for(lambda: self.cached.get_int("PidKp") == 35))
+
+    Params(self.tmpdir.name).put("PidKp", "40")
+    self.assertTrue(wait_for(lambda: self.cached.get_int("PidKp") == 40))
+
+  def test_stat_fallback(self):
+    self.cached._watcher.available = False
+    self.assertEqual(self.cached.get_int("PidKp"), 25)
+    Params(self.tmpdir.name).put("PidKp", "45")
+    self.assertEqual(self.cached.get_int("PidKp"), 45)
+    Params(self.tmpdir.name).remove("PidKp")
+    self.assertEqual(self.cached.get_int("PidKp", 7), 7)
+
+  def test_watcher_error_falls_back(self):
+    watcher = ParamsWatcher(self.tmpdir.name)
+    self.assertTrue(watcher.available)
+    generation = watcher.generation
+    # a name that isn't utf8 can't be decoded, the watch ends but mustn't leave stale values behind
+    with open(os.path.join(self.tmpdir.name.encode(), b"\xff"), "w"):
+      pass
+    self.assertTrue(wait_for(lambda: not watcher.available))
+    self.assertGreater(watcher.generation, generation)
+
+
+if __name__ == "__main__":
+  unittest.main()
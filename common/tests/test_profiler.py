@@ -0,0 +1,81 @@
+import unittest
+from unittest import mock
+
+from openpilot.common.profiler import SUB_BUCKETS, DurationHistogram, StageProfiler
+
+
+class TestDurationHistogram(unittest.TestCase):
+  def test_empty(self):
+    self.assertEqual(DurationHistogram().percentile(50), 0.)
+
+  def test_exact_below_sub_buckets(self):
+    h = DurationHistogram()
+    for us in range(1, 11):
+      h.record(us * 1e-6)
+    # the bucket upper end of an exact duration is the next microsecond
+    self.assertAlmostEqual(h.percentile(50), 6e-6)
+    self.assertAlmostEqual(h.percentile(10), 2e-6)
+    self.assertAlmostEqual(h.percentile(100), 10e-6)
+    self.assertAlmostEqual(h.max, 10e-6)
+
+  def test_relative_precision(self):
+    h = DurationHistogram()
+    for ms in range(1, 101):
+      h.record(ms * 1e-3)
+    for p in (1, 50, 90, 99):
+      expected = p * 1e-3
+      self.assertGreaterEqual(h.percentile(p), expected)
+      self.assertLessEqual(h.percentile(p), expected * (1 + 2 / SUB_BUCKETS))
+    self.assertEqual(h.percentile(100), h.max)
+
+  def test_over_range(self):
+    h = DurationHistogram()
+    h.record(0.001)
+    h.record(5.)
+    self.assertEqual(h.percentile(100), 5.)
+    self.assertLess(h.percentile(50), 0.0011)
+
+  def test_reset(self):
+    h = DurationHistogram()
+    h.record(0.01)
+    h.reset()
+    self.assertEqual(h.count, 0)
+    self.assertEqual(h.percentile(99), 0.)
+
+
+class TestStageProfiler(unittest.TestCase):
+  def run_frames(self, stages, frames, budget=0.01):
+    """Runs frames of (name, duration, ignore) stages on a fake clock"""
+    now = [0.]
+    with mock.patch('openpilot.common.profiler.time.monotonic', lambda: now[0]):
+      prof = StageProfiler(budget)
+      for _ in range(frames):
+        for name, dt, ignore in stages:
+          now[0] += dt
+          prof.checkpoint(name, ignore=ignore)
+        prof.end_frame()
+    return prof
+
+  def test_waiting_is_not_an_overrun(self):
+    # blocked most of the period waiting for input, little work
+    prof = self.run_frames([("Ratekeeper", 0.0005, True), ("CAN wait", 0.008, True), ("Sample", 0.001, False),
+                            ("State Control", 0.0015, False)], 50)
+    self.assertEqual(prof.frames, 50)
+    self.assertEqual(prof.overrun_frames, 0)
+    self.assertAlmostEqual(prof.frame.max, 0.0025)
+    self.assertAlmostEqual(prof.stages["CAN wait"].max, 0.008)
+
+  def test_overrun_blames_longest_stage(self):
+    prof = self.run_frames([("CAN wait", 0.02, True), ("Sample", 0.004, False), ("State Control", 0.007, False)], 10)
+    self.assertEqual(prof.overrun_frames, 10)
+    self.assertEqual(prof.overruns, {"CAN wait": 0, "Sample": 0, "State Control": 10})
+
+  def test_reset(self):
+    prof = self.run_frames([("Sample", 0.02, False)], 3)
+    prof.reset()
+    self.assertEqual((prof.frames, prof.overrun_frames, prof.overruns["Sample"]), (0, 0, 0))
+    self.assertEqual(prof.frame.count, 0)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -86,6 +86,18 @@ public:
   void UpdateCans(uint64_t sec, const capnp::DynamicStruct::Reader& cans);
   void UpdateValid(uint64_t sec);
   void query_latest(std::vector<SignalValue> &vals, uint64_t last_ts = 0);
+
+  // fixed signal layout, written into caller owned arrays by update_strings_into
+  void set_signal_layout(const std::vector<std::pair<uint32_t, std::string>> &signals);
+  #ifndef DYNAMIC_CAPNP
+  void update_strings_into(const std::vector<std::string> &data, double *values, uint64_t *ts_nanos, uint8_t *updated, bool sendcan);
+  void update_strings_series(const std::vector<std::string> &data, std::vector<std::vector<uint64_t>> &ts_nanos,
+                             std::vector<std::vector<double>> &values, bool sendcan);
+  #endif
+  void query_latest_into(double *values, uint64_t *ts_nanos, uint8_t *updated, uint64_t last_ts = 0);
+
+private:
+  std::vector<std::pair<MessageState *, int>> signal_layout;
 };
 
 class CANPacker {
@@ -98,5 +110,8 @@ private:
 public:
   CANPacker(const std::string& dbc_name);
   std::vector<uint8_t> pack(uint32_t address, const std::vector<SignalPackValue> &values);
+  // pack with signals resolved once by lookup_signal
+  std::vector<uint8_t> pack(uint32_t address, const Signal *const *sigs, const double *values, size_t n);
+  const Signal *lookup_signal(uint32_t address, const std::string &name);
   Msg* lookup_message(uint32_t address);
 };
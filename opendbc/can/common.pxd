@@ -69,7 +69,12 @@ cdef extern from "common.h":
     bool bus_timeout
     CANParser(int, string, vector[pair[uint32_t, int]]) except +
     void update_strings(vector[string]&, vector[SignalValue]&, bool) except +
+    void set_signal_layout(vector[pair[uint32_t, string]]&) except +
+    void update_strings_into(vector[string]&, double*, uint64_t*, uint8_t*, bool) except +
+    void update_strings_series(vector[string]&, vector[vector[uint64_t]]&, vector[vector[double]]&, bool) except +
 
   cdef cppclass CANPacker:
    CANPacker(string)
    vector[uint8_t] pack(uint32_t, vector[SignalPackValue]&)
+   vector[uint8_t] pack(uint32_t, const Signal**, const double*, size_t)
+   const Signal* lookup_signal(uint32_t, string)
@@ -10,6 +10,12 @@
 #include <iterator>
 #include <cstring>
 #include <clocale>
+#include <cstdio>
+
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
 
 #include "opendbc/can/common.h"
 #include "opendbc/can/common_dbc.h"
@@ -226,6 +232,224 @@ const std::string get_dbc_root_path() {
   }
 }
 
+// Compiled DBC cache
+//
+// Parsed DBCs are written to a flat binary file on first use, so later processes
+// skip the regex parser and read the file through mmap, which is shared in the page cache.
+// A cache file is only used if it was written from a source with the same path, size and mtime.
+
+const uint32_t DBC_CACHE_MAGIC = 0x43424444;  // "DDBC"
+const uint32_t DBC_CACHE_VERSION = 1;
+
+const std::string get_dbc_cache_path() {
+  char *cache_dir = std::getenv("DBC_CACHE_DIR");
+  if (cache_dir != NULL) {
+    return cache_dir;
+  } else {
+    return get_dbc_root_path() + "/.dbc_cache";
+  }
+}
+
+class DBCCacheWriter {
+public:
+  std::string buf;
+
+  template <typename T>
+  void write(T v) {
+    buf.append((const char *)&v, sizeof(T));
+  }
+
+  void write(const std::string &s) {
+    write<uint32_t>(s.size());
+    buf.append(s);
+  }
+};
+
+class DBCCacheReader {
+public:
+  DBCCacheReader(const char *dat, size_t size) : pos(dat), end(dat + size) {}
+
+  template <typename T>
+  T read() {
+    T v;
+    if (pos + sizeof(T) > end) throw std::runtime_error("truncated DBC cache");
+    memcpy(&v, pos, sizeof(T));
+    pos += sizeof(T);
+    return v;
+  }
+
+  std::string read_string() {
+    uint32_t size = read<uint32_t>();
+    if (pos + size > end) throw std::runtime_error("truncated DBC cache");
+    std::string s(pos, size);
+    pos += size;
+    return s;
+  }
+
+  bool done() const { return pos == end; }
+
+private:
+  const char *pos, *end;
+};
+
+void write_dbc_cache_header(DBCCacheWriter &w, const std::string &dbc_path, const struct stat &st) {
+  w.write<uint32_t>(DBC_CACHE_MAGIC);
+  w.write<uint32_t>(DBC_CACHE_VERSION);
+  w.write(dbc_path);
+  w.write<int64_t>(st.st_size);
+#ifdef __APPLE__
+  const struct timespec &mtime = st.st_mtimespec;
+#else
+  const struct timespec &mtime = st.st_mtim;
+#endif
+  w.write<int64_t>(mtime.tv_sec);
+  w.write<int64_t>(mtime.tv_nsec);
+}
+
+void dbc_cache_write(const std::string &cache_path, const std::string &dbc_path, const struct stat &st, const DBC *dbc) {
+  DBCCacheWriter w;
+  write_dbc_cache_header(w, dbc_path, st);
+  w.write(dbc->name);
+
+  w.write<uint32_t>(dbc->msgs.size());
+  for (const auto &msg : dbc->msgs) {
+    w.write(msg.name);
+    w.write<uint32_t>(msg.address);
+    w.write<uint32_t>(msg.size);
+    w.write<uint32_t>(msg.sigs.size());
+    for (const auto &sig : msg.sigs) {
+      w.write(sig.name);
+      w.write<int32_t>(sig.start_bit);
+      w.write<int32_t>(sig.msb);
+      w.write<int32_t>(sig.lsb);
+      w.write<int32_t>(sig.size);
+      w.write<uint8_t>(sig.is_signed);
+      w.write<double>(sig.factor);
+      w.write<double>(sig.offset);
+      w.write<uint8_t>(sig.is_little_endian);
+    }
+  }
+
+  w.write<uint32_t>(dbc->vals.size());
+  for (const auto &val : dbc->vals) {
+    w.write(val.name);
+    w.write<uint32_t>(val.address);
+    w.write(val.def_val);
+  }
+
+  // write to a temporary file and rename, other processes may be loading the same DBC
+  std::error_code ec;
+  std::filesystem::create_directories(std::filesystem::path(cache_path).parent_path(), ec);
+  std::string tmp_path = cache_path + ".tmp" + std::to_string(getpid());
+  {
+    std::ofstream f(tmp_path, std::ios::binary);
+    if (!f) return;
+    f.write(w.buf.data(), w.buf.size());
+    if (!f) {
+      f.close();
+      std::remove(tmp_path.c_str());
+      return;
+    }
+  }
+  if (std::rename(tmp_path.c_str(), cache_path.c_str()) != 0) {
+    std::remove(tmp_path.c_str());
+  }
+}
+
+DBC* dbc_cache_read(const std::string &cache_path, const std::string &dbc_path, const struct stat &st, ChecksumState *checksum) {
+  int fd = open(cache_path.c_str(), O_RDONLY);
+  if (fd < 0) return nullptr;
+
+  struct stat cache_st;
+  if (fstat(fd, &cache_st) != 0 || cache_st.st_size == 0) {
+    close(fd);
+    return nullptr;
+  }
+  void *mem = mmap(nullptr, cache_st.st_size, PROT_READ, MAP_SHARED, fd, 0);
+  close(fd);
+  if (mem == MAP_FAILED) return nullptr;
+
+  DBC *dbc = nullptr;
+  const char *dat = (const char *)mem;
+  try {
+    // compare the header with the one we would write for the current source
+    DBCCacheWriter header;
+    write_dbc_cache_header(header, dbc_path, st);
+    if (cache_st.st_size < header.buf.size() || memcmp(dat, header.buf.data(), header.buf.size()) != 0) {
+      throw std::runtime_error("stale DBC cache");
+    }
+
+    DBCCacheReader r(dat + header.buf.size(), cache_st.st_size - header.buf.size());
+    dbc = new DBC;
+    dbc->name = r.read_string();
+
+    std::map<uint32_t, const std::vector<Signal>*> signals;
+    dbc->msgs.resize(r.read<uint32_t>());
+    for (auto &msg : dbc->msgs) {
+      msg.name = r.read_string();
+      msg.address = r.read<uint32_t>();
+      msg.size = r.read<uint32_t>();
+      msg.sigs.resize(r.read<uint32_t>());
+      for (auto &sig : msg.sigs) {
+        sig.name = r.read_string();
+        sig.start_bit = r.read<int32_t>();
+        sig.msb = r.read<int32_t>();
+        sig.lsb = r.read<int32_t>();
+        sig.size = r.read<int32_t>();
+        sig.is_signed = r.read<uint8_t>();
+        sig.factor = r.read<double>();
+        sig.offset = r.read<double>();
+        sig.is_little_endian = r.read<uint8_t>();
+        sig.type = DEFAULT;
+        // checksum functions are pointers, restore them as the parser does
+        set_signal_type(sig, checksum, dbc->name, 0);
+      }
+      signals[msg.address] = &msg.sigs;
+    }
+
+    dbc->vals.resize(r.read<uint32_t>());
+    for (auto &val : dbc->vals) {
+      val.name = r.read_string();
+      val.address = r.read<uint32_t>();
+      val.def_val = r.read_string();
+      auto it = signals.find(val.address);
+      if (it != signals.end()) {
+        val.sigs = *it->second;
+      }
+    }
+
+    if (!r.done()) throw std::runtime_error("trailing data in DBC cache");
+  } catch (std::exception &e) {
+    delete dbc;
+    dbc = nullptr;
+  }
+
+  munmap(mem, cache_st.st_size);
+  return dbc;
+}
+
+DBC* dbc_load(const std::string &dbc_path) {
+  struct stat st;
+  if (stat(dbc_path.c_str(), &st) != 0) return nullptr;
+
+  // an empty DBC_CACHE_DIR disables the cache
+  const std::string cache_dir = get_dbc_cache_path();
+  if (cache_dir.empty()) return dbc_parse(dbc_path);
+
+  const std::string dbc_name = std::filesystem::path(dbc_path).filename();
+  const std::string cache_path = cache_dir + "/" + dbc_name + ".bin";
+  std::unique_ptr<ChecksumState> checksum(get_checksum(dbc_name));
+
+  DBC *dbc = dbc_cache_read(cache_path, dbc_path, st, checksum.get());
+  if (dbc == nullptr) {
+    dbc = dbc_parse(dbc_path);
+    if (dbc != nullptr) {
+      dbc_cache_write(cache_path, dbc_path, st, dbc);
+    }
+  }
+  return dbc;
+}
+
 const DBC* dbc_lookup(const std::string& dbc_name) {
   static std::mutex lock;
   static std::map<std::string, DBC*> dbcs;
@@ -238,7 +462,7 @@ const DBC* dbc_lookup(const std::string& dbc_name) {
   std::unique_lock lk(lock);
   auto it = dbcs.find(dbc_name);
   if (it == dbcs.end()) {
-    it = dbcs.insert(it, {dbc_name, dbc_parse(dbc_file_path)});
+    it = dbcs.insert(it, {dbc_name, dbc_load(dbc_file_path)});
   }
   return it->second;
 }
@@ -42,28 +42,40 @@ CANPacker::CANPacker(const std::string& dbc_name) {
 }
 
 std::vector<uint8_t> CANPacker::pack(uint32_t address, const std::vector<SignalPackValue> &signals) {
-  std::vector<uint8_t> ret(message_lookup[address].size, 0);
-
-  // set all values for all given signal/value pairs
-  bool counter_set = false;
+  std::vector<const Signal *> sigs;
+  std::vector<double> values;
+  sigs.reserve(signals.size());
+  values.reserve(signals.size());
   for (const auto& sigval : signals) {
-    auto sig_it = signal_lookup.find(std::make_pair(address, sigval.name));
-    if (sig_it == signal_lookup.end()) {
+    const Signal *sig = lookup_signal(address, sigval.name);
+    if (sig == nullptr) {
       // TODO: do something more here. invalid flag like CANParser?
       WARN("undefined signal %s - %d\n", sigval.name.c_str(), address);
       continue;
     }
-    const auto &sig = sig_it->second;
+    sigs.push_back(sig);
+    values.push_back(sigval.value);
+  }
+  return pack(address, sigs.data(), values.data(), sigs.size());
+}
 
-    int64_t ival = (int64_t)(round((sigval.value - sig.offset) / sig.factor));
+std::vector<uint8_t> CANPacker::pack(uint32_t address, const Signal *const *sigs, const double *values, size_t n) {
+  std::vector<uint8_t> ret(message_lookup[address].size, 0);
+
+  // set all values for all given signal/value pairs
+  bool counter_set = false;
+  for (size_t i = 0; i < n; i++) {
+    const auto &sig = *sigs[i];
+
+    int64_t ival = (int64_t)(round((values[i] - sig.offset) / sig.factor));
     if (ival < 0) {
       ival = (1ULL << sig.size) + ival;
     }
     set_value(ret, sig, ival);
 
-    counter_set = counter_set || (sigval.name == "COUNTER");
+    counter_set = counter_set || (sig.name == "COUNTER");
     if (counter_set) {
-      counters[address] = sigval.value;
+      counters[address] = values[i];
     }
   }
 
@@ -92,6 +104,11 @@ std::vector<uint8_t> CANPacker::pack(uint32_t address, const std::vector<SignalP
   return ret;
 }
 
+const Signal *CANPacker::lookup_signal(uint32_t address, const std::string &name) {
+  auto sig_it = signal_lookup.find(std::make_pair(address, name));
+  return sig_it == signal_lookup.end() ? nullptr : &sig_it->second;
+}
+
 // This function has a definition in common.h and is used in PlotJuggler
 Msg* CANPacker::lookup_message(uint32_t address) {
   return &message_lookup[address];
@@ -1,13 +1,28 @@
 # distutils: language = c++
 # cython: c_string_encoding=ascii, language_level=3
 
-from libc.stdint cimport uint8_t
+from libc.stdint cimport uint8_t, uint32_t
 from libcpp.vector cimport vector
 from libcpp.map cimport map
 from libcpp.string cimport string
 
 from .common cimport CANPacker as cpp_CANPacker
-from .common cimport dbc_lookup, SignalPackValue, DBC
+from .common cimport dbc_lookup, SignalPackValue, DBC, Signal
+
+
+cdef class CANPackerMessage:
+  """A message with its signals resolved by CANPacker.prepare, packed from values in signal order"""
+  cdef:
+    vector[Signal*] sigs
+    vector[double] values
+
+  cdef readonly:
+    uint32_t address
+    str name
+    tuple signals
+
+  def __repr__(self):
+    return f"CANPackerMessage({self.name}, {self.signals})"
 
 
 cdef class CANPacker:
@@ -47,3 +62,37 @@ cdef class CANPacker:
 
     cdef vector[uint8_t] val = self.pack(addr, values)
     return [addr, 0, (<char *>&val[0])[:val.size()], bus]
+
+  def prepare(self, name_or_addr, signals):
+    """Resolves a message and its signal names once, for make_can_msg_prepared and make_can_msgs"""
+    cdef CANPackerMessage msg = CANPackerMessage()
+    if isinstance(name_or_addr, int):
+      msg.address = name_or_addr
+    else:
+      msg.address = self.name_to_address[name_or_addr.encode("utf8")]
+    msg.name = str(name_or_addr)
+    msg.signals = tuple(signals)
+
+    cdef const Signal *sig
+    for name in msg.signals:
+      sig = self.packer.lookup_signal(msg.address, name.encode("utf8"))
+      if sig == NULL:
+        raise RuntimeError(f"undefined signal {name} in message {msg.name}")
+      msg.sigs.push_back(<Signal*>sig)
+    msg.values.resize(msg.sigs.size())
+    return msg
+
+  cpdef make_can_msg_prepared(self, CANPackerMessage msg, bus, values):
+    """Like make_can_msg, with values a sequence in the order of the prepared signals"""
+    if len(values) != msg.sigs.size():
+      raise ValueError(f"expected {msg.sigs.size()} values for {msg.name}, got {len(values)}")
+    cdef size_t i
+    for i in range(msg.sigs.size()):
+      msg.values[i] = values[i]
+
+    cdef vector[uint8_t] val = self.packer.pack(msg.address, <const Signal**>msg.sigs.data(), msg.values.data(), msg.sigs.size())
+    return [msg.address, 0, (<char *>&val[0])[:val.size()], bus]
+
+  def make_can_msgs(self, msgs):
+    """Packs a frame's worth of (prepared message, bus, values) in one call"""
+    return [self.make_can_msg_prepared(msg, bus, values) for msg, bus, values in msgs]
@@ -204,6 +204,40 @@ void CANParser::update_strings(const std::vector<std::string> &data, std::vector
   query_latest(vals, current_sec);
 }
 
+void CANParser::update_strings_into(const std::vector<std::string> &data, double *values, uint64_t *ts_nanos, uint8_t *updated, bool sendcan) {
+  uint64_t current_sec = 0;
+  for (const auto &d : data) {
+    update_string(d, sendcan);
+    if (current_sec == 0) {
+      current_sec = last_sec;
+    }
+  }
+  query_latest_into(values, ts_nanos, updated, current_sec);
+}
+
+void CANParser::update_strings_series(const std::vector<std::string> &data, std::vector<std::vector<uint64_t>> &ts_nanos,
+                                      std::vector<std::vector<double>> &values, bool sendcan) {
+  ts_nanos.resize(signal_layout.size());
+  values.resize(signal_layout.size());
+  for (const auto &d : data) {
+    update_string(d, sendcan);
+
+    // every value of the layout's signals parsed from this event, at the event's time
+    for (int i = 0; i < signal_layout.size(); i++) {
+      const auto &[state, sig_idx] = signal_layout[i];
+      for (double v : state->all_vals[sig_idx]) {
+        ts_nanos[i].push_back(last_sec);
+        values[i].push_back(v);
+      }
+    }
+    for (auto &kv : message_states) {
+      for (auto &v : kv.second.all_vals) {
+        v.clear();
+      }
+    }
+  }
+}
+
 void CANParser::UpdateCans(uint64_t sec, const capnp::List<cereal::CanData>::Reader& cans) {
   //DEBUG("got %d messages\n", cans.size());
 
@@ -322,3 +356,43 @@ void CANParser::query_latest(std::vector<SignalValue> &vals, uint64_t last_ts) {
     }
   }
 }
+
+void CANParser::set_signal_layout(const std::vector<std::pair<uint32_t, std::string>> &signals) {
+  signal_layout.clear();
+  for (const auto &[address, name] : signals) {
+    auto state_it = message_states.find(address);
+    if (state_it == message_states.end()) {
+      std::stringstream is;
+      is << "Message not parsed: " << address;
+      throw std::runtime_error(is.str());
+    }
+
+    auto &sigs = state_it->second.parse_sigs;
+    auto sig_it = std::find_if(sigs.begin(), sigs.end(), [&](const Signal &sig) { return sig.name == name; });
+    if (sig_it == sigs.end()) {
+      std::stringstream is;
+      is << "Signal not found: " << address << " " << name;
+      throw std::runtime_error(is.str());
+    }
+    signal_layout.push_back({&state_it->second, (int)(sig_it - sigs.begin())});
+  }
+}
+
+void CANParser::query_latest_into(double *values, uint64_t *ts_nanos, uint8_t *updated, uint64_t last_ts) {
+  if (last_ts == 0) {
+    last_ts = last_sec;
+  }
+  for (int i = 0; i < signal_layout.size(); i++) {
+    const auto &[state, sig_idx] = signal_layout[i];
+    updated[i] = !(last_ts != 0 && state->last_seen_nanos < last_ts);
+    values[i] = state->vals[sig_idx];
+    ts_nanos[i] = state->last_seen_nanos;
+  }
+
+  // all values aren't exposed in this mode, don't let them pile up
+  for (auto &kv : message_states) {
+    for (auto &v : kv.second.all_vals) {
+      v.clear();
+    }
+  }
+}
@@ -6,7 +6,8 @@ from libcpp.pair cimport pair
 from libcpp.string cimport string
 from libcpp.vector cimport vector
 from libcpp.unordered_set cimport unordered_set
-from libc.stdint cimport uint32_t
+from libc.stdint cimport uint8_t, uint32_t, uint64_t
+from libc.string cimport memcpy
 
 from .common cimport CANParser as cpp_CANParser
 from .common cimport dbc_lookup, SignalValue, DBC
@@ -14,18 +15,28 @@ from .common cimport dbc_lookup, SignalValue, DBC
 import numbers
 from collections import defaultdict
 
+import numpy as np
+
 
 cdef class CANParser:
   cdef:
     cpp_CANParser *can
     const DBC *dbc
     vector[SignalValue] can_values
+    dict msg_name_to_address
+    double[::1] values_view
+    uint64_t[::1] ts_nanos_view
+    uint8_t[::1] updated_view
 
   cdef readonly:
     dict vl
     dict vl_all
     dict ts_nanos
     string dbc_name
+    object values
+    object values_ts_nanos
+    object values_updated
+    dict signal_index
 
   def __init__(self, dbc_name, messages, bus=0):
     self.dbc_name = dbc_name
@@ -63,7 +74,9 @@ cdef class CANParser:
       self.ts_nanos[address] = {}
       self.ts_nanos[name] = self.ts_nanos[address]
 
+    self.msg_name_to_address = msg_name_to_address
     self.can = new cpp_CANParser(bus, dbc_name, message_v)
+    self.set_signal_layout([])
     self.update_strings([])
 
   def update_strings(self, strings, sendcan=False):
@@ -89,6 +102,60 @@ cdef class CANParser:
 
     return updated_addrs
 
+  def set_signal_layout(self, signals):
+    """Registers a fixed list of (message name or address, signal name) for update_arrays.
+
+    update_arrays writes the latest value, timestamp and whether it was updated of
+    signals[i] into values[i], values_ts_nanos[i] and values_updated[i], without
+    building dicts. signal_index maps (message, signal) to i.
+    """
+    cdef vector[pair[uint32_t, string]] layout
+    self.signal_index = {}
+    for i, (msg, sig) in enumerate(signals):
+      address = msg if isinstance(msg, numbers.Number) else self.msg_name_to_address.get(msg)
+      if address is None:
+        raise RuntimeError(f"could not find message {repr(msg)} in DBC {self.dbc_name}")
+      layout.push_back((address, sig))
+      self.signal_index[(msg, sig)] = i
+    self.can.set_signal_layout(layout)
+
+    # one extra element so the views are never empty
+    self.values = np.zeros(len(signals) + 1, dtype=np.float64)[:len(signals)]
+    self.values_ts_nanos = np.zeros(len(signals) + 1, dtype=np.uint64)[:len(signals)]
+    self.values_updated = np.zeros(len(signals) + 1, dtype=bool)[:len(signals)]
+    self.values_view = self.values.base
+    self.ts_nanos_view = self.values_ts_nanos.base
+    self.updated_view = self.values_updated.base.view(np.uint8)
+
+  def update_arrays(self, strings, sendcan=False):
+    """Like update_strings, but only updates the arrays of the signal layout in place"""
+    self.can.update_strings_into(strings, &self.values_view[0], &self.ts_nanos_view[0], &self.updated_view[0], sendcan)
+
+  def update_strings_series(self, strings, sendcan=False):
+    """Parses all strings in one call, returning every value of the signal layout's signals.
+
+    Returns {(message, signal): (ts_nanos, values)} as arrays, with the logMonoTime of
+    the event each value was parsed from. Meant for decoding logs offline.
+    """
+    cdef vector[vector[uint64_t]] ts_nanos
+    cdef vector[vector[double]] values
+    self.can.update_strings_series(strings, ts_nanos, values, sendcan)
+
+    cdef uint64_t[::1] ts_view
+    cdef double[::1] values_view
+    series = {}
+    for key, i in self.signal_index.items():
+      n = values[i].size()
+      ts_arr = np.empty(n, dtype=np.uint64)
+      values_arr = np.empty(n, dtype=np.float64)
+      if n:
+        ts_view = ts_arr
+        values_view = values_arr
+        memcpy(&ts_view[0], ts_nanos[i].data(), n * sizeof(uint64_t))
+        memcpy(&values_view[0], values[i].data(), n * sizeof(double))
+      series[key] = (ts_arr, values_arr)
+    return series
+
   @property
   def can_valid(self):
     return self.can.can_valid
@@ -106,6 +173,9 @@ cdef class CANDefine():
     dict dv
     string dbc_name
 
+  cdef readonly:
+    dict msg_name_to_address
+
   def __init__(self, dbc_name):
     self.dbc_name = dbc_name
     self.dbc = dbc_lookup(dbc_name)
@@ -113,12 +183,14 @@ cdef class CANDefine():
       raise RuntimeError(f"Can't find DBC: '{dbc_name}'")
 
     address_to_msg_name = {}
+    self.msg_name_to_address = {}
 
     for i in range(self.dbc[0].msgs.size()):
       msg = self.dbc[0].msgs[i]
       name = msg.name.decode("utf8")
       address = msg.address
       address_to_msg_name[address] = name
+      self.msg_name_to_address[name] = address
 
     dv = defaultdict(dict)
 
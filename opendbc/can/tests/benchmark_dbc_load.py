@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+import argparse
+import glob
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from opendbc import DBC_PATH
+
+# dbc_lookup caches DBCs for the lifetime of a process, so every sample is a fresh interpreter
+LOAD_DBCS = """
+import time
+from opendbc.can.can_define import CANDefine
+t = time.monotonic()
+for name in {names!r}:
+  CANDefine(name)
+print(time.monotonic() - t)
+"""
+
+
+def load_time(names, cache_dir):
+  env = {**os.environ, "DBC_CACHE_DIR": cache_dir}
+  out = subprocess.check_output([sys.executable, "-c", LOAD_DBCS.format(names=names)], env=env)
+  return float(out)
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Time loading DBCs in a fresh process, with and without the compiled DBC cache")
+  parser.add_argument("dbcs", nargs="*", help="DBC names, all DBCs by default")
+  parser.add_argument("-n", type=int, default=5)
+  args = parser.parse_args()
+
+  names = args.dbcs or sorted(os.path.basename(f)[:-4] for f in glob.glob(os.path.join(DBC_PATH, "*.dbc"))
+                              if not os.path.basename(f).startswith("_"))
+  print(f"loading {len(names)} DBCs")
+
+  with tempfile.TemporaryDirectory() as cache_dir:
+    parse = [load_time(names, "") for _ in range(args.n)]
+    first_use = load_time(names, cache_dir)
+    cached = [load_time(names, cache_dir) for _ in range(args.n)]
+
+    cache_size = sum(os.path.getsize(f) for f in glob.glob(os.path.join(cache_dir, "*.bin")))
+
+  print(f"parse:     {statistics.median(parse)*1e3:8.1f} ms")
+  print(f"first use: {first_use*1e3:8.1f} ms (parse and write cache, {cache_size / 1e3:.0f} kB)")
+  print(f"cached:    {statistics.median(cached)*1e3:8.1f} ms")
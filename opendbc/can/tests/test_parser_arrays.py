@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+import unittest
+
+from opendbc.can.packer import CANPacker
+from opendbc.can.parser import CANParser
+from openpilot.selfdrive.boardd.boardd import can_list_to_can_capnp
+
+DBC = "hyundai_kia_generic"
+MESSAGES = [("CLU11", 0), ("WHL_SPD11", 0)]
+SIGNALS = [("CLU11", "CF_Clu_Vanz"), ("CLU11", "CF_Clu_CruiseSwState"), ("WHL_SPD11", "WHL_SPD_FL"), (902, "WHL_SPD_RR")]
+
+
+class TestParserArrays(unittest.TestCase):
+  def setUp(self):
+    self.packer = CANPacker(DBC)
+
+  def _can_strings(self, updates):
+    # every update is a list of events, every event a list of (message, speed)
+    strings = []
+    for events in updates:
+      cycle = []
+      for event in events:
+        msgs = []
+        for msg, speed in event:
+          if msg == "CLU11":
+            values = {"CF_Clu_Vanz": speed, "CF_Clu_CruiseSwState": int(speed) % 8}
+          else:
+            values = {"WHL_SPD_FL": speed, "WHL_SPD_RR": speed / 2}
+          msgs.append(self.packer.make_can_msg(msg, 0, values))
+        cycle.append(can_list_to_can_capnp(msgs))
+      strings.append(cycle)
+    return strings
+
+  def test_parity(self):
+    updates = self._can_strings([
+      [[("CLU11", 10), ("WHL_SPD11", 20)], [("CLU11", 11.5)]],
+      [[("WHL_SPD11", 21)]],
+      [],
+      [[("CLU11", 12)], [("CLU11", 13), ("WHL_SPD11", 22)], [("WHL_SPD11", 23)]],
+      [[]],
+    ])
+
+    dict_parser = CANParser(DBC, MESSAGES, 0)
+    array_parser = CANParser(DBC, MESSAGES, 0)
+    array_parser.set_signal_layout(SIGNALS)
+    self.assertEqual([array_parser.signal_index[s] for s in SIGNALS], list(range(len(SIGNALS))))
+
+    for strings in updates:
+      updated = dict_parser.update_strings(strings)
+      self.assertIsNone(array_parser.update_arrays(strings))
+
+      for i, (msg, sig) in enumerate(SIGNALS):
+        address = 902 if msg in ("WHL_SPD11", 902) else 1265
+        self.assertEqual(array_parser.values[i], dict_parser.vl[msg][sig])
+        self.assertEqual(array_parser.values_ts_nanos[i], dict_parser.ts_nanos[msg][sig])
+        self.assertEqual(array_parser.values_updated[i], address in updated)
+        # the arrays hold the last of the values parsed in this update
+        all_values = dict_parser.vl_all[msg][sig]
+        if len(all_values):
+          self.assertTrue(array_parser.values_updated[i])
+          self.assertEqual(array_parser.values[i], all_values[-1])
+
+  def test_all_values_cleared(self):
+    strings = self._can_strings([[[("CLU11", 10)], [("CLU11", 11)]], [[("CLU11", 12)]]])
+
+    parser = CANParser(DBC, MESSAGES, 0)
+    parser.set_signal_layout(SIGNALS)
+    parser.update_arrays(strings[0])
+    self.assertEqual(parser.values[0], 11)
+
+    # values parsed in array mode don't pile up for the next dict update
+    parser.update_strings([])
+    self.assertEqual(parser.vl_all["CLU11"]["CF_Clu_Vanz"], [])
+    parser.update_strings(strings[1])
+    self.assertEqual(parser.vl_all["CLU11"]["CF_Clu_Vanz"], [12])
+    self.assertEqual(parser.vl["CLU11"]["CF_Clu_Vanz"], 12)
+
+
+if __name__ == "__main__":
+  unittest.main()
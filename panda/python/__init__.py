@@ -8,6 +8,7 @@ import hashlib
 import binascii
 import datetime
 import logging
+import numpy as np
 from functools import wraps, partial
 from typing import Optional
 from itertools import accumulate
@@ -30,65 +31,89 @@ DLC_TO_LEN = [0, 1, 2, 3, 4, 5, 6, 7, 8, 12, 16, 20, 24, 32, 48, 64]
 LEN_TO_DLC = {length: dlc for (dlc, length) in enumerate(DLC_TO_LEN)}
 
 
+# above this many packets, unpack_can_buffer checks all checksums with one NumPy call
+CHECKSUM_NUMPY_MIN_PACKETS = 16
+
+
 def calculate_checksum(data):
   res = 0
   for b in data:
     res ^= b
   return res
 
+def _xor_bytes(v):
+  # XOR of the bytes of a little endian int of up to 128 bytes
+  v ^= v >> 512
+  v ^= v >> 256
+  v ^= v >> 128
+  v ^= v >> 64
+  v ^= v >> 32
+  v ^= v >> 16
+  v ^= v >> 8
+  return v & 0xFF
+
 def pack_can_buffer(arr):
-  snds = [b'']
+  snds = []
+  buf = bytearray()
+  start = 0
   for address, _, dat, bus in arr:
     assert len(dat) in LEN_TO_DLC
     #logging.debug("  W 0x%x: 0x%s", address, dat.hex())
 
     extended = 1 if address >= 0x800 else 0
-    data_len_code = LEN_TO_DLC[len(dat)]
-    header = bytearray(CANPACKET_HEAD_SIZE)
     word_4b = address << 3 | extended << 2
-    header[0] = (data_len_code << 4) | (bus << 1)
-    header[1] = word_4b & 0xFF
-    header[2] = (word_4b >> 8) & 0xFF
-    header[3] = (word_4b >> 16) & 0xFF
-    header[4] = (word_4b >> 24) & 0xFF
-    header[5] = calculate_checksum(header[:5] + dat)
+    header_0 = (LEN_TO_DLC[len(dat)] << 4) | (bus << 1)
+    checksum = header_0 ^ _xor_bytes(word_4b ^ int.from_bytes(dat, "little"))
+    buf += struct.pack("<BIB", header_0, word_4b, checksum)
+    buf += dat
 
-    snds[-1] += header + dat
-    if len(snds[-1]) > 256: # Limit chunks to 256 bytes
-      snds.append(b'')
+    if len(buf) - start > 256: # Limit chunks to 256 bytes
+      snds.append(bytes(buf[start:]))
+      start = len(buf)
 
+  snds.append(bytes(buf[start:]))
   return snds
 
 def unpack_can_buffer(dat):
   ret = []
 
-  while len(dat) >= CANPACKET_HEAD_SIZE:
-    data_len = DLC_TO_LEN[(dat[0]>>4)]
+  # find the complete packets first, without copying dat
+  packets = []
+  pos = 0
+  while len(dat) - pos >= CANPACKET_HEAD_SIZE:
+    end = pos + CANPACKET_HEAD_SIZE + DLC_TO_LEN[(dat[pos]>>4)]
+
+    # we need more from the next transfer
+    if end > len(dat):
+      break
+
+    packets.append((pos, end))
+    pos = end
 
-    header = dat[:CANPACKET_HEAD_SIZE]
+  mv = memoryview(dat)
+  batch_checked = len(packets) >= CHECKSUM_NUMPY_MIN_PACKETS
+  if batch_checked:
+    checksums = np.bitwise_xor.reduceat(np.frombuffer(mv[:pos], dtype=np.uint8), [start for start, _ in packets])
+    assert not checksums.any(), "CAN packet checksum incorrect"
 
-    bus = (header[0] >> 1) & 0x7
-    address = (header[4] << 24 | header[3] << 16 | header[2] << 8 | header[1]) >> 3
+  for start, end in packets:
+    if not batch_checked:
+      assert _xor_bytes(int.from_bytes(mv[start:end], "little")) == 0, "CAN packet checksum incorrect"
 
-    if (header[1] >> 1) & 0x1:
+    header_0, word_4b = struct.unpack_from("<BI", dat, start)
+    bus = (header_0 >> 1) & 0x7
+    address = word_4b >> 3
+
+    if (word_4b >> 1) & 0x1:
       # returned
       bus += 128
-    if header[1] & 0x1:
+    if word_4b & 0x1:
       # rejected
       bus += 192
 
-    # we need more from the next transfer
-    if data_len > len(dat) - CANPACKET_HEAD_SIZE:
-      break
-
-    assert calculate_checksum(dat[:(CANPACKET_HEAD_SIZE+data_len)]) == 0, "CAN packet checksum incorrect"
-
-    data = dat[CANPACKET_HEAD_SIZE:(CANPACKET_HEAD_SIZE+data_len)]
-    dat = dat[(CANPACKET_HEAD_SIZE+data_len):]
-
-    ret.append((address, 0, data, bus))
+    ret.append((address, 0, bytes(mv[start+CANPACKET_HEAD_SIZE:end]), bus))
 
-  return (ret, dat)
+  return (ret, dat[pos:])
 
 
 def ensure_version(desc, lib_field, panda_field, fn):
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+import argparse
+import random
+import time
+
+from panda import pack_can_buffer, unpack_can_buffer
+
+# max receive batch size of Panda.can_recv
+USB_READ_SIZE = 16384
+
+# CAN-FD bus traffic, mostly short frames with a share of 32 and 64 byte frames
+CANFD_LENGTHS = [8] * 6 + [16, 24, 32, 64, 64]
+
+
+def random_msgs(n, lengths):
+  return [(random.randint(1, 0x7FF), 0, bytes(random.getrandbits(8) for _ in range(random.choice(lengths))), random.randrange(3))
+          for _ in range(n)]
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Throughput of packing and unpacking panda CAN buffers")
+  parser.add_argument("--msgs", type=int, default=20000)
+  parser.add_argument("-n", type=int, default=10)
+  args = parser.parse_args()
+
+  for name, lengths in (("CAN", [8]), ("CAN-FD", CANFD_LENGTHS)):
+    msgs = random_msgs(args.msgs, lengths)
+
+    t = time.monotonic()
+    for _ in range(args.n):
+      dat = b''.join(pack_can_buffer(msgs))
+    dt = (time.monotonic() - t) / args.n
+    print(f"{name:>6} pack:   {len(msgs) / dt / 1e3:8.1f} k msgs/s, {len(dat) / dt / 1e6:6.1f} MB/s")
+
+    # as Panda.can_recv, fixed size reads with the incomplete tail carried over to the next one
+    reads = [dat[i:i+USB_READ_SIZE] for i in range(0, len(dat), USB_READ_SIZE)]
+    t = time.monotonic()
+    for _ in range(args.n):
+      rest = b''
+      unpacked = []
+      for r in reads:
+        ret, rest = unpack_can_buffer(rest + r)
+        unpacked.extend(ret)
+    dt = (time.monotonic() - t) / args.n
+    assert unpacked == msgs
+    print(f"{name:>6} unpack: {len(msgs) / dt / 1e3:8.1f} k msgs/s, {len(dat) / dt / 1e6:6.1f} MB/s")
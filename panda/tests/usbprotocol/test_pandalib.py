@@ -1,23 +1,51 @@
 #!/usr/bin/env python3
 import random
 import unittest
-from panda import pack_can_buffer, unpack_can_buffer
+from panda import DLC_TO_LEN, pack_can_buffer, unpack_can_buffer
+
+
+def random_msgs(n, lengths):
+  to_pack = []
+  for _ in range(n):
+    address = random.randint(1, 0x1FFFFFFF)
+    data = bytes([random.getrandbits(8) for _ in range(random.choice(lengths))])
+    to_pack.append((address, 0, data, random.randrange(3)))
+  return to_pack
 
 
 class PandaTestPackUnpack(unittest.TestCase):
   def test_panda_lib_pack_unpack(self):
-    to_pack = []
-    for _ in range(10000):
-      address = random.randint(1, 0x1FFFFFFF)
-      data = bytes([random.getrandbits(8) for _ in range(random.randrange(1, 9))])
-      to_pack.append((address, 0, data, 0))
+    to_pack = random_msgs(10000, range(1, 9))
 
     packed = pack_can_buffer(to_pack)
     unpacked = []
     for dat in packed:
-      unpacked.extend(unpack_can_buffer(dat))
+      msgs, rest = unpack_can_buffer(dat)
+      unpacked.extend(msgs)
+      assert rest == b''
+
+    assert unpacked == to_pack
 
+  def test_pack_unpack_canfd_split(self):
+    # USB and SPI reads don't end on packet boundaries, the remainder is prepended to the next read
+    to_pack = random_msgs(2000, DLC_TO_LEN)
+    dat = b''.join(pack_can_buffer(to_pack))
+
+    unpacked = []
+    rest = b''
+    for i in range(0, len(dat), 1000):
+      msgs, rest = unpack_can_buffer(rest + dat[i:i+1000])
+      unpacked.extend(msgs)
+
+    assert rest == b''
     assert unpacked == to_pack
 
+  def test_unpack_bad_checksum(self):
+    for n in (1, 100):
+      dat = bytearray(b''.join(pack_can_buffer(random_msgs(n, range(1, 9)))))
+      dat[-1] ^= 0x1
+      with self.assertRaises(AssertionError):
+        unpack_can_buffer(bytes(dat))
+
 if __name__ == "__main__":
   unittest.main()
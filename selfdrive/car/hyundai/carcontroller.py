@@ -13,10 +13,9 @@ from openpilot.selfdrive.car.hyundai.carstate import GearShifter
 from openpilot.selfdrive.controls.lib.desire_helper import LANE_CHANGE_SPEED_MIN
 from openpilot.selfdrive.car.hyundai.navicontrol  import NaviControl
 
-from openpilot.common.params import Params
+from openpilot.common.params import Params, CachedParams, ParamsSchema, bool_param, float_param, int_param, int_list_param
 import openpilot.common.log as trace1
 from random import randint
-from decimal import Decimal
 
 VisualAlert = car.CarControl.HUDControl.VisualAlert
 LongCtrlState = car.CarControl.Actuators.LongControlState
@@ -30,6 +29,54 @@ MAX_ANGLE = int(Params().get("AvoidLKASFaultMaxAngle", encoding="utf8")) # 85
 MAX_ANGLE_FRAMES = int(Params().get("AvoidLKASFaultMaxFrame", encoding="utf8")) # 89
 MAX_ANGLE_CONSECUTIVE_FRAMES = 2
 
+CARCONTROLLER_PARAMS = ParamsSchema("CarControllerTuning",
+  mode_change_switch=int_param("CruiseStatemodeSelInit"),
+  opkr_variablecruise=bool_param("OpkrVariableCruise"),
+  opkr_autoresume=bool_param("OpkrAutoResume"),
+  opkr_cruisegap_auto_adj=bool_param("CruiseGapAdjust"),
+  opkr_cruise_auto_res=bool_param("CruiseAutoRes"),
+  opkr_cruise_auto_res_option=int_param("AutoResOption"),
+  opkr_cruise_auto_res_condition=int_param("AutoResCondition"),
+  opkr_turnsteeringdisable=bool_param("OpkrTurnSteeringDisable"),
+  opkr_maxanglelimit=int_param("OpkrMaxAngleLimit"),
+  ufc_mode_enabled=bool_param("UFCModeEnabled"),
+  ldws_fix=bool_param("LdwsCarFix"),
+  radar_helper_option=int_param("RadarLongHelper"),
+  stopping_dist_adj_enabled=bool_param("StoppingDistAdj"),
+  standstill_resume_alt=bool_param("StandstillResumeAlt"),
+  auto_res_delay=int_param("AutoRESDelay"),
+  stoppingdist=float_param("StoppingDist", '0.1'),
+  standstill_res_count=int_param("RESCountatStandstill"),
+  auto_res_limit_sec=int_param("AutoResLimitTime"),
+  steerMax_base=int_param("SteerMaxBaseAdj"),
+  steerDeltaUp_base=int_param("SteerDeltaUpBaseAdj"),
+  steerDeltaDown_base=int_param("SteerDeltaDownBaseAdj"),
+  steerMax_Max=int_param("SteerMaxAdj"),
+  steerDeltaUp_Max=int_param("SteerDeltaUpAdj"),
+  steerDeltaDown_Max=int_param("SteerDeltaDownAdj"),
+  variable_steer_max=bool_param("OpkrVariableSteerMax"),
+  variable_steer_delta=bool_param("OpkrVariableSteerDelta"),
+  osm_spdlimit_enabled=bool_param("OSMSpeedLimitEnable"),
+  stock_safety_decel_enabled=bool_param("UseStockDecelOnSS"),
+  joystick_debug_mode=bool_param("JoystickDebugMode"),
+  to_avoid_lkas_fault_enabled=bool_param("AvoidLKASFaultEnabled"),
+  to_avoid_lkas_fault_max_angle=int_param("AvoidLKASFaultMaxAngle"),
+  to_avoid_lkas_fault_max_frame=int_param("AvoidLKASFaultMaxFrame"),
+  enable_steer_more=bool_param("AvoidLKASFaultBeyond"),
+  no_mdps_mods=bool_param("NoSmartMDPS"),
+  user_specific_feature=int_param("UserSpecificFeature"),
+  gap_by_spd_on=bool_param("CruiseGapBySpdOn"),
+  gap_by_spd_spd=int_list_param("CruiseGapBySpdSpd"),
+  gap_by_spd_gap=int_list_param("CruiseGapBySpdGap"),
+  try_early_stop=bool_param("OPKREarlyStop"),
+  e2e_standstill_enable=bool_param("DepartChimeAtResume"),
+  experimental_long_enabled=bool_param("ExperimentalLongitudinalEnabled"),
+  experimental_mode=bool_param("ExperimentalMode"),
+  live_torque_params=bool_param("OpkrLiveTorque"),
+  gapsettingdance=int_param("OpkrCruiseGapSet"),
+  opkr_long_alt=int_param("OPKRLongAlt"),
+)
+
 
 def process_hud_alert(enabled, fingerprint, hud_control):
   sys_warning = (hud_control.visualAlert in (VisualAlert.steerRequired, VisualAlert.ldw))
@@ -98,26 +145,28 @@ class CarController:
 
     self.v_cruise_kph_auto_res = 0
 
-    self.c_params = Params()
-    self.mode_change_switch = int(self.c_params.get("CruiseStatemodeSelInit", encoding="utf8"))
-    self.opkr_variablecruise = self.c_params.get_bool("OpkrVariableCruise")
-    self.opkr_autoresume = self.c_params.get_bool("OpkrAutoResume")
-    self.opkr_cruisegap_auto_adj = self.c_params.get_bool("CruiseGapAdjust")
-    self.opkr_cruise_auto_res = self.c_params.get_bool("CruiseAutoRes")
-    self.opkr_cruise_auto_res_option = int(self.c_params.get("AutoResOption", encoding="utf8"))
-    self.opkr_cruise_auto_res_condition = int(self.c_params.get("AutoResCondition", encoding="utf8"))
-
-    self.opkr_turnsteeringdisable = self.c_params.get_bool("OpkrTurnSteeringDisable")
-    self.opkr_maxanglelimit = float(int(self.c_params.get("OpkrMaxAngleLimit", encoding="utf8")))
-    self.ufc_mode_enabled = self.c_params.get_bool("UFCModeEnabled")
-    self.ldws_fix = self.c_params.get_bool("LdwsCarFix")
-    self.radar_helper_option = int(self.c_params.get("RadarLongHelper", encoding="utf8"))
-    self.stopping_dist_adj_enabled = self.c_params.get_bool("StoppingDistAdj")
-    self.standstill_resume_alt = self.c_params.get_bool("StandstillResumeAlt")
-    self.auto_res_delay = int(self.c_params.get("AutoRESDelay", encoding="utf8")) * 100
+    # kept for the live tune values read while driving
+    self.c_params = CachedParams()
+    p = CARCONTROLLER_PARAMS.load()
+    self.mode_change_switch = p.mode_change_switch
+    self.opkr_variablecruise = p.opkr_variablecruise
+    self.opkr_autoresume = p.opkr_autoresume
+    self.opkr_cruisegap_auto_adj = p.opkr_cruisegap_auto_adj
+    self.opkr_cruise_auto_res = p.opkr_cruise_auto_res
+    self.opkr_cruise_auto_res_option = p.opkr_cruise_auto_res_option
+    self.opkr_cruise_auto_res_condition = p.opkr_cruise_auto_res_condition
+
+    self.opkr_turnsteeringdisable = p.opkr_turnsteeringdisable
+    self.opkr_maxanglelimit = float(p.opkr_maxanglelimit)
+    self.ufc_mode_enabled = p.ufc_mode_enabled
+    self.ldws_fix = p.ldws_fix
+    self.radar_helper_option = p.radar_helper_option
+    self.stopping_dist_adj_enabled = p.stopping_dist_adj_enabled
+    self.standstill_resume_alt = p.standstill_resume_alt
+    self.auto_res_delay = p.auto_res_delay * 100
     self.auto_res_delay_timer = 0
     self.stopped = False
-    self.stoppingdist = float(Decimal(self.c_params.get("StoppingDist", encoding="utf8"))*Decimal('0.1'))
+    self.stoppingdist = p.stoppingdist
 
     self.longcontrol = self.CP.openpilotLongitudinalControl
     #self.scc_live is true because CP.radarUnavailable is False
@@ -134,7 +183,7 @@ class CarController:
     self.cruise_gap_adjusting = False
     self.standstill_fault_reduce_timer = 0
     self.standstill_res_button = False
-    self.standstill_res_count = int(self.c_params.get("RESCountatStandstill", encoding="utf8"))
+    self.standstill_res_count = p.standstill_res_count
 
     self.standstill_status = 0
     self.standstill_status_timer = 0
@@ -142,19 +191,19 @@ class CarController:
     self.switch_timer2 = 0
     self.auto_res_timer = 0
     self.auto_res_limit_timer = 0
-    self.auto_res_limit_sec = int(self.c_params.get("AutoResLimitTime", encoding="utf8")) * 100
+    self.auto_res_limit_sec = p.auto_res_limit_sec * 100
     self.auto_res_starting = False
     self.res_speed = 0
     self.res_speed_timer = 0
     self.autohold_popup_timer = 0
     self.autohold_popup_switch = False
 
-    self.steerMax_base = int(self.c_params.get("SteerMaxBaseAdj", encoding="utf8"))
-    self.steerDeltaUp_base = int(self.c_params.get("SteerDeltaUpBaseAdj", encoding="utf8"))
-    self.steerDeltaDown_base = int(self.c_params.get("SteerDeltaDownBaseAdj", encoding="utf8"))
-    self.steerMax_Max = int(self.c_params.get("SteerMaxAdj", encoding="utf8"))
-    self.steerDeltaUp_Max = int(self.c_params.get("SteerDeltaUpAdj", encoding="utf8"))
-    self.steerDeltaDown_Max = int(self.c_params.get("SteerDeltaDownAdj", encoding="utf8"))
+    self.steerMax_base = p.steerMax_base
+    self.steerDeltaUp_base = p.steerDeltaUp_base
+    self.steerDeltaDown_base = p.steerDeltaDown_base
+    self.steerMax_Max = p.steerMax_Max
+    self.steerDeltaUp_Max = p.steerDeltaUp_Max
+    self.steerDeltaDown_Max = p.steerDeltaDown_Max
     self.model_speed = 255.0
     self.steerMax_range = [self.steerMax_Max, self.steerMax_base, self.steerMax_base]
     self.steerDeltaUp_range = [self.steerDeltaUp_Max, self.steerDeltaUp_base, self.steerDeltaUp_base]
@@ -163,11 +212,11 @@ class CarController:
     self.steerDeltaUp = 0
     self.steerDeltaDown = 0
 
-    self.variable_steer_max = self.c_params.get_bool("OpkrVariableSteerMax")
-    self.variable_steer_delta = self.c_params.get_bool("OpkrVariableSteerDelta")
-    self.osm_spdlimit_enabled = self.c_params.get_bool("OSMSpeedLimitEnable")
-    self.stock_safety_decel_enabled = self.c_params.get_bool("UseStockDecelOnSS")
-    self.joystick_debug_mode = self.c_params.get_bool("JoystickDebugMode")
+    self.variable_steer_max = p.variable_steer_max
+    self.variable_steer_delta = p.variable_steer_delta
+    self.osm_spdlimit_enabled = p.osm_spdlimit_enabled
+    self.stock_safety_decel_enabled = p.stock_safety_decel_enabled
+    self.joystick_debug_mode = p.joystick_debug_mode
     #self.stopsign_enabled = self.c_params.get_bool("StopAtStopSign")
 
     self.smooth_start = False
@@ -183,17 +232,17 @@ class CarController:
     self.cruise_init = False
     self.change_accel_fast = False
 
-    self.to_avoid_lkas_fault_enabled = self.c_params.get_bool("AvoidLKASFaultEnabled")
-    self.to_avoid_lkas_fault_max_angle = int(self.c_params.get("AvoidLKASFaultMaxAngle", encoding="utf8"))
-    self.to_avoid_lkas_fault_max_frame = int(self.c_params.get("AvoidLKASFaultMaxFrame", encoding="utf8"))
-    self.enable_steer_more = self.c_params.get_bool("AvoidLKASFaultBeyond")
-    self.no_mdps_mods = self.c_params.get_bool("NoSmartMDPS")
+    self.to_avoid_lkas_fault_enabled = p.to_avoid_lkas_fault_enabled
+    self.to_avoid_lkas_fault_max_angle = p.to_avoid_lkas_fault_max_angle
+    self.to_avoid_lkas_fault_max_frame = p.to_avoid_lkas_fault_max_frame
+    self.enable_steer_more = p.enable_steer_more
+    self.no_mdps_mods = p.no_mdps_mods
 
-    self.user_specific_feature = int(self.c_params.get("UserSpecificFeature", encoding="utf8"))
+    self.user_specific_feature = p.user_specific_feature
 
-    self.gap_by_spd_on = self.c_params.get_bool("CruiseGapBySpdOn")
-    self.gap_by_spd_spd = list(map(int, Params().get("CruiseGapBySpdSpd", encoding="utf8").split(',')))
-    self.gap_by_spd_gap = list(map(int, Params().get("CruiseGapBySpdGap", encoding="utf8").split(',')))
+    self.gap_by_spd_on = p.gap_by_spd_on
+    self.gap_by_spd_spd = list(p.gap_by_spd_spd)
+    self.gap_by_spd_gap = list(p.gap_by_spd_gap)
     self.gap_by_spd_on_buffer1 = 0
     self.gap_by_spd_on_buffer2 = 0
     self.gap_by_spd_on_buffer3 = 0
@@ -221,7 +270,7 @@ class CarController:
     self.lkas_temp_disabled = False
     self.lkas_temp_disabled_timer = 0
 
-    self.try_early_stop = self.c_params.get_bool("OPKREarlyStop")
+    self.try_early_stop = p.try_early_stop
     self.try_early_stop_retrieve = False
     self.try_early_stop_org_gap = 4.0
 
@@ -235,19 +284,19 @@ class CarController:
     self.vrel_delta_timer2 = 0
     self.vrel_delta_timer3 = 0
 
-    self.e2e_standstill_enable = self.c_params.get_bool("DepartChimeAtResume")
+    self.e2e_standstill_enable = p.e2e_standstill_enable
     self.e2e_standstill = False
     self.e2e_standstill_stat = False
     self.e2e_standstill_timer = 0
     self.e2e_standstill_timer_buf = 0
 
-    self.experimental_long_enabled = self.c_params.get_bool("ExperimentalLongitudinalEnabled")
-    self.experimental_mode = self.c_params.get_bool("ExperimentalMode")
-    self.live_torque_params = self.c_params.get_bool("OpkrLiveTorque")
-    self.gapsettingdance = int(self.c_params.get("OpkrCruiseGapSet", encoding="utf8"))
+    self.experimental_long_enabled = p.experimental_long_enabled
+    self.experimental_mode = p.experimental_mode
+    self.live_torque_params = p.live_torque_params
+    self.gapsettingdance = p.gapsettingdance
     self.prev_gapButton = 0
 
-    self.opkr_long_alt = True if int(self.c_params.get("OPKRLongAlt", encoding="utf8")) in (1, 2) else False
+    self.opkr_long_alt = p.opkr_long_alt in (1, 2)
 
     self.btnsignal = 0
     self.second2 = 0
@@ -1236,8 +1285,8 @@ class CarController:
       # self.standstill_res_count = int(self.c_params.get("RESCountatStandstill", encoding="utf8"))
       # self.opkr_cruisegap_auto_adj = self.c_params.get_bool("CruiseGapAdjust")
       # self.to_avoid_lkas_fault_enabled = self.c_params.get_bool("AvoidLKASFaultEnabled")
-      self.to_avoid_lkas_fault_max_angle = int(self.c_params.get("AvoidLKASFaultMaxAngle", encoding="utf8"))
-      self.to_avoid_lkas_fault_max_frame = int(self.c_params.get("AvoidLKASFaultMaxFrame", encoding="utf8"))
+      self.to_avoid_lkas_fault_max_angle = self.c_params.get_int("AvoidLKASFaultMaxAngle")
+      self.to_avoid_lkas_fault_max_frame = self.c_params.get_int("AvoidLKASFaultMaxFrame")
       # self.e2e_long_enabled = self.c_params.get_bool("E2ELong")
       # self.stopsign_enabled = self.c_params.get_bool("StopAtStopSign")
       # self.gap_by_spd_on = self.c_params.get_bool("CruiseGapBySpdOn")
@@ -1245,21 +1294,21 @@ class CarController:
       # self.usf = int(Params().get("UserSpecificFeature", encoding="utf8"))
       if self.c_params.get_bool("OpkrLiveTunePanelEnable"):
         if self.CP.lateralTuning.which() == 'pid':
-          self.str_log2 = 'T={:0.2f}/{:0.3f}/{:0.1f}/{:0.5f}'.format(float(Decimal(self.c_params.get("PidKp", encoding="utf8"))*Decimal('0.01')), \
-          float(Decimal(self.c_params.get("PidKi", encoding="utf8"))*Decimal('0.001')), float(Decimal(self.c_params.get("PidKd", encoding="utf8"))*Decimal('0.01')), \
-          float(Decimal(self.c_params.get("PidKf", encoding="utf8"))*Decimal('0.00001')))
+          self.str_log2 = 'T={:0.2f}/{:0.3f}/{:0.1f}/{:0.5f}'.format(self.c_params.get_float("PidKp", '0.01'), \
+          self.c_params.get_float("PidKi", '0.001'), self.c_params.get_float("PidKd", '0.01'), \
+          self.c_params.get_float("PidKf", '0.00001'))
         elif self.CP.lateralTuning.which() == 'indi':
-          self.str_log2 = 'T={:03.1f}/{:03.1f}/{:03.1f}/{:03.1f}'.format(float(Decimal(self.c_params.get("InnerLoopGain", encoding="utf8"))*Decimal('0.1')), \
-          float(Decimal(self.c_params.get("OuterLoopGain", encoding="utf8"))*Decimal('0.1')), float(Decimal(self.c_params.get("TimeConstant", encoding="utf8"))*Decimal('0.1')), \
-          float(Decimal(self.c_params.get("ActuatorEffectiveness", encoding="utf8"))*Decimal('0.1')))
+          self.str_log2 = 'T={:03.1f}/{:03.1f}/{:03.1f}/{:03.1f}'.format(self.c_params.get_float("InnerLoopGain", '0.1'), \
+          self.c_params.get_float("OuterLoopGain", '0.1'), self.c_params.get_float("TimeConstant", '0.1'), \
+          self.c_params.get_float("ActuatorEffectiveness", '0.1'))
         elif self.CP.lateralTuning.which() == 'lqr':
-          self.str_log2 = 'T={:04.0f}/{:05.3f}/{:07.5f}'.format(float(Decimal(self.c_params.get("Scale", encoding="utf8"))*Decimal('1.0')), \
-          float(Decimal(self.c_params.get("LqrKi", encoding="utf8"))*Decimal('0.001')), float(Decimal(self.c_params.get("DcGain", encoding="utf8"))*Decimal('0.00001')))
+          self.str_log2 = 'T={:04.0f}/{:05.3f}/{:07.5f}'.format(self.c_params.get_float("Scale", '1.0'), \
+          self.c_params.get_float("LqrKi", '0.001'), self.c_params.get_float("DcGain", '0.00001'))
         elif self.CP.lateralTuning.which() == 'torque':
-          self.str_log2 = 'T={:0.1f}/{:0.1f}/{:0.1f}/{:0.1f}/{:0.3f}'.format(float(Decimal(self.c_params.get("TorqueMaxLatAccel", encoding="utf8"))*Decimal('0.1')), \
-          float(Decimal(self.c_params.get("TorqueKp", encoding="utf8"))*Decimal('0.1')), \
-          float(Decimal(self.c_params.get("TorqueKf", encoding="utf8"))*Decimal('0.1')), float(Decimal(self.c_params.get("TorqueKi", encoding="utf8"))*Decimal('0.1')), \
-          float(Decimal(self.c_params.get("TorqueFriction", encoding="utf8")) * Decimal('0.001')))
+          self.str_log2 = 'T={:0.1f}/{:0.1f}/{:0.1f}/{:0.1f}/{:0.3f}'.format(self.c_params.get_float("TorqueMaxLatAccel", '0.1'), \
+          self.c_params.get_float("TorqueKp", '0.1'), \
+          self.c_params.get_float("TorqueKf", '0.1'), self.c_params.get_float("TorqueKi", '0.1'), \
+          self.c_params.get_float("TorqueFriction", '0.001'))
       elif self.CP.lateralTuning.which() == 'torque' and self.live_torque_params:
         torque_params = self.sm['liveTorqueParameters']
         self.str_log2 = 'T={:0.2f}/{:0.2f}/{:0.3f}'.format(torque_params.latAccelFactorFiltered, torque_params.latAccelOffsetFiltered, torque_params.frictionCoefficientFiltered)
@@ -8,10 +8,34 @@ from openpilot.common.numpy_fast import clip, interp
 from cereal import log
 import cereal.messaging as messaging
 from random import randint, randrange
-from openpilot.common.params import Params
+from openpilot.common.params import Params, ParamsSchema, bool_param, int_list_param, int_param, str_param
 
 LaneChangeState = log.LateralPlan.LaneChangeState
 
+NAVI_CONTROL_PARAMS = ParamsSchema("NaviControlParams",
+  map_spdlimit_offset=int_param("OpkrSpeedLimitOffset"),
+  map_spdlimit_offset_option=int_param("OpkrSpeedLimitOffsetOption"),
+  safetycam_decel_dist_gain=int_param("SafetyCamDecelDistGain"),
+  vision_curv_speed_c=int_list_param("VCurvSpeedC"),
+  vision_curv_speed_t=int_list_param("VCurvSpeedT"),
+  vision_curv_speed_cmph=int_list_param("VCurvSpeedCMPH"),
+  vision_curv_speed_tmph=int_list_param("VCurvSpeedTMPH"),
+  osm_curv_speed_c=int_list_param("OCurvSpeedC"),
+  osm_curv_speed_t=int_list_param("OCurvSpeedT"),
+  osm_custom_spdlimit_c=int_list_param("OSMCustomSpeedLimitC"),
+  osm_custom_spdlimit_t=int_list_param("OSMCustomSpeedLimitT"),
+  stock_navi_info_enabled=bool_param("StockNaviSpeedEnabled"),
+  osm_speedlimit_enabled=bool_param("OSMSpeedLimitEnable"),
+  speedlimit_decel_off=bool_param("SpeedLimitDecelOff"),
+  curv_decel_option=int_param("CurvDecelOption"),
+  drive_routine_on=bool_param("RoutineDriveOn"),
+  # only read with RoutineDriveOn
+  drive_routine_option=str_param("RoutineDriveOption", default=""),
+  road_list=str_param("RoadList", default=""),
+  decel_on_speedbump=bool_param("OPKRSpeedBump"),
+  navi_sel=int_param("OPKRNaviSelect"),
+)
+
 class NaviControl():
   def __init__(self):
 
@@ -26,9 +50,10 @@ class NaviControl():
 
     self.gasPressed_old = 0
 
-    self.map_spdlimit_offset = int(Params().get("OpkrSpeedLimitOffset", encoding="utf8"))
-    self.map_spdlimit_offset_option = int(Params().get("OpkrSpeedLimitOffsetOption", encoding="utf8"))
-    self.safetycam_decel_dist_gain = int(Params().get("SafetyCamDecelDistGain", encoding="utf8"))
+    p = NAVI_CONTROL_PARAMS.load()
+    self.map_spdlimit_offset = p.map_spdlimit_offset
+    self.map_spdlimit_offset_option = p.map_spdlimit_offset_option
+    self.safetycam_decel_dist_gain = p.safetycam_decel_dist_gain
 
     self.map_speed_block = False
     self.map_speed_dist = 0
@@ -40,39 +65,39 @@ class NaviControl():
     self.cutInControl = False
     self.driverSccSetControl = False
     self.ctrl_speed = 0
-    self.vision_curv_speed_c = list(map(int, Params().get("VCurvSpeedC", encoding="utf8").split(',')))
-    self.vision_curv_speed_t = list(map(int, Params().get("VCurvSpeedT", encoding="utf8").split(',')))
-    self.vision_curv_speed_cmph = list(map(int, Params().get("VCurvSpeedCMPH", encoding="utf8").split(',')))
-    self.vision_curv_speed_tmph = list(map(int, Params().get("VCurvSpeedTMPH", encoding="utf8").split(',')))
+    self.vision_curv_speed_c = list(p.vision_curv_speed_c)
+    self.vision_curv_speed_t = list(p.vision_curv_speed_t)
+    self.vision_curv_speed_cmph = list(p.vision_curv_speed_cmph)
+    self.vision_curv_speed_tmph = list(p.vision_curv_speed_tmph)
 
-    self.osm_curv_speed_c = list(map(int, Params().get("OCurvSpeedC", encoding="utf8").split(',')))
-    self.osm_curv_speed_t = list(map(int, Params().get("OCurvSpeedT", encoding="utf8").split(',')))
-    self.osm_custom_spdlimit_c = list(map(int, Params().get("OSMCustomSpeedLimitC", encoding="utf8").split(',')))
-    self.osm_custom_spdlimit_t = list(map(int, Params().get("OSMCustomSpeedLimitT", encoding="utf8").split(',')))
+    self.osm_curv_speed_c = list(p.osm_curv_speed_c)
+    self.osm_curv_speed_t = list(p.osm_curv_speed_t)
+    self.osm_custom_spdlimit_c = list(p.osm_custom_spdlimit_c)
+    self.osm_custom_spdlimit_t = list(p.osm_custom_spdlimit_t)
 
     self.osm_wait_timer = 0
-    self.stock_navi_info_enabled = Params().get_bool("StockNaviSpeedEnabled")
-    self.osm_speedlimit_enabled = Params().get_bool("OSMSpeedLimitEnable")
-    self.speedlimit_decel_off = Params().get_bool("SpeedLimitDecelOff")
-    self.curv_decel_option = int(Params().get("CurvDecelOption", encoding="utf8"))
+    self.stock_navi_info_enabled = p.stock_navi_info_enabled
+    self.osm_speedlimit_enabled = p.osm_speedlimit_enabled
+    self.speedlimit_decel_off = p.speedlimit_decel_off
+    self.curv_decel_option = p.curv_decel_option
     self.cut_in = False
     self.cut_in_run_timer = 0
 
-    self.drive_routine_on_sl = Params().get_bool("RoutineDriveOn")
+    self.drive_routine_on_sl = p.drive_routine_on
     if self.drive_routine_on_sl:
-      option_list = list(Params().get("RoutineDriveOption", encoding="utf8"))
+      option_list = list(p.drive_routine_option)
       if '1' in option_list:
         self.drive_routine_on_sl = True
       else:
         self.drive_routine_on_sl = False
     try:
-      self.roadname_and_sl = Params().get("RoadList", encoding="utf8").strip().splitlines()[1].split(',')
+      self.roadname_and_sl = p.road_list.strip().splitlines()[1].split(',')
     except:
       self.roadname_and_sl = ""
       pass
 
-    self.decel_on_speedbump = Params().get_bool("OPKRSpeedBump")
-    self.navi_sel = int(Params().get("OPKRNaviSelect", encoding="utf8"))
+    self.decel_on_speedbump = p.decel_on_speedbump
+    self.navi_sel = p.navi_sel
 
     self.na_timer = 0
     self.t_interval = 7
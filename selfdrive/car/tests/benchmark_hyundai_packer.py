@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+import argparse
+import time
+from types import SimpleNamespace
+
+from opendbc.can.packer import CANPacker
+from opendbc.can.parser import CANParser
+from openpilot.selfdrive.car.hyundai import hyundaican
+from openpilot.selfdrive.car.hyundai.values import CAR
+
+DBC = "hyundai_kia_generic"
+CAR_FINGERPRINT = CAR.KIA_STINGER
+
+# signals copied from the stock message, followed by the ones the carcontroller sets every frame
+LKAS11_STOCK = ["CF_Lkas_LdwsActivemode", "CF_Lkas_HbaLamp", "CF_Lkas_FcwBasReq", "CF_Lkas_HbaSysState", "CF_Lkas_FcwOpt",
+                "CF_Lkas_HbaOpt", "CF_Lkas_FcwSysState", "CF_Lkas_FcwCollisionWarning", "CF_Lkas_FusionState",
+                "CF_Lkas_FcwOpt_USM", "CF_Lkas_LdwsOpt_USM"]
+LKAS11_SET = ["CF_Lkas_LdwsSysState", "CF_Lkas_SysWarning", "CF_Lkas_LdwsLHWarning", "CF_Lkas_LdwsRHWarning",
+              "CR_Lkas_StrToqReq", "CF_Lkas_ActToi", "CF_Lkas_ToiFlt", "CF_Lkas_MsgCount", "CF_Lkas_Chksum"]
+MDPS12_SET = ["CF_Mdps_ToiActive", "CF_Mdps_ToiUnavail", "CF_Mdps_MsgCount2", "CF_Mdps_Chksum2"]
+CLU11_STOCK = ["CF_Clu_CruiseSwMain", "CF_Clu_SldMainSW", "CF_Clu_ParityBit1", "CF_Clu_VanzDecimal", "CF_Clu_Vanz",
+               "CF_Clu_SPEED_UNIT", "CF_Clu_DetentOut", "CF_Clu_RheostatLevel", "CF_Clu_CluInfo", "CF_Clu_AmpInfo"]
+CLU11_SET = ["CF_Clu_CruiseSwState", "CF_Clu_AliveCnt1"]
+SCC11 = ["MainMode_ACC", "TauGapSet", "VSetDis", "AliveCounterACC", "ObjValid", "ACC_ObjStatus", "ACC_ObjLatPos",
+         "ACC_ObjRelSpd", "ACC_ObjDist", "SCCInfoDisplay"]
+SCC12 = ["ACCMode", "StopReq", "aReqRaw", "aReqValue", "CR_VSM_Alive", "CF_VSM_ConfMode", "AEB_Status", "CR_VSM_ChkSum"]
+SCC14 = ["ComfortBandUpper", "ComfortBandLower", "JerkUpperLimit", "JerkLowerLimit", "ACCMode", "ObjGap"]
+LFAHDA_MFC = ["LFA_Icon_State", "HDA_Active", "HDA_Icon_State", "HDA_VSetReq"]
+
+
+def stock_messages():
+  cp = CANParser(DBC, [("LKAS11", 0), ("MDPS12", 0), ("CLU11", 0)])
+  return {name: dict(cp.vl[name]) for name in ("LKAS11", "MDPS12", "CLU11")}
+
+
+def dict_frame(packer, frame, stock, apply_steer, accel):
+  """The messages a CAN Hyundai with openpilot longitudinal sends per frame, through the current hyundaican helpers"""
+  CP = SimpleNamespace(flags=0)
+  can_sends = [
+    hyundaican.create_lkas11(packer, frame, CAR_FINGERPRINT, apply_steer, True, False, stock["LKAS11"], False, 3, True,
+                             True, True, False, False, 0, False, CP),
+    hyundaican.create_mdps12(packer, frame, stock["MDPS12"]),
+    hyundaican.create_clu11(packer, frame, stock["CLU11"], 0),
+  ]
+  if frame % 2 == 0:
+    can_sends.extend(hyundaican.create_acc_commands(packer, True, accel, 1.0, frame // 2, True, 20, False, False, False, 2))
+  if frame % 5 == 0:
+    can_sends.append(hyundaican.create_lfahda_mfc(packer, True))
+  return can_sends
+
+
+def prepare(packer, stock):
+  mdps12_stock = [s for s in stock["MDPS12"] if s not in MDPS12_SET]
+  return SimpleNamespace(
+    lkas11=packer.prepare("LKAS11", LKAS11_STOCK + LKAS11_SET),
+    mdps12=packer.prepare("MDPS12", mdps12_stock + MDPS12_SET),
+    mdps12_stock=mdps12_stock,
+    clu11=packer.prepare("CLU11", CLU11_STOCK + CLU11_SET),
+    scc11=packer.prepare("SCC11", SCC11),
+    scc12=packer.prepare("SCC12", SCC12),
+    scc14=packer.prepare("SCC14", SCC14),
+    lfahda_mfc=packer.prepare("LFAHDA_MFC", LFAHDA_MFC),
+  )
+
+
+def prepared_frame(packer, msgs, frame, stock, apply_steer, accel):
+  """dict_frame with prepared messages, the messages without a checksum over their own data are packed in one call"""
+  lkas11 = stock["LKAS11"]
+  lkas11_values = [lkas11[s] for s in LKAS11_STOCK] + [3, 0, 0, 0, apply_steer, 1, 0, frame % 0x10, 0]
+  dat = packer.make_can_msg_prepared(msgs.lkas11, 0, lkas11_values)[2]
+  lkas11_values[-1] = (sum(dat[:6]) + dat[7]) % 256
+
+  mdps12 = stock["MDPS12"]
+  mdps12_values = [mdps12[s] for s in msgs.mdps12_stock] + [0, 1, frame % 0x100, 0]
+  dat = packer.make_can_msg_prepared(msgs.mdps12, 2, mdps12_values)[2]
+  mdps12_values[-1] = sum(dat) % 256
+
+  clu11 = stock["CLU11"]
+  batch = [
+    (msgs.lkas11, 0, lkas11_values),
+    (msgs.mdps12, 2, mdps12_values),
+    (msgs.clu11, 0, [clu11[s] for s in CLU11_STOCK] + [0, (clu11["CF_Clu_AliveCnt1"] + 1) % 0x10]),
+  ]
+
+  if frame % 2 == 0:
+    idx = frame // 2
+    scc12_values = [1, 0, accel, accel, idx % 0xF, 1, 1, 0]
+    dat = packer.make_can_msg_prepared(msgs.scc12, 0, scc12_values)[2]
+    scc12_values[-1] = 0x10 - sum(sum(divmod(i, 16)) for i in dat) % 0x10
+    batch += [
+      (msgs.scc11, 0, (1, 2, 20, idx % 0x10, 1, 1, 0, 0, 1, 0)),
+      (msgs.scc12, 0, scc12_values),
+      (msgs.scc14, 0, (0.0, 0.0, 1.0, 5.0, 1, 2)),
+    ]
+  if frame % 5 == 0:
+    batch.append((msgs.lfahda_mfc, 0, (2, 0, 0, 0)))
+  return packer.make_can_msgs(batch)
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Per-frame CPU of packing the Hyundai carcontroller's CAN messages")
+  parser.add_argument("-n", type=int, default=10000, help="frames")
+  args = parser.parse_args()
+
+  stock = stock_messages()
+  dict_packer, prepared_packer = CANPacker(DBC), CANPacker(DBC)
+  msgs = prepare(prepared_packer, stock)
+
+  for frame in range(10):
+    expected = dict_frame(dict_packer, frame, stock, 100 + frame, -0.5)
+    assert prepared_frame(prepared_packer, msgs, frame, stock, 100 + frame, -0.5) == expected, frame
+
+  for name, f in (("make_can_msg", lambda i: dict_frame(dict_packer, i, stock, 100, -0.5)),
+                  ("prepared", lambda i: prepared_frame(prepared_packer, msgs, i, stock, 100, -0.5))):
+    t = time.process_time()
+    for i in range(args.n):
+      f(i)
+    dt = (time.process_time() - t) / args.n
+    print(f"{name:>12}: {dt*1e6:6.1f} us/frame")
@@ -7,8 +7,9 @@ from typing import SupportsFloat
 from cereal import car, log
 from openpilot.common.numpy_fast import clip, interp
 from openpilot.common.realtime import config_realtime_process, Priority, Ratekeeper, DT_CTRL
-from openpilot.common.profiler import Profiler
-from openpilot.common.params import Params, put_nonblocking, put_bool_nonblocking
+from openpilot.common.profiler import StageProfiler
+from openpilot.common.params import Params, ParamsSchema, bool_param, float_param, int_list_param, int_param, \
+                                    put_nonblocking, put_bool_nonblocking
 import cereal.messaging as messaging
 from cereal.visionipc import VisionIpcClient, VisionStreamType
 from openpilot.common.conversions import Conversions as CV
@@ -31,13 +32,13 @@ from openpilot.selfdrive.controls.lib.alertmanager import AlertManager, set_offr
 from openpilot.selfdrive.controls.lib.vehicle_model import VehicleModel
 from openpilot.system.hardware import HARDWARE
 
-from decimal import Decimal
 
 import openpilot.common.log as trace1
 
 SOFT_DISABLE_TIME = 3  # seconds
 LDW_MIN_SPEED = 50 * CV.KPH_TO_MS if Params().get_bool("IsMetric") else 31 * CV.MPH_TO_MS
 LANE_DEPARTURE_THRESHOLD = 0.1
+STAGE_TIMINGS_FRAMES = 100  # controlsStageTimings window
 
 REPLAY = "REPLAY" in os.environ
 SIMULATION = "SIMULATION" in os.environ
@@ -61,6 +62,40 @@ ACTUATOR_FIELDS = tuple(car.CarControl.Actuators.schema.fields.keys())
 ACTIVE_STATES = (State.enabled, State.softDisabling, State.overriding)
 ENABLED_STATES = (State.preEnabled, *ACTIVE_STATES)
 
+CONTROLS_PARAMS = ParamsSchema("ControlsParams",
+  joystick_debug_mode=bool_param("JoystickDebugMode"),
+  disengage_on_accelerator=bool_param("DisengageOnAccelerator"),
+  is_metric=bool_param("IsMetric"),
+  is_ldw_enabled=bool_param("IsLdwEnabled"),
+  openpilot_enabled_toggle=bool_param("OpenpilotEnabledToggle"),
+  passive=bool_param("Passive"),
+  auto_enable=bool_param("AutoEnable"),
+  ufc_mode=bool_param("UFCModeEnabled"),
+  variable_cruise=bool_param("OpkrVariableCruise"),
+  cruise_over_maxspeed=bool_param("CruiseOverMaxSpeed"),
+  cruise_road_limit_spd_enabled=bool_param("CruiseSetwithRoadLimitSpeedEnabled"),
+  cruise_road_limit_spd_offset=int_param("CruiseSetwithRoadLimitSpeedOffset"),
+  stock_lkas_on_disengaged_status=bool_param("StockLKASEnabled"),
+  no_mdps_mods=bool_param("NoSmartMDPS"),
+  long_alt=int_param("OPKRLongAlt"),
+  exp_long_enabled=bool_param("ExperimentalLongitudinalEnabled"),
+  steer_ratio_max=float_param("SteerRatioMaxAdj", '0.01'),
+  live_sr=bool_param("OpkrLiveSteerRatio"),
+  live_sr_percent=int_param("LiveSteerRatioPercent"),
+  lane_change_delay=int_param("OpkrAutoLaneChangeDelay"),
+  auto_enable_speed=int_param("AutoEnableSpeed"),
+  stock_navi_info_enabled=bool_param("StockNaviSpeedEnabled"),
+  ignore_can_error_on_isg=bool_param("IgnoreCANErroronISG"),
+  osm_waze_spdlimit_offset=int_param("OpkrSpeedLimitOffset"),
+  osm_waze_spdlimit_offset_option=int_param("OpkrSpeedLimitOffsetOption"),
+  osm_speedlimit_enabled=bool_param("OSMSpeedLimitEnable"),
+  cruise_spamming_level=int_list_param("CruiseSpammingLevel"),
+  cruise_spamming_spd=int_list_param("CruiseSpammingSpd"),
+  navi_selection=int_param("OPKRNaviSelect"),
+  osm_waze_custom_spdlimit_c=int_list_param("OSMCustomSpeedLimitC"),
+  osm_waze_custom_spdlimit_t=int_list_param("OSMCustomSpeedLimitT"),
+)
+
 
 class Controls:
   def __init__(self, CI=None):
@@ -71,7 +106,7 @@ class Controls:
 
     # Setup sockets
     self.pm = messaging.PubMaster(['sendcan', 'controlsState', 'carState',
-                                   'carControl', 'carEvents', 'carParams'])
+                                   'carControl', 'carEvents', 'carParams', 'controlsStageTimings'])
 
     self.sensor_packets = ["accelerometer", "gyroscope"]
     self.camera_packets = ["roadCameraState", "driverCameraState", "wideRoadCameraState"]
@@ -85,11 +120,11 @@ class Controls:
     ignore = self.sensor_packets + ['testJoystick']
     if SIMULATION:
       ignore += ['driverCameraState', 'managerState']
-    self.sm = messaging.SubMaster(['deviceState', 'pandaStates', 'peripheralState', 'modelV2', 'liveCalibration',
-                                   'driverMonitoringState', 'longitudinalPlan', 'lateralPlan', 'liveLocationKalman',
-                                   'managerState', 'liveParameters', 'radarState', 'liveTorqueParameters',
-                                   'testJoystick', 'liveENaviData', 'liveMapData'] + self.camera_packets + self.sensor_packets,
-                                  ignore_alive=ignore, ignore_avg_freq=['radarState', 'testJoystick', 'liveENaviData', 'liveMapData'])
+    self.sm = messaging.SlotSubMaster(['deviceState', 'pandaStates', 'peripheralState', 'modelV2', 'liveCalibration',
+                                       'driverMonitoringState', 'longitudinalPlan', 'lateralPlan', 'liveLocationKalman',
+                                       'managerState', 'liveParameters', 'radarState', 'liveTorqueParameters',
+                                       'testJoystick', 'liveENaviData', 'liveMapData'] + self.camera_packets + self.sensor_packets,
+                                      ignore_alive=ignore, ignore_avg_freq=['radarState', 'testJoystick', 'liveENaviData', 'liveMapData'])
 
     if CI is None:
       # wait for one pandaState and one CAN packet
@@ -102,34 +137,35 @@ class Controls:
     else:
       self.CI, self.CP = CI, CI.CP
 
-    self.joystick_mode = self.params.get_bool("JoystickDebugMode") or self.CP.notCar
+    p = CONTROLS_PARAMS.load(self.params)
+    self.joystick_mode = p.joystick_debug_mode or self.CP.notCar
 
     # set alternative experiences from parameters
-    self.disengage_on_accelerator = self.params.get_bool("DisengageOnAccelerator")
+    self.disengage_on_accelerator = p.disengage_on_accelerator
     self.CP.alternativeExperience = 0
     if not self.disengage_on_accelerator:
       self.CP.alternativeExperience |= ALTERNATIVE_EXPERIENCE.DISABLE_DISENGAGE_ON_GAS
 
     # read params
-    self.is_metric = self.params.get_bool("IsMetric")
-    self.is_ldw_enabled = self.params.get_bool("IsLdwEnabled")
-    openpilot_enabled_toggle = self.params.get_bool("OpenpilotEnabledToggle")
-    passive = self.params.get_bool("Passive") or not openpilot_enabled_toggle
-
-    self.auto_enabled = self.params.get_bool("AutoEnable") and self.params.get_bool("UFCModeEnabled")
-    self.variable_cruise = self.params.get_bool("OpkrVariableCruise")
-    self.cruise_over_maxspeed = self.params.get_bool("CruiseOverMaxSpeed")
-    self.cruise_road_limit_spd_enabled = self.params.get_bool("CruiseSetwithRoadLimitSpeedEnabled")
-    self.cruise_road_limit_spd_offset = int(self.params.get("CruiseSetwithRoadLimitSpeedOffset", encoding="utf8"))
-    self.stock_lkas_on_disengaged_status = self.params.get_bool("StockLKASEnabled")
-    self.no_mdps_mods = self.params.get_bool("NoSmartMDPS")
-    self.ufc_mode = self.params.get_bool("UFCModeEnabled")
+    self.is_metric = p.is_metric
+    self.is_ldw_enabled = p.is_ldw_enabled
+    openpilot_enabled_toggle = p.openpilot_enabled_toggle
+    passive = p.passive or not openpilot_enabled_toggle
+
+    self.auto_enabled = p.auto_enable and p.ufc_mode
+    self.variable_cruise = p.variable_cruise
+    self.cruise_over_maxspeed = p.cruise_over_maxspeed
+    self.cruise_road_limit_spd_enabled = p.cruise_road_limit_spd_enabled
+    self.cruise_road_limit_spd_offset = p.cruise_road_limit_spd_offset
+    self.stock_lkas_on_disengaged_status = p.stock_lkas_on_disengaged_status
+    self.no_mdps_mods = p.no_mdps_mods
+    self.ufc_mode = p.ufc_mode
 
     self.cruise_road_limit_spd_switch = True
     self.cruise_road_limit_spd_switch_prev = 0
     
-    self.long_alt = int(self.params.get("OPKRLongAlt", encoding="utf8"))
-    self.exp_long_enabled = self.params.get_bool("ExperimentalLongitudinalEnabled")
+    self.long_alt = p.long_alt
+    self.exp_long_enabled = p.exp_long_enabled
 
     # detect sound card presence and ensure successful init
     sounds_available = HARDWARE.get_sound_card_online()
@@ -231,7 +267,7 @@ class Controls:
 
     # controlsd is driven by can recv, expected at 100Hz
     self.rk = Ratekeeper(100, print_delay_threshold=None)
-    self.prof = Profiler(False)  # off by default
+    self.prof = StageProfiler(DT_CTRL)
 
     self.hkg_stock_lkas = True
     self.hkg_stock_lkas_timer = 0
@@ -239,29 +275,29 @@ class Controls:
     self.mpc_frame = 0
     self.mpc_frame_sr = 0
 
-    self.steerRatio_Max = float(Decimal(self.params.get("SteerRatioMaxAdj", encoding="utf8")) * Decimal('0.01'))
+    self.steerRatio_Max = p.steer_ratio_max
     self.steer_angle_range = [5, 30]
     self.steerRatio_range = [self.CP.steerRatio, self.steerRatio_Max]
     self.new_steerRatio = self.CP.steerRatio
     self.new_steerRatio_prev = self.CP.steerRatio
     self.steerRatio_to_send = 0
-    self.live_sr = self.params.get_bool("OpkrLiveSteerRatio")
-    self.live_sr_percent = int(self.params.get("LiveSteerRatioPercent", encoding="utf8"))
+    self.live_sr = p.live_sr
+    self.live_sr_percent = p.live_sr_percent
 
     self.second = 0.0
     self.second2 = 0.0
     self.map_enabled = False
-    self.lane_change_delay = int(self.params.get("OpkrAutoLaneChangeDelay", encoding="utf8"))
-    self.auto_enable_speed = int(self.params.get("AutoEnableSpeed", encoding="utf8"))
+    self.lane_change_delay = p.lane_change_delay
+    self.auto_enable_speed = p.auto_enable_speed
     self.e2e_long_alert_prev = True
     self.unsleep_mode_alert_prev = True
     self.donotdisturb_mode_alert_prev = True
-    self.stock_navi_info_enabled = self.params.get_bool("StockNaviSpeedEnabled")
-    self.ignore_can_error_on_isg = self.params.get_bool("IgnoreCANErroronISG")
+    self.stock_navi_info_enabled = p.stock_navi_info_enabled
+    self.ignore_can_error_on_isg = p.ignore_can_error_on_isg
     self.ready_timer = 0
-    self.osm_waze_spdlimit_offset = int(self.params.get("OpkrSpeedLimitOffset", encoding="utf8"))
-    self.osm_waze_spdlimit_offset_option = int(self.params.get("OpkrSpeedLimitOffsetOption", encoding="utf8"))
-    self.osm_speedlimit_enabled = self.params.get_bool("OSMSpeedLimitEnable")
+    self.osm_waze_spdlimit_offset = p.osm_waze_spdlimit_offset
+    self.osm_waze_spdlimit_offset_option = p.osm_waze_spdlimit_offset_option
+    self.osm_speedlimit_enabled = p.osm_speedlimit_enabled
     self.osm_waze_speedlimit = 255
     self.osm_waze_off_spdlimit_init = False
     self.safety_speed = 0
@@ -277,13 +313,13 @@ class Controls:
 
     #self.var_cruise_speed_factor = int(self.params.get("VarCruiseSpeedFactor", encoding="utf8"))
     self.var_cruise_speed_factor = 0
-    self.cruise_spamming_level = list(map(int, self.params.get("CruiseSpammingLevel", encoding="utf8").split(',')))
-    self.cruise_spamming_spd = list(map(int, self.params.get("CruiseSpammingSpd", encoding="utf8").split(',')))
+    self.cruise_spamming_level = p.cruise_spamming_level
+    self.cruise_spamming_spd = p.cruise_spamming_spd
     self.desired_angle_deg = 0
-    self.navi_selection = int(self.params.get("OPKRNaviSelect", encoding="utf8"))
+    self.navi_selection = p.navi_selection
 
-    self.osm_waze_custom_spdlimit_c = list(map(int, self.params.get("OSMCustomSpeedLimitC", encoding="utf8").split(',')))
-    self.osm_waze_custom_spdlimit_t = list(map(int, self.params.get("OSMCustomSpeedLimitT", encoding="utf8").split(',')))
+    self.osm_waze_custom_spdlimit_c = p.osm_waze_custom_spdlimit_c
+    self.osm_waze_custom_spdlimit_t = p.osm_waze_custom_spdlimit_t
 
     self.pandaState_safetyModel = ""
     self.interface_safetyModel = ""
@@ -567,6 +603,8 @@ class Controls:
 
     # Update carState from CAN
     can_strs = messaging.drain_sock_raw(self.can_sock, wait_for_one=True)
+    # blocked until can arrived, not part of the frame's work
+    self.prof.checkpoint("CAN wait", ignore=True)
     CS = self.CI.update(self.CC, can_strs)
     if len(can_strs) and REPLAY:
       self.can_log_mono_time = messaging.log_from_bytes(can_strs[0]).logMonoTime
@@ -1109,6 +1147,7 @@ class Controls:
 
     self.update_events(CS)
     cloudlog.timestamp("Events updated")
+    self.prof.checkpoint("Events")
 
     if not self.read_only and self.initialized:
       # Update control state
@@ -1124,13 +1163,36 @@ class Controls:
     self.publish_logs(CS, start_time, CC, lac_log)
     self.prof.checkpoint("Sent")
 
+    self.prof.end_frame()
+    if self.prof.frames >= STAGE_TIMINGS_FRAMES:
+      self.publish_stage_timings()
+
     self.CS_prev = CS
 
+  def publish_stage_timings(self):
+    dat = messaging.new_message('controlsStageTimings')
+    timings = dat.controlsStageTimings
+    timings.frames = self.prof.frames
+    timings.overrunFrames = self.prof.overrun_frames
+    timings.budgetMillis = DT_CTRL * 1000.
+
+    stages = [(timings.frame, "Frame", self.prof.frame, self.prof.overrun_frames)]
+    stages += [(stage, name, hist, self.prof.overruns[name]) for stage, (name, hist) in
+               zip(timings.init('stages', len(self.prof.stages)), self.prof.stages.items())]
+    for stage, name, hist, overruns in stages:
+      stage.name = name
+      stage.p50Millis = hist.percentile(50) * 1000.
+      stage.p99Millis = hist.percentile(99) * 1000.
+      stage.maxMillis = hist.max * 1000.
+      stage.overrunFrames = overruns
+
+    self.pm.send('controlsStageTimings', dat)
+    self.prof.reset()
+
   def controlsd_thread(self):
     while True:
       self.step()
       self.rk.monitor_time()
-      self.prof.display()
 
 
 def main():
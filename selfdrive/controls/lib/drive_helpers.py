@@ -8,7 +8,7 @@ from openpilot.common.realtime import DT_MDL
 from openpilot.selfdrive.modeld.constants import ModelConstants
 
 from openpilot.selfdrive.car.hyundai.values import Buttons
-from openpilot.common.params import Params
+from openpilot.common.params import Params, ParamsSchema, bool_param, int_list_param, int_param
 
 IS_METRIC = Params().get_bool("IsMetric") if Params().get_bool("IsMetric") is not None else False
 LONG_ENABLED = Params().get_bool("ExperimentalLongitudinalEnabled") if Params().get_bool("ExperimentalLongitudinalEnabled") is not None else False
@@ -43,6 +43,21 @@ CRUISE_INTERVAL_SIGN = {
   ButtonType.decelCruise: -1,
 }
 
+V_CRUISE_PARAMS = ParamsSchema("VCruiseParams",
+  is_kph=bool_param("IsMetric"),
+  variable_cruise=bool_param("OpkrVariableCruise"),
+  osm_waze_spdlimit_offset=int_param("OpkrSpeedLimitOffset"),
+  osm_waze_spdlimit_offset_option=int_param("OpkrSpeedLimitOffsetOption"),
+  osm_speedlimit_enabled=bool_param("OSMSpeedLimitEnable"),
+  navi_selection=int_param("OPKRNaviSelect"),
+  osm_waze_custom_spdlimit_c=int_list_param("OSMCustomSpeedLimitC"),
+  osm_waze_custom_spdlimit_t=int_list_param("OSMCustomSpeedLimitT"),
+  cruise_over_maxspeed=bool_param("CruiseOverMaxSpeed"),
+  cruise_road_limit_spd_enabled=bool_param("CruiseSetwithRoadLimitSpeedEnabled"),
+  cruise_road_limit_spd_offset=int_param("CruiseSetwithRoadLimitSpeedOffset"),
+  setspdfive=bool_param("SetSpeedFive"),
+)
+
 
 class VCruiseHelper:
   def __init__(self, CP):
@@ -55,35 +70,35 @@ class VCruiseHelper:
 
     self.sm = messaging.SubMaster(['liveENaviData', 'liveMapData'])
 
-    self.params = Params()
-    self.is_kph = self.params.get_bool("IsMetric")
-    self.variable_cruise = self.params.get_bool("OpkrVariableCruise")
+    p = V_CRUISE_PARAMS.load()
+    self.is_kph = p.is_kph
+    self.variable_cruise = p.variable_cruise
 
-    self.osm_waze_spdlimit_offset = int(self.params.get("OpkrSpeedLimitOffset", encoding="utf8"))
-    self.osm_waze_spdlimit_offset_option = int(self.params.get("OpkrSpeedLimitOffsetOption", encoding="utf8"))
-    self.osm_speedlimit_enabled = self.params.get_bool("OSMSpeedLimitEnable")
+    self.osm_waze_spdlimit_offset = p.osm_waze_spdlimit_offset
+    self.osm_waze_spdlimit_offset_option = p.osm_waze_spdlimit_offset_option
+    self.osm_speedlimit_enabled = p.osm_speedlimit_enabled
     self.osm_waze_speedlimit = 255
     self.pause_spdlimit = False
     self.osm_waze_off_spdlimit_init = False
 
-    self.navi_selection = int(self.params.get("OPKRNaviSelect", encoding="utf8"))
+    self.navi_selection = p.navi_selection
 
-    self.osm_waze_custom_spdlimit_c = list(map(int, self.params.get("OSMCustomSpeedLimitC", encoding="utf8").split(',')))
-    self.osm_waze_custom_spdlimit_t = list(map(int, self.params.get("OSMCustomSpeedLimitT", encoding="utf8").split(',')))
+    self.osm_waze_custom_spdlimit_c = list(p.osm_waze_custom_spdlimit_c)
+    self.osm_waze_custom_spdlimit_t = list(p.osm_waze_custom_spdlimit_t)
 
     self.pause_spdlimit_push = False
     self.pause_spdlimit_push_cnt = 0
 
     self.second2 = 0.0
 
-    self.cruise_over_maxspeed = self.params.get_bool("CruiseOverMaxSpeed")
-    self.cruise_road_limit_spd_enabled = self.params.get_bool("CruiseSetwithRoadLimitSpeedEnabled")
-    self.cruise_road_limit_spd_offset = int(self.params.get("CruiseSetwithRoadLimitSpeedOffset", encoding="utf8"))
+    self.cruise_over_maxspeed = p.cruise_over_maxspeed
+    self.cruise_road_limit_spd_enabled = p.cruise_road_limit_spd_enabled
+    self.cruise_road_limit_spd_offset = p.cruise_road_limit_spd_offset
 
     self.cruise_road_limit_spd_switch = True
     self.cruise_road_limit_spd_switch_prev = 0
 
-    self.setspdfive = self.params.get_bool("SetSpeedFive") 
+    self.setspdfive = p.setspdfive
 
   @property
   def v_cruise_initialized(self):
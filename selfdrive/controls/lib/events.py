@@ -2,7 +2,7 @@
 import math
 import os
 from enum import IntEnum
-from typing import Dict, Union, Callable, List, Optional
+from typing import Dict, Union, Callable, List, Optional, Set
 
 from cereal import log, car
 import cereal.messaging as messaging
@@ -11,7 +11,6 @@ from openpilot.common.realtime import DT_CTRL
 from openpilot.selfdrive.locationd.calibrationd import MIN_SPEED_FILTER
 from openpilot.system.version import get_short_branch
 
-import linecache
 from openpilot.common.params import Params
 
 AlertSize = log.ControlsState.AlertSize
@@ -47,6 +46,8 @@ class ET:
 
 # get event name from enum
 EVENT_NAME = {v: k for k, v in EventName.schema.enumerants.items()}
+NUM_EVENTS = max(EVENT_NAME) + 1
+ET_BITS = {et: 1 << i for i, et in enumerate(v for k, v in vars(ET).items() if not k.startswith('_'))}
 
 try:
   LANG_FILE='/data/openpilot/selfdrive/assets/addon/lang/events/' + Params().get("LanguageSetting", encoding="utf8") + '.txt'
@@ -59,15 +60,43 @@ except:
   IS_WAZE = False
   pass
 
+
+def load_lang_file(path: str) -> List[str]:
+  """Lines of a language file indexed by line number, with the line endings linecache.getline returns"""
+  try:
+    with open(path, encoding='utf-8-sig') as f:
+      lines = f.readlines()
+  except (OSError, UnicodeDecodeError):
+    lines = []
+  if lines and not lines[-1].endswith('\n'):
+    lines[-1] += '\n'
+  return [''] + lines
+
+
+LANG_LINES = load_lang_file(LANG_FILE)
+
+
 # opkr
 def tr(line_num: int):
-  return linecache.getline(LANG_FILE, line_num)
+  return LANG_LINES[line_num] if 0 < line_num < len(LANG_LINES) else ''
 
 class Events:
+  """Current events of a frame, in the order added.
+
+  The event types of the current events are kept as a bitmask, so contains is one
+  AND. events_prev counts the consecutive frames every event was active before, it
+  is indexed by event id and clear only updates the counters of active events.
+  Add events through add and add_from_msg, which keep the bitmask in sync.
+  """
   def __init__(self):
     self.events: List[int] = []
     self.static_events: List[int] = []
-    self.events_prev = dict.fromkeys(EVENTS.keys(), 0)
+    self.events_prev = [0] * NUM_EVENTS
+    self.event_types = 0
+    self.static_event_types = 0
+    self.prev_active: Set[int] = set()
+    self.msg_key: Optional[tuple] = None
+    self.msg: List[car.CarEvent] = []
 
   @property
   def names(self) -> List[int]:
@@ -79,47 +108,66 @@ class Events:
   def add(self, event_name: int, static: bool=False) -> None:
     if static:
       self.static_events.append(event_name)
+      self.static_event_types |= EVENT_TYPE_BITS[event_name]
     self.events.append(event_name)
+    self.event_types |= EVENT_TYPE_BITS[event_name]
 
   def clear(self) -> None:
-    self.events_prev = {k: (v + 1 if k in self.events else 0) for k, v in self.events_prev.items()}
+    active = set(self.events)
+    for e in self.prev_active - active:
+      self.events_prev[e] = 0
+    for e in active:
+      if e in EVENTS:
+        self.events_prev[e] += 1
+    self.prev_active = active
     self.events = self.static_events.copy()
+    self.event_types = self.static_event_types
 
   def contains(self, event_type: str) -> bool:
-    return any(event_type in EVENTS.get(e, {}) for e in self.events)
+    return bool(self.event_types & ET_BITS.get(event_type, 0))
 
   def create_alerts(self, event_types: List[str], callback_args=None):
     if callback_args is None:
       callback_args = []
 
+    wanted = 0
+    for et in event_types:
+      wanted |= ET_BITS[et]
+
     ret = []
+    if not self.event_types & wanted:
+      return ret
+
     for e in self.events:
-      types = EVENTS[e].keys()
+      if not EVENT_TYPE_BITS[e] & wanted:
+        continue
+
+      alerts = EVENTS[e]
       for et in event_types:
-        if et in types:
-          alert = EVENTS[e][et]
+        alert = alerts.get(et)
+        if alert is not None:
           if not isinstance(alert, Alert):
             alert = alert(*callback_args)
 
           if DT_CTRL * (self.events_prev[e] + 1) >= alert.creation_delay:
-            alert.alert_type = f"{EVENT_NAME[e]}/{et}"
+            alert.alert_type = ALERT_TYPES[e][et]
             alert.event_type = et
             ret.append(alert)
     return ret
 
   def add_from_msg(self, events):
     for e in events:
-      self.events.append(e.name.raw)
+      name = e.name.raw
+      self.events.append(name)
+      self.event_types |= EVENT_TYPE_BITS[name]
 
   def to_msg(self):
-    ret = []
-    for event_name in self.events:
-      event = car.CarEvent.new_message()
-      event.name = event_name
-      for event_type in EVENTS.get(event_name, {}):
-        setattr(event, event_type, True)
-      ret.append(event)
-    return ret
+    """CarEvents of the current events. The list is reused while the events don't change, so don't modify it"""
+    key = tuple(self.events)
+    if key != self.msg_key:
+      self.msg_key = key
+      self.msg = [car_event_msg(e) for e in self.events]
+    return self.msg
 
 
 class Alert:
@@ -227,17 +275,19 @@ AlertCallbackType = Callable[[car.CarParams, car.CarState, messaging.SubMaster,
 
 
 def soft_disable_alert(alert_text_2: str) -> AlertCallbackType:
+  immediate_disable, soft_disable = ImmediateDisableAlert(alert_text_2), SoftDisableAlert(alert_text_2)
   def func(CP: car.CarParams, CS: car.CarState, sm: messaging.SubMaster, metric: bool, soft_disable_time: int) -> Alert:
     if soft_disable_time < int(0.5 / DT_CTRL):
-      return ImmediateDisableAlert(alert_text_2)
-    return SoftDisableAlert(alert_text_2)
+      return immediate_disable
+    return soft_disable
   return func
 
 def user_soft_disable_alert(alert_text_2: str) -> AlertCallbackType:
+  immediate_disable, soft_disable = ImmediateDisableAlert(alert_text_2), UserSoftDisableAlert(alert_text_2)
   def func(CP: car.CarParams, CS: car.CarState, sm: messaging.SubMaster, metric: bool, soft_disable_time: int) -> Alert:
     if soft_disable_time < int(0.5 / DT_CTRL):
-      return ImmediateDisableAlert(alert_text_2)
-    return UserSoftDisableAlert(alert_text_2)
+      return immediate_disable
+    return soft_disable
   return func
 
 def startup_master_alert(CP: car.CarParams, CS: car.CarState, sm: messaging.SubMaster, metric: bool, soft_disable_time: int) -> Alert:
@@ -268,13 +318,6 @@ def calibration_incomplete_alert(CP: car.CarParams, CS: car.CarState, sm: messag
     Priority.LOWEST, VisualAlert.none, AudibleAlert.none, .2)
 
 
-def no_gps_alert(CP: car.CarParams, CS: car.CarState, sm: messaging.SubMaster, metric: bool, soft_disable_time: int) -> Alert:
-  return Alert(
-    tr(10),
-    tr(11),
-    AlertStatus.normal, AlertSize.mid,
-    Priority.LOWER, VisualAlert.none, AudibleAlert.none, .2, creation_delay=300.)
-
 # *** debug alerts ***
 
 def out_of_space_alert(CP: car.CarParams, CS: car.CarState, sm: messaging.SubMaster, metric: bool, soft_disable_time: int) -> Alert:
@@ -348,13 +391,6 @@ def joystick_alert(CP: car.CarParams, CS: car.CarState, sm: messaging.SubMaster,
   vals = f"Gas: {round(gb * 100.)}%, Steer: {round(steer * 100.)}%"
   return NormalPermanentAlert("Joystick Mode", vals)
 
-def navi_alert(CP: car.CarParams, CS: car.CarState, sm: messaging.SubMaster, metric: bool, soft_disable_time: int) -> Alert:
-  return Alert(
-    tr(193) if IS_WAZE else tr(95),
-    "",
-    AlertStatus.normal, AlertSize.small,
-    Priority.LOW, VisualAlert.none, AudibleAlert.none, .5, alert_rate=0.75)
-
 
 
 EVENTS: Dict[int, Dict[str, Union[Alert, AlertCallbackType]]] = {
@@ -807,7 +843,11 @@ EVENTS: Dict[int, Dict[str, Union[Alert, AlertCallbackType]]] = {
   },
 
   EventName.camSpeedDown: {
-    ET.WARNING: navi_alert,
+    ET.WARNING: Alert(
+      tr(193) if IS_WAZE else tr(95),
+      "",
+      AlertStatus.normal, AlertSize.small,
+      Priority.LOW, VisualAlert.none, AudibleAlert.none, .5, alert_rate=0.75),
   },
 
   EventName.standstillResButton: {
@@ -870,7 +910,11 @@ EVENTS: Dict[int, Dict[str, Union[Alert, AlertCallbackType]]] = {
   },
 
   EventName.noGps: {
-    ET.PERMANENT: no_gps_alert,
+    ET.PERMANENT: Alert(
+      tr(10),
+      tr(11),
+      AlertStatus.normal, AlertSize.mid,
+      Priority.LOWER, VisualAlert.none, AudibleAlert.none, .2, creation_delay=300.),
   },
 
   EventName.soundsUnavailable: {
@@ -1196,6 +1240,32 @@ EVENTS: Dict[int, Dict[str, Union[Alert, AlertCallbackType]]] = {
 }
 
 
+def build_event_tables():
+  """Lookup tables of Events indexed by event id: the event types as ET_BITS, and the alert_type of every event type"""
+  event_type_bits = [0] * NUM_EVENTS
+  alert_types: List[Dict[str, str]] = [{} for _ in range(NUM_EVENTS)]
+  for e, alerts in EVENTS.items():
+    for et in alerts:
+      event_type_bits[e] |= ET_BITS[et]
+      alert_types[e][et] = f"{EVENT_NAME[e]}/{et}"
+  return event_type_bits, alert_types
+
+
+EVENT_TYPE_BITS, ALERT_TYPES = build_event_tables()
+CAR_EVENT_MSGS: Dict[int, car.CarEvent] = {}
+
+
+def car_event_msg(event_name: int) -> car.CarEvent:
+  """CarEvent of an event with its event type flags, built once and shared"""
+  event = CAR_EVENT_MSGS.get(event_name)
+  if event is None:
+    event = CAR_EVENT_MSGS[event_name] = car.CarEvent.new_message()
+    event.name = event_name
+    for event_type in EVENTS.get(event_name, {}):
+      setattr(event, event_type, True)
+  return event
+
+
 if __name__ == '__main__':
   # print all alerts by type and priority
   from cereal.services import SERVICE_LIST
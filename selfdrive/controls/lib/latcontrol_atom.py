@@ -6,8 +6,7 @@ from openpilot.common.realtime import DT_CTRL
 from openpilot.common.numpy_fast import clip, interp
 from openpilot.common.filter_simple import FirstOrderFilter
 
-from openpilot.common.params import Params
-from decimal import Decimal
+from openpilot.common.params import Params, CachedParams
 from openpilot.common.conversions import Conversions as CV
 
 from openpilot.selfdrive.controls.lib.latcontrol import LatControl
@@ -22,7 +21,7 @@ from openpilot.selfdrive.controls.lib.latcontrol_pid import LatControlPID
 class LatCtrlToqATOM(LatControlTorque):
   def __init__(self, CP, CI, TORQUE):
     self.mpc_frame = 0
-    self.params = Params()
+    self.params = CachedParams()
     self.sat_count_rate = 1.0 * DT_CTRL
     self.sat_limit = CP.steerLimitTimer
     self.sat_count = 0. 
@@ -46,7 +45,7 @@ class LatCtrlLqrATOM(LatControlLQR):
   def __init__(self, CP, CI, LQR):
     self.mpc_frame = 0
     self.live_tune_enabled = False
-    self.params = Params()
+    self.params = CachedParams()
     self.sat_count_rate = 1.0 * DT_CTRL 
     self.sat_limit = CP.steerLimitTimer 
     self.sat_count = 0. 
@@ -99,7 +98,7 @@ class LatCtrlIndATOM(LatControlINDI):
     self.x = np.array([[0.], [0.], [0.]])
 
     self.mpc_frame = 0
-    self.params = Params()
+    self.params = CachedParams()
 
     self.steer_max = 1.0
 
@@ -136,7 +135,7 @@ class LatCtrlPidATOM(LatControlPID):
     self.get_steer_feedforward = CI.get_steer_feedforward_function()
 
     self.mpc_frame = 0
-    self.params = Params()
+    self.params = CachedParams()
 
     self.live_tune_enabled = False
 
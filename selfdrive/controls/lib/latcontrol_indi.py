@@ -6,8 +6,7 @@ from openpilot.common.filter_simple import FirstOrderFilter
 from openpilot.common.numpy_fast import clip, interp
 from openpilot.common.realtime import DT_CTRL
 from openpilot.selfdrive.controls.lib.latcontrol import LatControl
-from openpilot.common.params import Params
-from decimal import Decimal
+from openpilot.common.params import CachedParams
 
 
 class LatControlINDI(LatControl):
@@ -37,7 +36,7 @@ class LatControlINDI(LatControl):
     self.x = np.array([[0.], [0.], [0.]])
 
     self.mpc_frame = 0
-    self.params = Params()
+    self.params = CachedParams()
 
     self._RC = (CP.lateralTuning.indi.timeConstantBP, CP.lateralTuning.indi.timeConstantV)
     self._G = (CP.lateralTuning.indi.actuatorEffectivenessBP, CP.lateralTuning.indi.actuatorEffectivenessV)
@@ -65,10 +64,10 @@ class LatControlINDI(LatControl):
   def live_tune(self):
     self.mpc_frame += 1
     if self.mpc_frame % 300 == 0:
-      self.outerLoopGain = float(Decimal(self.params.get("OuterLoopGain", encoding="utf8")) * Decimal('0.1'))
-      self.innerLoopGain = float(Decimal(self.params.get("InnerLoopGain", encoding="utf8")) * Decimal('0.1'))
-      self.timeConstant = float(Decimal(self.params.get("TimeConstant", encoding="utf8")) * Decimal('0.1'))
-      self.actuatorEffectiveness = float(Decimal(self.params.get("ActuatorEffectiveness", encoding="utf8")) * Decimal('0.1'))
+      self.outerLoopGain = self.params.get_float("OuterLoopGain", '0.1')
+      self.innerLoopGain = self.params.get_float("InnerLoopGain", '0.1')
+      self.timeConstant = self.params.get_float("TimeConstant", '0.1')
+      self.actuatorEffectiveness = self.params.get_float("ActuatorEffectiveness", '0.1')
       self.RC = interp(self.speed, [0.], [self.timeConstant]) 
       self.G = interp(self.speed, [0.], [self.actuatorEffectiveness])
       self.outer_loop_gain = interp(self.speed, [0.], [self.outerLoopGain])
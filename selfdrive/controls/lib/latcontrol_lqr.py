@@ -6,14 +6,13 @@ from openpilot.common.realtime import DT_CTRL
 from cereal import log
 from openpilot.selfdrive.controls.lib.latcontrol import LatControl
 
-from openpilot.common.params import Params
-from decimal import Decimal
+from openpilot.common.params import CachedParams
 
 class LatControlLQR(LatControl):
   def __init__(self, CP, CI):
     super().__init__(CP, CI)
     self.mpc_frame = 0
-    self.params = Params()
+    self.params = CachedParams()
 
     self.scale = CP.lateralTuning.lqr.scale
     self.ki = CP.lateralTuning.lqr.ki
@@ -42,9 +41,9 @@ class LatControlLQR(LatControl):
   def live_tune(self):
     self.mpc_frame += 1
     if self.mpc_frame % 300 == 0:
-      self.scale_ = float(Decimal(self.params.get("Scale", encoding="utf8")) * Decimal('1.0'))
-      self.ki_ = float(Decimal(self.params.get("LqrKi", encoding="utf8")) * Decimal('0.001'))
-      self.dc_gain_ = float(Decimal(self.params.get("DcGain", encoding="utf8")) * Decimal('0.00001'))
+      self.scale_ = self.params.get_float("Scale", '1.0')
+      self.ki_ = self.params.get_float("LqrKi", '0.001')
+      self.dc_gain_ = self.params.get_float("DcGain", '0.00001')
       self.scale = self.scale_
       self.ki = self.ki_
       self.dc_gain = self.dc_gain_
@@ -6,8 +6,7 @@ from openpilot.selfdrive.controls.lib.latcontrol import LatControl
 from openpilot.selfdrive.controls.lib.pid import PIDController
 from openpilot.selfdrive.controls.lib.vehicle_model import ACCELERATION_DUE_TO_GRAVITY
 
-from openpilot.common.params import Params
-from decimal import Decimal
+from openpilot.common.params import CachedParams
 
 # At higher speeds (25+mph) we can assume:
 # Lateral acceleration achieved by a specific car correlates to
@@ -37,24 +36,24 @@ class LatControlTorque(LatControl):
     self.friction = self.torque_params.friction
 
     self.mpc_frame = 0
-    self.params = Params()
+    self.params = CachedParams()
 
     self.live_tune_enabled = False
     self.lt_timer = 0
     self.live_torque_params = self.params.get_bool("OpkrLiveTorque")
 
-    self.max_lat_accel = float(Decimal(self.params.get("TorqueMaxLatAccel", encoding="utf8")) * Decimal('0.1'))
+    self.max_lat_accel = self.params.get_float("TorqueMaxLatAccel", '0.1')
 
   def live_tune(self):
     self.mpc_frame += 1
     if self.mpc_frame % 300 == 0:
-      self.max_lat_accel = float(Decimal(self.params.get("TorqueMaxLatAccel", encoding="utf8")) * Decimal('0.1'))
-      self.kp = float(Decimal(self.params.get("TorqueKp", encoding="utf8")) * Decimal('0.1'))
-      self.kf = float(Decimal(self.params.get("TorqueKf", encoding="utf8")) * Decimal('0.1'))
-      self.ki = float(Decimal(self.params.get("TorqueKi", encoding="utf8")) * Decimal('0.1'))
-      self.friction = float(Decimal(self.params.get("TorqueFriction", encoding="utf8")) * Decimal('0.001'))
+      self.max_lat_accel = self.params.get_float("TorqueMaxLatAccel", '0.1')
+      self.kp = self.params.get_float("TorqueKp", '0.1')
+      self.kf = self.params.get_float("TorqueKf", '0.1')
+      self.ki = self.params.get_float("TorqueKi", '0.1')
+      self.friction = self.params.get_float("TorqueFriction", '0.001')
       self.use_steering_angle = self.params.get_bool('TorqueUseAngle')
-      self.steering_angle_deadzone_deg = float(Decimal(self.params.get("TorqueAngDeadZone", encoding="utf8")) * Decimal('0.1'))
+      self.steering_angle_deadzone_deg = self.params.get_float("TorqueAngDeadZone", '0.1')
       self.pid = PIDController(self.kp, self.ki,
                               k_f=self.kf, pos_limit=self.steer_max, neg_limit=-self.steer_max)
         
@@ -12,7 +12,8 @@ import cereal.messaging as messaging
 from cereal import log
 
 from openpilot.common.conversions import Conversions as CV
-from openpilot.common.params import Params
+from openpilot.common.params import Params, CachedParams, ParamsSchema, bool_param, float_list_param, float_param, int_param, \
+                                    str_param
 from decimal import Decimal
 
 LaneChangeState = log.LateralPlan.LaneChangeState
@@ -33,6 +34,23 @@ LATERAL_JERK_COST = 0.04
 # speed lateral control is stable on all cars
 STEERING_RATE_COST = 700.0
 
+LATERAL_PLANNER_PARAMS = ParamsSchema("LateralPlannerParams",
+  laneless_mode=int_param("LanelessMode"),
+  lane_width=float_param("LaneWidth", '0.1'),
+  spd_lane_width_spd=float_list_param("SpdLaneWidthSpd"),
+  spd_lane_width_set=float_list_param("SpdLaneWidthSet"),
+  left_curv_offset=int_param("LeftCurvOffsetAdj"),
+  right_curv_offset=int_param("RightCurvOffsetAdj"),
+  drive_routine_on=bool_param("RoutineDriveOn"),
+  # only read with RoutineDriveOn
+  drive_routine_option=str_param("RoutineDriveOption", default=""),
+  drive_close_to_edge=bool_param("CloseToRoadEdge"),
+  left_edge_offset=float_param("LeftEdgeOffset", '0.01'),
+  right_edge_offset=float_param("RightEdgeOffset", '0.01'),
+  speed_offset=bool_param("SpeedCameraOffset"),
+  is_metric=bool_param("IsMetric"),
+)
+
 
 class LateralPlanner:
   def __init__(self, CP, debug=False):
@@ -60,8 +78,10 @@ class LateralPlanner:
     self.lat_mpc = LateralMpc()
     self.reset_mpc(np.zeros(4))
 
+    self.params = CachedParams()
+    p = LATERAL_PLANNER_PARAMS.load()
 
-    self.laneless_mode = int(Params().get("LanelessMode", encoding="utf8"))
+    self.laneless_mode = p.laneless_mode
     self.laneless_mode_status = False
     self.laneless_mode_status_buffer = False
 
@@ -78,36 +98,35 @@ class LateralPlanner:
     self.ll_x = np.zeros((TRAJECTORY_SIZE,))
     self.lll_y = np.zeros((TRAJECTORY_SIZE,))
     self.rll_y = np.zeros((TRAJECTORY_SIZE,))
-    self.params = Params()
-    self.lane_width_estimate = FirstOrderFilter(float(Decimal(self.params.get("LaneWidth", encoding="utf8")) * Decimal('0.1')), 9.95, DT_MDL)
+    self.lane_width_estimate = FirstOrderFilter(p.lane_width, 9.95, DT_MDL)
     self.lane_width_certainty = FirstOrderFilter(1.0, 0.95, DT_MDL)
-    self.lane_width = float(Decimal(self.params.get("LaneWidth", encoding="utf8")) * Decimal('0.1'))
-    self.spd_lane_width_spd = list(map(float, self.params.get("SpdLaneWidthSpd", encoding="utf8").split(',')))
-    self.spd_lane_width_set = list(map(float, self.params.get("SpdLaneWidthSet", encoding="utf8").split(',')))
+    self.lane_width = p.lane_width
+    self.spd_lane_width_spd = list(p.spd_lane_width_spd)
+    self.spd_lane_width_set = list(p.spd_lane_width_set)
     self.lll_prob = self.rll_prob = self.d_prob = self.lll_std = self.rll_std = 0.
     self.camera_offset = CAMERA_OFFSET
     self.path_offset = PATH_OFFSET
     self.path_offset2 = 0.0
-    self.left_curv_offset = int(self.params.get("LeftCurvOffsetAdj", encoding="utf8"))
-    self.right_curv_offset = int(self.params.get("RightCurvOffsetAdj", encoding="utf8"))
-    self.drive_routine_on_co = self.params.get_bool("RoutineDriveOn")
+    self.left_curv_offset = p.left_curv_offset
+    self.right_curv_offset = p.right_curv_offset
+    self.drive_routine_on_co = p.drive_routine_on
     if self.drive_routine_on_co:
-      option_list = list(self.params.get("RoutineDriveOption", encoding="utf8"))
+      option_list = list(p.drive_routine_option)
       if '0' in option_list:
         self.drive_routine_on_co = True
       else:
         self.drive_routine_on_co = False
-    self.drive_close_to_edge = self.params.get_bool("CloseToRoadEdge")
-    self.left_edge_offset = float(Decimal(self.params.get("LeftEdgeOffset", encoding="utf8")) * Decimal('0.01'))
-    self.right_edge_offset = float(Decimal(self.params.get("RightEdgeOffset", encoding="utf8")) * Decimal('0.01'))
-    self.speed_offset = self.params.get_bool("SpeedCameraOffset")
+    self.drive_close_to_edge = p.drive_close_to_edge
+    self.left_edge_offset = p.left_edge_offset
+    self.right_edge_offset = p.right_edge_offset
+    self.speed_offset = p.speed_offset
     self.road_edge_offset = 0.0
     self.timer = 0
     self.timer2 = 0
     self.timer3 = 0
     self.sm = messaging.SubMaster(['liveMapData'])
     self.total_camera_offset = self.camera_offset
-    self.is_mph = not self.params.get_bool("IsMetric")
+    self.is_mph = not p.is_metric
 
 
   def parse_model(self, md, sm, v_ego):
@@ -318,7 +337,7 @@ class LateralPlanner:
   def update(self, sm, CP):
     self.second += DT_MDL
     if self.second > 1.0:
-      self.laneless_mode = int(Params().get("LanelessMode", encoding="utf8"))
+      self.laneless_mode = self.params.get_int("LanelessMode")
       self.second = 0.0
 
     self.v_cruise_kph = sm['controlsState'].vCruise
@@ -42,8 +42,8 @@ def plannerd_thread():
   lateral_planner = LateralPlanner(CP, debug=debug_mode)
 
   pm = messaging.PubMaster(['longitudinalPlan', 'lateralPlan', 'uiPlan'])
-  sm = messaging.SubMaster(['carControl', 'carState', 'controlsState', 'radarState', 'modelV2'],
-                           poll=['radarState', 'modelV2'], ignore_avg_freq=['radarState'])
+  sm = messaging.SlotSubMaster(['carControl', 'carState', 'controlsState', 'radarState', 'modelV2'],
+                               poll=['radarState', 'modelV2'], ignore_avg_freq=['radarState'])
 
   while True:
     sm.update()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+import argparse
+import time
+
+from cereal import car
+import cereal.messaging as messaging
+from openpilot.selfdrive.controls.lib.events import ET, Events
+
+EventName = car.CarEvent.EventName
+
+# (description, events added every frame, alert types of controlsd's state)
+SCENARIOS = [
+  ("engaged", [], [ET.PERMANENT, ET.WARNING]),
+  ("overriding", [EventName.steerOverride], [ET.PERMANENT, ET.WARNING, ET.OVERRIDE_LATERAL, ET.OVERRIDE_LONGITUDINAL]),
+  ("disengaged, doors", [EventName.doorOpen, EventName.seatbeltNotLatched, EventName.wrongGear], [ET.PERMANENT]),
+  ("engaging", [EventName.pcmEnable, EventName.pedalPressed], [ET.PERMANENT, ET.ENABLE, ET.NO_ENTRY, ET.PRE_ENABLE]),
+]
+
+
+def frame(events, added, alert_types, callback_args):
+  """An Events frame of controlsd: update_events, state_transition and publish_logs"""
+  events.clear()
+  for e in added:
+    events.add(e)
+  for et in (ET.NO_ENTRY, ET.SOFT_DISABLE, ET.IMMEDIATE_DISABLE, ET.USER_DISABLE, ET.OVERRIDE_LATERAL,
+             ET.OVERRIDE_LONGITUDINAL, ET.ENABLE, ET.PRE_ENABLE):
+    events.contains(et)
+  events.create_alerts(alert_types, callback_args)
+  return events.to_msg()
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Per-frame CPU of controlsd's Events bookkeeping")
+  parser.add_argument("-n", type=int, default=10000, help="frames")
+  args = parser.parse_args()
+
+  callback_args = [car.CarParams.new_message(), car.CarState.new_message(), messaging.SubMaster(['deviceState'], addr=None),
+                   True, 300]
+  for name, added, alert_types in SCENARIOS:
+    events = Events()
+    events.add(EventName.startup, static=True)
+    t = time.process_time()
+    for _ in range(args.n):
+      frame(events, added, alert_types, callback_args)
+    dt = (time.process_time() - t) / args.n
+    print(f"{name:>18}: {dt*1e6:6.1f} us/frame")
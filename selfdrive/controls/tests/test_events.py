@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+import linecache
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from cereal import car
+import cereal.messaging as messaging
+from cereal.services import SERVICE_LIST
+from openpilot.common.basedir import BASEDIR
+from openpilot.selfdrive.controls.lib import events as events_module
+from openpilot.selfdrive.controls.lib.events import ET, EVENTS, EVENT_NAME, Alert, Events, load_lang_file, tr
+from openpilot.selfdrive.controls.tests.benchmark_events import SCENARIOS, frame
+
+EventName = car.CarEvent.EventName
+EVENT_TYPES = [v for k, v in vars(ET).items() if not k.startswith('_')]
+LANG_DIR = os.path.join(BASEDIR, "selfdrive/assets/addon/lang/events")
+
+
+class ReferenceEvents:
+  """Events as it was before the lookup tables: a dict of counters and a scan of EVENTS per query"""
+  def __init__(self):
+    self.events = []
+    self.static_events = []
+    self.events_prev = dict.fromkeys(EVENTS.keys(), 0)
+
+  def add(self, event_name, static=False):
+    if static:
+      self.static_events.append(event_name)
+    self.events.append(event_name)
+
+  def clear(self):
+    self.events_prev = {k: (v + 1 if k in self.events else 0) for k, v in self.events_prev.items()}
+    self.events = self.static_events.copy()
+
+  def contains(self, event_type):
+    return any(event_type in EVENTS.get(e, {}) for e in self.events)
+
+  def create_alerts(self, event_types, callback_args):
+    ret = []
+    for e in self.events:
+      for et in event_types:
+        if et in EVENTS[e]:
+          alert = EVENTS[e][et]
+          if not isinstance(alert, Alert):
+            alert = alert(*callback_args)
+          if events_module.DT_CTRL * (self.events_prev[e] + 1) >= alert.creation_delay:
+            ret.append((f"{EVENT_NAME[e]}/{et}", et, alert.alert_text_1, alert.alert_text_2, alert.priority))
+    return ret
+
+  def add_from_msg(self, events):
+    for e in events:
+      self.events.append(e.name.raw)
+
+  def to_msg(self):
+    ret = []
+    for event_name in self.events:
+      event = car.CarEvent.new_message()
+      event.name = event_name
+      for event_type in EVENTS.get(event_name, {}):
+        setattr(event, event_type, True)
+      ret.append(event)
+    return ret
+
+
+def alert_keys(alerts):
+  return [(a.alert_type, a.event_type, a.alert_text_1, a.alert_text_2, a.priority) for a in alerts]
+
+
+class TestEvents(unittest.TestCase):
+  def setUp(self):
+    self.callback_args = [car.CarParams.new_message(), car.CarState.new_message(),
+                          messaging.SubMaster(list(SERVICE_LIST.keys()), addr=None), True, 300]
+
+  def assertSameEvents(self, events, ref, event_types):
+    self.assertEqual(events.names, ref.events)
+    self.assertEqual(len(events), len(ref.events))
+    for et in EVENT_TYPES:
+      self.assertEqual(events.contains(et), ref.contains(et), et)
+    self.assertEqual({e: events.events_prev[e] for e in EVENTS}, ref.events_prev)
+    self.assertEqual(alert_keys(events.create_alerts(event_types, self.callback_args)),
+                     ref.create_alerts(event_types, self.callback_args))
+    self.assertEqual([e.to_dict() for e in events.to_msg()], [e.to_dict() for e in ref.to_msg()])
+
+  def test_parity(self):
+    rnd = random.Random(0)
+    names = sorted(EVENTS)
+    events, ref = Events(), ReferenceEvents()
+    for e in rnd.sample(names, 2):
+      events.add(e, static=True)
+      ref.add(e, static=True)
+
+    # events staying on for a while, so the counters pass the alerts' creation delays
+    active = set()
+    for _ in range(500):
+      events.clear()
+      ref.clear()
+      if rnd.random() < 0.2:
+        active ^= set(rnd.sample(names, rnd.randint(1, 3)))
+      added = sorted(active) + rnd.sample(names, rnd.randint(0, 2))
+      rnd.shuffle(added)
+
+      from_msg = [car.CarEvent.new_message(name=e) for e in added[:rnd.randint(0, len(added))]]
+      events.add_from_msg(from_msg)
+      ref.add_from_msg(from_msg)
+      for e in added[len(from_msg):]:
+        events.add(e)
+        ref.add(e)
+
+      self.assertSameEvents(events, ref, rnd.sample(EVENT_TYPES, rnd.randint(0, len(EVENT_TYPES))))
+
+  def test_events_prev(self):
+    events = Events()
+    for _ in range(3):
+      events.add(EventName.doorOpen)
+      events.clear()
+    self.assertEqual(events.events_prev[EventName.doorOpen], 3)
+
+    # an event missing for a frame starts counting from 0 again
+    events.clear()
+    self.assertEqual(events.events_prev[EventName.doorOpen], 0)
+    events.add(EventName.doorOpen)
+    events.clear()
+    self.assertEqual(events.events_prev[EventName.doorOpen], 1)
+
+  def test_benchmark_scenarios(self):
+    for _, added, alert_types in SCENARIOS:
+      events, ref = Events(), ReferenceEvents()
+      events.add(EventName.startup, static=True)
+      ref.add(EventName.startup, static=True)
+      for _ in range(10):
+        frame(events, added, alert_types, self.callback_args)
+        ref.clear()
+        for e in added:
+          ref.add(e)
+        self.assertSameEvents(events, ref, alert_types)
+
+  def test_to_msg_reuse(self):
+    events = Events()
+    events.add(EventName.doorOpen)
+    events.add(EventName.seatbeltNotLatched)
+    msg = events.to_msg()
+
+    # unchanged events give the same list, changed events a new one with the shared messages
+    events.clear()
+    events.add(EventName.doorOpen)
+    events.add(EventName.seatbeltNotLatched)
+    self.assertIs(events.to_msg(), msg)
+
+    events.clear()
+    events.add(EventName.doorOpen)
+    new_msg = events.to_msg()
+    self.assertIsNot(new_msg, msg)
+    self.assertEqual([e.name for e in new_msg], [EventName.doorOpen])
+    self.assertIs(new_msg[0], msg[0])
+
+    # the shared list and messages can be set in every frame's carState
+    for car_events in (msg, new_msg, msg):
+      cs = messaging.new_message('carState')
+      cs.carState.events = car_events
+      sent = messaging.log_from_bytes(cs.to_bytes())
+      self.assertEqual([e.to_dict() for e in sent.carState.events], [e.to_dict() for e in car_events])
+    self.assertEqual([e.name for e in msg], [EventName.doorOpen, EventName.seatbeltNotLatched])
+
+
+class TestLangLines(unittest.TestCase):
+  def assertLinecacheEqual(self, path):
+    lines = load_lang_file(path)
+    linecache.checkcache(path)
+    for i in range(len(lines) + 2):
+      self.assertEqual(lines[i] if i < len(lines) else '', linecache.getline(path, i), (path, i))
+
+  def test_lang_files(self):
+    paths = [os.path.join(LANG_DIR, f) for f in sorted(os.listdir(LANG_DIR))]
+    self.assertGreater(len(paths), 0)
+    for path in paths:
+      self.assertLinecacheEqual(path)
+
+  def test_edge_cases(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      # a BOM, no newline at the end, and empty
+      for name, dat in (("bom.txt", "\ufeffEngaged\nDisengaged\n"), ("no_newline.txt", "Engaged\nDisengaged"), ("empty.txt", "")):
+        path = os.path.join(tmpdir, name)
+        with open(path, "w", encoding="utf-8") as f:
+          f.write(dat)
+        self.assertLinecacheEqual(path)
+      self.assertEqual(load_lang_file(os.path.join(tmpdir, "missing.txt")), [''])
+
+  def test_tr(self):
+    with mock.patch.object(events_module, 'LANG_LINES', ['', 'Engaged\n', 'Disengaged\n']):
+      self.assertEqual([tr(i) for i in (0, 1, 2, 3, -1)], ['', 'Engaged\n', 'Disengaged\n', '', ''])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Latency histograms of a log recorded with LATENCY_TRACE=1.
+
+  LATENCY_TRACE=1 ./launch_openpilot.sh
+  selfdrive/debug/latency_trace.py <route or segment or rlog> --path can sendcan
+"""
+import argparse
+import os
+from collections import defaultdict
+from typing import DefaultDict, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from openpilot.tools.lib.logreader import LogReader, logreader_from_route_or_segment
+
+# can arriving at controlsd to the actuator commands it sends
+DEFAULT_PATH = ["can", "sendcan"]
+BUDGET_MS = 10.
+
+# (service, logMonoTime) -> (sendMonoTime, inputs as (service, logMonoTime, rcvMonoTime))
+Traces = Dict[Tuple[str, int], Tuple[int, List[Tuple[str, int, int]]]]
+
+
+def read_traces(lr) -> Tuple[Traces, Dict[str, List[float]], Dict[str, List[float]], Dict[str, List[float]]]:
+  """Traced messages of a log with their latencies in ms.
+
+  transport: from an input being sent to the publishing process receiving it, per "input -> service"
+  hop: from an input being sent to the message being sent, per "input -> service"
+  processing: from the first input of the step being received to the message being sent, per service
+
+  Messages of processes without tracing, like can from pandad, are taken as sent at their logMonoTime.
+  """
+  traces: Traces = {}
+  transport: DefaultDict[str, List[float]] = defaultdict(list)
+  hop: DefaultDict[str, List[float]] = defaultdict(list)
+  processing: DefaultDict[str, List[float]] = defaultdict(list)
+
+  for ev in lr:
+    trace = ev.latencyTrace
+    if trace.sendMonoTime == 0:
+      continue
+
+    service = ev.which()
+    inputs = [(i.service, i.logMonoTime, i.rcvMonoTime) for i in trace.inputs]
+    traces[(service, ev.logMonoTime)] = (trace.sendMonoTime, inputs)
+    if trace.startMonoTime:
+      processing[service].append((trace.sendMonoTime - trace.startMonoTime) / 1e6)
+
+    for inp_service, log_mono_time, rcv_mono_time in inputs:
+      inp_sent = traces.get((inp_service, log_mono_time), (log_mono_time,))[0]
+      transport[f"{inp_service} -> {service}"].append((rcv_mono_time - inp_sent) / 1e6)
+      hop[f"{inp_service} -> {service}"].append((trace.sendMonoTime - inp_sent) / 1e6)
+
+  return traces, transport, hop, processing
+
+
+def end_to_end(traces: Traces, path: Sequence[str]) -> List[float]:
+  """Latencies in ms from the first service of path being sent to the last one being sent.
+
+  Every message of the last service is followed back through the most recent input of the
+  previous service in path, the services in between have to be traced.
+  """
+  latencies = []
+  for (service, _), (send_time, inputs) in traces.items():
+    if service != path[-1]:
+      continue
+
+    for prev in reversed(path[:-1]):
+      log_mono_times = [t for s, t, _ in inputs if s == prev]
+      if not log_mono_times:
+        break
+      key = (prev, max(log_mono_times))
+      if prev == path[0]:
+        latencies.append((send_time - traces.get(key, (key[1],))[0]) / 1e6)
+      elif key in traces:
+        inputs = traces[key][1]
+      else:
+        break
+  return latencies
+
+
+def print_histogram(name: str, latencies: List[float], budget: float, bins: int) -> None:
+  a = np.array(latencies)
+  p50, p90, p99 = np.percentile(a, [50, 90, 99])
+  print(f"{name}: n={len(a)} p50={p50:.2f} p90={p90:.2f} p99={p99:.2f} max={a.max():.2f} ms, "
+        f"{np.mean(a > budget) * 100:.2f}% over {budget:g} ms")
+  if bins:
+    counts, edges = np.histogram(a, bins=bins)
+    for count, lo, hi in zip(counts, edges, edges[1:]):
+      print(f"  {lo:8.2f} - {hi:8.2f} ms {count:7d} {'#' * int(np.ceil(50 * count / counts.max()))}")
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Per hop and end to end latencies of a log recorded with LATENCY_TRACE=1")
+  parser.add_argument("log", help="route, segment or log file")
+  parser.add_argument("--path", nargs="+", default=DEFAULT_PATH, help="services for the end to end latency, in order")
+  parser.add_argument("--budget", type=float, default=BUDGET_MS, help="ms")
+  parser.add_argument("--bins", type=int, default=0, help="print histograms with this many bins")
+  args = parser.parse_args()
+
+  # sorted, so inputs come before the messages they were processed into
+  lr = LogReader(args.log, sort_by_time=True) if os.path.isfile(args.log) else \
+    logreader_from_route_or_segment(args.log, sort_by_time=True)
+  traces, transport, hop, processing = read_traces(lr)
+  if not traces:
+    raise SystemExit("no traced messages, record the log with LATENCY_TRACE=1")
+
+  for title, latencies in (("processing", processing), ("transport", transport), ("hop", hop)):
+    print(f"\n{title}")
+    for name in sorted(latencies):
+      print_histogram(name, latencies[name], args.budget, args.bins)
+
+  e2e = end_to_end(traces, args.path)
+  print("\nend to end")
+  if e2e:
+    print_histogram(" -> ".join(args.path), e2e, args.budget, args.bins)
+  else:
+    print(f"no traced {' -> '.join(args.path)} messages")
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+import unittest
+from unittest import mock
+
+import cereal.messaging as messaging
+from openpilot.selfdrive.boardd.boardd import can_list_to_can_capnp
+from openpilot.selfdrive.debug.latency_trace import DEFAULT_PATH, end_to_end, read_traces
+from openpilot.tools.lib.logreader import LogReader
+
+MS = 1000000
+
+
+def event(service, log_mono_time, send=0, start=0, inputs=()):
+  msg = messaging.new_message(service, 0) if service in ('can', 'sendcan') else messaging.new_message(service)
+  msg.logMonoTime = log_mono_time
+  if send:
+    msg.latencyTrace.sendMonoTime = send
+    msg.latencyTrace.startMonoTime = start
+    for inp, (s, t, rcv) in zip(msg.latencyTrace.init('inputs', len(inputs)), inputs):
+      inp.service = s
+      inp.logMonoTime = t
+      inp.rcvMonoTime = rcv
+  return msg.to_bytes()
+
+
+def make_log():
+  # can from pandad isn't traced, controlsd sends sendcan and carState from both, plannerd plans on carState
+  return b"".join([
+    event('can', 1 * MS),
+    event('can', 2 * MS),
+    event('sendcan', 5 * MS, 5 * MS, 3 * MS, [('can', 1 * MS, 3 * MS), ('can', 2 * MS, 3 * MS)]),
+    event('carState', 6 * MS, 6 * MS, 3 * MS, [('can', 1 * MS, 3 * MS), ('can', 2 * MS, 3 * MS)]),
+    event('longitudinalPlan', 10 * MS, 10 * MS, 7 * MS, [('carState', 6 * MS, 7 * MS)]),
+    # untraced messages of traced services are skipped
+    event('carState', 11 * MS),
+  ])
+
+
+class TestLatencyTrace(unittest.TestCase):
+  def test_read_traces(self):
+    dat = make_log()
+    traces, transport, hop, processing = read_traces(LogReader.from_bytes(dat, sort_by_time=True))
+
+    self.assertEqual(set(traces), {('sendcan', 5 * MS), ('carState', 6 * MS), ('longitudinalPlan', 10 * MS)})
+    self.assertEqual(processing, {'sendcan': [2.], 'carState': [3.], 'longitudinalPlan': [3.]})
+    # inputs from untraced publishers are taken as sent at their logMonoTime
+    self.assertEqual(transport['can -> sendcan'], [2., 1.])
+    self.assertEqual(hop['can -> sendcan'], [4., 3.])
+    self.assertEqual(transport['carState -> longitudinalPlan'], [1.])
+    self.assertEqual(hop['carState -> longitudinalPlan'], [4.])
+
+  def test_end_to_end(self):
+    dat = make_log()
+    traces = read_traces(LogReader.from_bytes(dat, sort_by_time=True))[0]
+
+    # followed back through the most recent can
+    self.assertEqual(end_to_end(traces, ['can', 'sendcan']), [3.])
+    self.assertEqual(end_to_end(traces, ['can', 'carState', 'longitudinalPlan']), [8.])
+    self.assertEqual(end_to_end(traces, ['carState', 'longitudinalPlan']), [4.])
+    self.assertEqual(end_to_end(traces, ['can', 'controlsState', 'longitudinalPlan']), [])
+
+  def test_default_path(self):
+    # controlsd sends sendcan serialized by can_list_to_can_capnp
+    tracer = messaging.LatencyTracer()
+    with mock.patch.object(messaging, 'LATENCY_TRACE', True), mock.patch.object(messaging, 'tracer', tracer):
+      pm = messaging.PubMaster([])
+      pm.sock = {'sendcan': mock.Mock()}
+      can = can_list_to_can_capnp([[0x340, 0, b"\x01", 0]])
+      tracer.add_msgs([messaging.log_from_bytes(can)])
+      pm.send('sendcan', can_list_to_can_capnp([[0x340, 0, b"\x02", 0]], msgtype='sendcan'))
+      sendcan = pm.sock['sendcan'].send.call_args[0][0]
+
+    traces = read_traces(LogReader.from_bytes(can + sendcan, sort_by_time=True))[0]
+    self.assertEqual(len(end_to_end(traces, DEFAULT_PATH)), 1)
+
+
+if __name__ == "__main__":
+  unittest.main()
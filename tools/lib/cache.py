@@ -1,5 +1,7 @@
 import os
+import threading
 import urllib.parse
+from typing import Optional
 from openpilot.common.file_helpers import mkdirs_exists_ok
 
 DEFAULT_CACHE_DIR = os.getenv("CACHE_ROOT", os.path.expanduser("~/.commacache"))
@@ -13,3 +15,60 @@ def cache_path_for_file_path(fn, cache_dir=DEFAULT_CACHE_DIR):
   else:
     cache_fn = f'{fn_parsed.hostname}_{fn_parsed.path.replace("/", "_")}'
   return os.path.join(dir_, cache_fn)
+
+
+def source_stat(fn):
+  """Size and mtime of a local file to invalidate derived caches, None for remote files which don't change"""
+  if urllib.parse.urlparse(fn).scheme != '':
+    return None
+  st = os.stat(fn)
+  return (st.st_size, st.st_mtime_ns)
+
+
+class CacheSizeLimit:
+  """Tracks the size of a flat cache directory and evicts least recently used files above the limit"""
+  def __init__(self, limit):
+    self.limit = limit
+    self.lock = threading.Lock()
+    self.size: Optional[int] = None
+
+  def _scan(self, root):
+    entries = []
+    with os.scandir(root) as it:
+      for entry in it:
+        if entry.is_file(follow_symlinks=False):
+          st = entry.stat(follow_symlinks=False)
+          entries.append((st.st_mtime, st.st_size, entry.path))
+    return entries
+
+  def touch(self, path):
+    # mtime is used as last access time, atime isn't reliable with noatime mounts
+    try:
+      os.utime(path)
+    except OSError:
+      pass
+
+  def add(self, root, size):
+    if self.limit <= 0:
+      return
+
+    with self.lock:
+      if self.size is None:
+        self.size = sum(e[1] for e in self._scan(root))
+      else:
+        self.size += size
+
+      if self.size <= self.limit:
+        return
+
+      entries = sorted(self._scan(root))
+      self.size = sum(e[1] for e in entries)
+      # evict down to 90% of the limit so we don't rescan on every write
+      for _, sz, path in entries:
+        if self.size <= self.limit * 0.9:
+          break
+        try:
+          os.remove(path)
+          self.size -= sz
+        except OSError:
+          pass
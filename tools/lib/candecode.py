@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+import argparse
+import numbers
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from opendbc.can.can_define import CANDefine
+from opendbc.can.parser import CANParser
+from openpilot.tools.lib.logreader import LogReader
+from openpilot.tools.lib.route import Route, SegmentName
+
+# (message name or address, signal name)
+SignalKey = Tuple[Union[str, int], str]
+# signal -> (logMonoTime of each value, values)
+Series = Dict[SignalKey, Tuple[np.ndarray, np.ndarray]]
+
+# events handed to the parser per call, bounds the memory of the copied strings
+BATCH_SIZE = 10000
+
+
+def _concatenate(signals: Sequence[SignalKey], parts: List[Series]) -> Series:
+  series: Series = {}
+  for key in signals:
+    series[key] = (np.concatenate([p[key][0] for p in parts]) if parts else np.empty(0, dtype=np.uint64),
+                   np.concatenate([p[key][1] for p in parts]) if parts else np.empty(0, dtype=np.float64))
+  return series
+
+
+def decode_can_messages(messages: Iterable[bytes], dbc_name: str, signals: Sequence[SignalKey],
+                        bus: int = 0, sendcan: bool = False) -> Series:
+  """Decodes signals from raw can (or sendcan) events, in batches through the C++ parser"""
+  # a message given by name and by address is parsed once, the parser rejects duplicates
+  msg_name_to_address = CANDefine(dbc_name).msg_name_to_address
+  addresses = dict.fromkeys(m if isinstance(m, numbers.Number) else msg_name_to_address.get(m, m) for m, _ in signals)
+  cp = CANParser(dbc_name, [(m, 0) for m in addresses], bus)
+  cp.set_signal_layout(signals)
+
+  parts = []
+  messages = iter(messages)
+  while batch := list(islice(messages, BATCH_SIZE)):
+    parts.append(cp.update_strings_series(batch, sendcan))
+  return _concatenate(signals, parts)
+
+
+def segment_can_series(lr: Union[str, LogReader], dbc_name: str, signals: Sequence[SignalKey],
+                       bus: int = 0, sendcan: bool = False) -> Series:
+  """Time series of signals of one log, given as a path or LogReader.
+
+  Events are read raw from the log and only can events are passed to the parser,
+  none of them are decoded with pycapnp.
+  """
+  service = "sendcan" if sendcan else "can"
+  if not isinstance(lr, LogReader):
+    lr = LogReader(lr)
+  return decode_can_messages(lr.raw_messages([service]), dbc_name, signals, bus, sendcan)
+
+
+def route_can_series(log_paths, dbc_name: str, signals: Sequence[SignalKey], bus: int = 0, sendcan: bool = False,
+                     workers: Optional[int] = None) -> Series:
+  """segment_can_series of all logs of a route concatenated, optionally decoding segments in a process pool"""
+  log_paths = [p for p in log_paths if p is not None]
+  n = len(log_paths)
+  if workers is not None and workers > 1:
+    with ProcessPoolExecutor(workers) as pool:
+      parts = list(pool.map(segment_can_series, log_paths, [dbc_name] * n, [signals] * n, [bus] * n, [sendcan] * n))
+  else:
+    parts = [segment_can_series(fn, dbc_name, signals, bus, sendcan) for fn in log_paths]
+  return _concatenate(signals, parts)
+
+
+def can_series_from_route_or_segment(r, dbc_name: str, signals: Sequence[SignalKey], bus: int = 0, sendcan: bool = False,
+                                     workers: Optional[int] = None) -> Series:
+  sn = SegmentName(r, allow_route_name=True)
+  route = Route(sn.route_name.canonical_name)
+  if sn.segment_num < 0:
+    return route_can_series(route.log_paths(), dbc_name, signals, bus, sendcan, workers)
+  else:
+    return segment_can_series(route.log_paths()[sn.segment_num], dbc_name, signals, bus, sendcan)
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Decode CAN signals of a route into arrays, e.g. toyota_nodsu_pt_generated STEER_ANGLE_SENSOR.STEER_ANGLE")
+  parser.add_argument("route_or_segment")
+  parser.add_argument("dbc")
+  parser.add_argument("signals", nargs="+", help="message.signal")
+  parser.add_argument("--bus", type=int, default=0)
+  parser.add_argument("--sendcan", action="store_true")
+  parser.add_argument("--workers", type=int, default=None)
+  args = parser.parse_args()
+
+  signals = [tuple(s.split('.', 1)) for s in args.signals]
+  series = can_series_from_route_or_segment(args.route_or_segment, args.dbc, signals, args.bus, args.sendcan, args.workers)
+  for (msg, sig), (ts, values) in series.items():
+    print(f"{msg}.{sig}: {len(values)} values", f"[{values.min()}, {values.max()}]" if len(values) else "")
@@ -4,17 +4,20 @@ import pickle
 import struct
 import subprocess
 import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from enum import IntEnum
 from functools import wraps
+from hashlib import sha256
+from typing import Dict, Tuple
 
 import numpy as np
 from lru import LRU
 
 import _io
-from openpilot.tools.lib.cache import cache_path_for_file_path, DEFAULT_CACHE_DIR
+from openpilot.tools.lib.cache import cache_path_for_file_path, source_stat, CacheSizeLimit, DEFAULT_CACHE_DIR
 from openpilot.tools.lib.exceptions import DataUnreadableError
 from openpilot.tools.lib.vidindex import hevc_index
-from openpilot.common.file_helpers import atomic_write_in_dir
+from openpilot.common.file_helpers import atomic_write_in_dir, mkdirs_exists_ok
 
 from openpilot.tools.lib.filereader import FileReader, resolve_name
 
@@ -22,12 +25,23 @@ HEVC_SLICE_B = 0
 HEVC_SLICE_P = 1
 HEVC_SLICE_I = 2
 
+DEFAULT_GOP_CACHE_DIR = os.path.join(DEFAULT_CACHE_DIR, "gops")
+# size cap of the decoded GOP cache in bytes
+GOP_CACHE_SIZE_LIMIT = int(os.getenv("GOP_CACHE_LIMIT", str(20 * 1000 * 1000 * 1000)))
+
 
 class GOPReader:
   def get_gop(self, num):
     # returns (start_frame_num, num_frames, frames_to_skip, gop_data)
     raise NotImplementedError
 
+  def get_gop_range(self, num):
+    # returns (start_frame_num, end_frame_num) of the gop containing num
+    raise NotImplementedError
+
+  def get_gop_start(self, num):
+    return self.get_gop_range(num)[0]
+
 
 class DoNothingContextManager:
   def __enter__(self):
@@ -123,6 +137,18 @@ def read_file_check_size(f, sz, cookie):
   return buff
 
 
+def readinto_full(f, buf):
+  # fills buf unless the stream ends, pipes may return short reads
+  view = memoryview(buf)
+  total = 0
+  while total < len(view):
+    n = f.readinto(view[total:])
+    if not n:
+      break
+    total += n
+  return total
+
+
 def rgb24toyuv(rgb):
   yuv_from_rgb = np.array([[ 0.299     ,  0.587     ,  0.114      ],
                            [-0.14714119, -0.28886916,  0.43601035 ],
@@ -166,10 +192,21 @@ def rgb24tonv12(rgb):
   return nv12.clip(0, 255).astype('uint8')
 
 
-def decompress_video_data(rawdat, vid_fmt, w, h, pix_fmt):
+def frame_shape(pix_fmt, w, h):
+  if pix_fmt == "rgb24":
+    return (h, w, 3)
+  elif pix_fmt in ("nv12", "yuv420p"):
+    return (h*w*3//2,)
+  elif pix_fmt == "yuv444p":
+    return (3, h, w)
+  else:
+    raise NotImplementedError
+
+
+def ffmpeg_decode_args(vid_fmt, pix_fmt):
   threads = os.getenv("FFMPEG_THREADS", "0")
   cuda = os.getenv("FFMPEG_CUDA", "0") == "1"
-  args = ["ffmpeg", "-v", "quiet",
+  return ["ffmpeg", "-v", "quiet",
           "-threads", threads,
           "-hwaccel", "none" if not cuda else "cuda",
           "-c:v", "hevc",
@@ -181,20 +218,91 @@ def decompress_video_data(rawdat, vid_fmt, w, h, pix_fmt):
           "-f", "rawvideo",
           "-pix_fmt", pix_fmt,
           "-"]
-  dat = subprocess.check_output(args, input=rawdat)
 
-  if pix_fmt == "rgb24":
-    ret = np.frombuffer(dat, dtype=np.uint8).reshape(-1, h, w, 3)
-  elif pix_fmt == "nv12":
-    ret = np.frombuffer(dat, dtype=np.uint8).reshape(-1, (h*w*3//2))
-  elif pix_fmt == "yuv420p":
-    ret = np.frombuffer(dat, dtype=np.uint8).reshape(-1, (h*w*3//2))
-  elif pix_fmt == "yuv444p":
-    ret = np.frombuffer(dat, dtype=np.uint8).reshape(-1, 3, h, w)
-  else:
-    raise NotImplementedError
 
-  return ret
+def decompress_video_data(rawdat, vid_fmt, w, h, pix_fmt):
+  dat = subprocess.check_output(ffmpeg_decode_args(vid_fmt, pix_fmt), input=rawdat)
+  return np.frombuffer(dat, dtype=np.uint8).reshape(-1, *frame_shape(pix_fmt, w, h))
+
+
+def decompress_video_data_into(rawdat, vid_fmt, w, h, pix_fmt, out, skip_frames=0):
+  """Decodes rawdat straight into out, dropping the first skip_frames frames.
+
+  Frames are read from ffmpeg into out without intermediate copies, decoding
+  stops once out is full. Returns the number of frames written.
+  """
+  frame_size = int(np.prod(frame_shape(pix_fmt, w, h)))
+  scratch = memoryview(bytearray(frame_size))
+  dst = memoryview(out.reshape(-1)).cast('B')
+
+  proc = subprocess.Popen(ffmpeg_decode_args(vid_fmt, pix_fmt), stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+  def write_thread():
+    try:
+      proc.stdin.write(rawdat)
+    except BrokenPipeError:
+      pass
+    finally:
+      proc.stdin.close()
+
+  t = threading.Thread(target=write_thread, daemon=True)
+  t.start()
+  try:
+    for _ in range(skip_frames):
+      if readinto_full(proc.stdout, scratch) != frame_size:
+        raise DataUnreadableError("video ended before the requested frames")
+
+    written = 0
+    while written < out.shape[0]:
+      n = readinto_full(proc.stdout, dst[written*frame_size:(written+1)*frame_size])
+      if n == 0:
+        break
+      if n != frame_size:
+        raise DataUnreadableError(f"truncated frame: {n} != {frame_size}")
+      written += 1
+    return written
+  finally:
+    proc.kill()
+    proc.wait()
+    t.join()
+
+
+class GOPCache:
+  """Decoded GOPs stored on disk and shared between processes.
+
+  Each GOP is a raw file of its frames, memory mapped read-only on a hit. Files
+  are keyed by video and its size and mtime, GOP start frame, pixel format and
+  frame size. Files not holding the whole GOP are missed and rebuilt, and the least
+  recently used ones are evicted once the cache grows above max_size bytes.
+  """
+  def __init__(self, cache_dir=DEFAULT_GOP_CACHE_DIR, max_size=GOP_CACHE_SIZE_LIMIT):
+    self.cache_dir = cache_dir
+    self.size_limit = CacheSizeLimit(max_size)
+    mkdirs_exists_ok(cache_dir)
+
+  def _path(self, fn, frame_b, pix_fmt, w, h):
+    key = f"{fn}|{source_stat(fn)}|{frame_b}|{pix_fmt}|{w}x{h}"
+    return os.path.join(self.cache_dir, sha256(key.encode()).hexdigest())
+
+  def get(self, fn, frame_b, pix_fmt, w, h, num_frames):
+    path = self._path(fn, frame_b, pix_fmt, w, h)
+    shape = frame_shape(pix_fmt, w, h)
+    try:
+      frames = np.memmap(path, dtype=np.uint8, mode='r')
+    except (FileNotFoundError, ValueError):
+      # missing, or evicted/empty
+      return None
+    if frames.size != num_frames * int(np.prod(shape)):
+      # truncated, decoded again and replaced by put
+      return None
+    self.size_limit.touch(path)
+    return frames.reshape(num_frames, *shape)
+
+  def put(self, fn, frame_b, pix_fmt, w, h, frames):
+    path = self._path(fn, frame_b, pix_fmt, w, h)
+    with atomic_write_in_dir(path, mode="wb", overwrite=True) as f:
+      f.write(np.ascontiguousarray(frames).data)
+    self.size_limit.add(self.cache_dir, frames.nbytes)
 
 
 class BaseFrameReader:
@@ -212,15 +320,32 @@ class BaseFrameReader:
   def get(self, num, count=1, pix_fmt="yuv420p"):
     raise NotImplementedError
 
+  def _batch_buffer(self, count, pix_fmt, out):
+    shape = (count, *frame_shape(pix_fmt, self.w, self.h))
+    if out is None:
+      return np.empty(shape, dtype=np.uint8)
+    if out.shape != shape or out.dtype != np.uint8 or not out.flags.c_contiguous:
+      raise ValueError(f"out must be a contiguous uint8 array of shape {shape}, got {out.dtype} {out.shape}")
+    return out
 
-def FrameReader(fn, cache_dir=DEFAULT_CACHE_DIR, readahead=False, readbehind=False, index_data=None):
+  def get_batch(self, num, count=1, pix_fmt="yuv420p", out=None):
+    """Frames num to num+count as a single contiguous (count, *frame_shape) array, written into out if given"""
+    out = self._batch_buffer(count, pix_fmt, out)
+    for i, frame in enumerate(self.get(num, count, pix_fmt)):
+      out[i] = frame
+    return out
+
+
+def FrameReader(fn, cache_dir=DEFAULT_CACHE_DIR, readahead=False, readbehind=False, index_data=None, gop_cache=None,
+                readahead_workers=2, readahead_gops=None):
   frame_type = fingerprint_video(fn)
   if frame_type == FrameType.raw:
     return RawFrameReader(fn)
   elif frame_type in (FrameType.h265_stream,):
     if not index_data:
       index_data = get_video_index(fn, frame_type, cache_dir)
-    return StreamFrameReader(fn, frame_type, index_data, readahead=readahead, readbehind=readbehind)
+    return StreamFrameReader(fn, frame_type, index_data, readahead=readahead, readbehind=readbehind, gop_cache=gop_cache,
+                             readahead_workers=readahead_workers, readahead_gops=readahead_gops)
   else:
     raise NotImplementedError(frame_type)
 
@@ -422,25 +547,33 @@ class StreamGOPReader(GOPReader):
 
     return frame_b, num_frames, skip_frames, rawdat
 
+  def get_gop_range(self, num):
+    frame_b, frame_e, _, _ = self._lookup_gop(num)
+    return frame_b, frame_e
+
 
 class GOPFrameReader(BaseFrameReader):
   #FrameReader with caching and readahead for formats that are group-of-picture based
 
-  def __init__(self, readahead=False, readbehind=False):
+  def __init__(self, readahead=False, readbehind=False, gop_cache=None, readahead_workers=2, readahead_gops=None):
     self.open_ = True
 
     self.readahead = readahead
     self.readbehind = readbehind
     self.frame_cache = LRU(64)
+    # optional GOPCache shared with other readers and processes
+    self.gop_cache = gop_cache
+    # counted per frame, cached: frame was already in the frame cache
+    # counted per GOP, hits: decoded ahead before it was needed, waits: still being decoded ahead,
+    # misses: decoded on demand, cancelled: queued ahead but dropped by a seek before decoding started
+    self.readahead_stats = {'cached': 0, 'hits': 0, 'waits': 0, 'misses': 0, 'cancelled': 0}
 
     if self.readahead:
       self.cache_lock = threading.RLock()
-      self.readahead_last = None
-      self.readahead_len = 30
-      self.readahead_c = threading.Condition()
-      self.readahead_thread = threading.Thread(target=self._readahead_thread)
-      self.readahead_thread.daemon = True
-      self.readahead_thread.start()
+      # GOPs decoding ahead of the reader, at most readahead_gops are decoded and not yet consumed
+      self.readahead_gops = readahead_gops or 2 * readahead_workers
+      self.readahead_futures: Dict[Tuple[int, str], Future] = {}
+      self.readahead_pool = ThreadPoolExecutor(max_workers=readahead_workers, thread_name_prefix="gop_decode")
     else:
       self.cache_lock = DoNothingContextManager()
 
@@ -450,54 +583,75 @@ class GOPFrameReader(BaseFrameReader):
     self.open_ = False
 
     if self.readahead:
-      self.readahead_c.acquire()
-      self.readahead_c.notify()
-      self.readahead_c.release()
-      self.readahead_thread.join()
-
-  def _readahead_thread(self):
-    while True:
-      self.readahead_c.acquire()
-      try:
-        if not self.open_:
-          break
-        self.readahead_c.wait()
-      finally:
-        self.readahead_c.release()
-      if not self.open_:
-        break
-      assert self.readahead_last
-      num, pix_fmt = self.readahead_last
+      with self.cache_lock:
+        for fut in self.readahead_futures.values():
+          fut.cancel()
+        self.readahead_futures.clear()
+      self.readahead_pool.shutdown(wait=True, cancel_futures=True)
+
+  def _schedule_readahead(self, num, pix_fmt):
+    # GOPs following frame num, or preceding it when reading backwards
+    wanted = []
+    k = num
+    while len(wanted) < self.readahead_gops and 0 <= k < self.frame_count:
+      frame_b, frame_e = self.get_gop_range(k)
+      wanted.append((frame_b, pix_fmt))
+      k = frame_b - 1 if self.readbehind else frame_e
 
-      if self.readbehind:
-        for k in range(num - 1, max(0, num - self.readahead_len), -1):
-          self._get_one(k, pix_fmt)
-      else:
-        for k in range(num, min(self.frame_count, num + self.readahead_len)):
-          self._get_one(k, pix_fmt)
+    with self.cache_lock:
+      # after a seek the pending GOPs aren't needed anymore
+      for key in list(self.readahead_futures):
+        if key not in wanted and self.readahead_futures.pop(key).cancel():
+          self.readahead_stats['cancelled'] += 1
+
+      for key in wanted:
+        if key not in self.readahead_futures and key not in self.frame_cache:
+          self.readahead_futures[key] = self.readahead_pool.submit(self._decode_gop, *key)
 
   def _get_one(self, num, pix_fmt):
     assert num < self.frame_count
 
     if (num, pix_fmt) in self.frame_cache:
+      self.readahead_stats['cached'] += 1
       return self.frame_cache[(num, pix_fmt)]
 
     with self.cache_lock:
       if (num, pix_fmt) in self.frame_cache:
+        self.readahead_stats['cached'] += 1
         return self.frame_cache[(num, pix_fmt)]
 
-      frame_b, num_frames, skip_frames, rawdat = self.get_gop(num)
-
-      ret = decompress_video_data(rawdat, self.vid_fmt, self.w, self.h, pix_fmt)
-      ret = ret[skip_frames:]
-      assert ret.shape[0] == num_frames
+      frame_b = self.get_gop_start(num)
+      fut = self.readahead_futures.pop((frame_b, pix_fmt), None) if self.readahead else None
+      if fut is not None and not fut.cancelled():
+        self.readahead_stats['hits' if fut.done() else 'waits'] += 1
+        ret = fut.result()
+      else:
+        self.readahead_stats['misses'] += 1
+        ret = self._decode_gop(frame_b, pix_fmt)
 
       for i in range(ret.shape[0]):
         self.frame_cache[(frame_b+i, pix_fmt)] = ret[i]
 
       return self.frame_cache[(num, pix_fmt)]
 
-  def get(self, num, count=1, pix_fmt="yuv420p"):
+  def _decode_gop(self, frame_b, pix_fmt):
+    # returns all frames of the GOP starting at frame_b
+    if self.gop_cache is not None:
+      gop_b, gop_e = self.get_gop_range(frame_b)
+      ret = self.gop_cache.get(self.fn, gop_b, pix_fmt, self.w, self.h, gop_e - gop_b)
+      if ret is not None:
+        return ret
+
+    frame_b, num_frames, skip_frames, rawdat = self.get_gop(frame_b)
+    ret = decompress_video_data(rawdat, self.vid_fmt, self.w, self.h, pix_fmt)
+    ret = ret[skip_frames:]
+    assert ret.shape[0] == num_frames
+
+    if self.gop_cache is not None:
+      self.gop_cache.put(self.fn, frame_b, pix_fmt, self.w, self.h, ret)
+    return ret
+
+  def _check_range(self, num, count, pix_fmt):
     assert self.frame_count is not None
 
     if num + count > self.frame_count:
@@ -506,21 +660,45 @@ class GOPFrameReader(BaseFrameReader):
     if pix_fmt not in ("nv12", "yuv420p", "rgb24", "yuv444p"):
       raise ValueError(f"Unsupported pixel format {pix_fmt!r}")
 
+  def get_batch(self, num, count=1, pix_fmt="yuv420p", out=None):
+    self._check_range(num, count, pix_fmt)
+    out = self._batch_buffer(count, pix_fmt, out)
+
+    # fill out one GOP at a time, without going through the per frame cache
+    end = num + count
+    i = num
+    while i < end:
+      frame_b = self.get_gop_start(i)
+      if self.gop_cache is not None:
+        gop = self._decode_gop(frame_b, pix_fmt)
+        n = min(end, frame_b + gop.shape[0]) - i
+        out[i-num:i-num+n] = gop[i-frame_b:i-frame_b+n]
+      else:
+        frame_b, num_frames, skip_frames, rawdat = self.get_gop(frame_b)
+        n = min(end, frame_b + num_frames) - i
+        written = decompress_video_data_into(rawdat, self.vid_fmt, self.w, self.h, pix_fmt, out[i-num:i-num+n],
+                                             skip_frames=skip_frames + i - frame_b)
+        assert written == n, (written, n)
+      i += n
+
+    return out
+
+  def get(self, num, count=1, pix_fmt="yuv420p"):
+    self._check_range(num, count, pix_fmt)
+
     ret = [self._get_one(num + i, pix_fmt) for i in range(count)]
 
     if self.readahead:
-      self.readahead_last = (num+count, pix_fmt)
-      self.readahead_c.acquire()
-      self.readahead_c.notify()
-      self.readahead_c.release()
+      self._schedule_readahead(num - 1 if self.readbehind else num + count, pix_fmt)
 
     return ret
 
 
 class StreamFrameReader(StreamGOPReader, GOPFrameReader):
-  def __init__(self, fn, frame_type, index_data, readahead=False, readbehind=False):
+  def __init__(self, fn, frame_type, index_data, readahead=False, readbehind=False, gop_cache=None, readahead_workers=2,
+               readahead_gops=None):
     StreamGOPReader.__init__(self, fn, frame_type, index_data)
-    GOPFrameReader.__init__(self, readahead, readbehind)
+    GOPFrameReader.__init__(self, readahead, readbehind, gop_cache, readahead_workers, readahead_gops)
 
 
 def GOPFrameIterator(gop_reader, pix_fmt):
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import pickle
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import capnp
+import numpy as np
+
+from openpilot.common.file_helpers import atomic_write_in_dir, mkdirs_exists_ok, rm_tree_or_link
+from openpilot.tools.lib.cache import cache_path_for_file_path, source_stat, DEFAULT_CACHE_DIR
+from openpilot.tools.lib.logreader import LogReader
+from openpilot.tools.lib.route import Route, SegmentName
+
+LOG_COLUMNS_VERSION = 1
+
+# service -> list of (possibly nested, dot separated) field names, e.g. {"carState": ["vEgo", "cruiseState.speed"]}
+Fields = Dict[str, List[str]]
+Columns = Dict[str, Dict[str, np.ndarray]]
+
+
+def _to_python(field: str, v):
+  if isinstance(v, capnp.lib.capnp._DynamicListReader):
+    return [_to_python(field, x) for x in v]
+  elif isinstance(v, capnp.lib.capnp._DynamicEnum):
+    return str(v)
+  elif isinstance(v, capnp.lib.capnp._DynamicStructReader):
+    raise ValueError(f"{field} is a struct, select one of its fields")
+  return v
+
+
+def _field_value(msg, field: str):
+  for name in field.split('.'):
+    msg = getattr(msg, name)
+  return _to_python(field, msg)
+
+
+def _to_array(values) -> np.ndarray:
+  try:
+    return np.array(values)
+  except ValueError:
+    # variable length lists
+    return np.array(values, dtype=object)
+
+
+def _extract_columns(fn, fields: Fields) -> Columns:
+  values: Dict[str, Dict[str, list]] = {s: defaultdict(list) for s in fields}
+  for msg in LogReader(fn, services=list(fields)):
+    service = msg.which()
+    evt = getattr(msg, service)
+    values[service]['logMonoTime'].append(msg.logMonoTime)
+    for field in fields[service]:
+      values[service][field].append(_field_value(evt, field))
+
+  columns: Columns = {}
+  for service, names in fields.items():
+    columns[service] = {'logMonoTime': np.array(values[service]['logMonoTime'], dtype=np.uint64)}
+    for field in names:
+      columns[service][field] = _to_array(values[service][field])
+  return columns
+
+
+def _column_path(cache_dir, service, field):
+  return os.path.join(cache_dir, f"{service}.{field}.npy")
+
+
+def segment_columns(fn, fields: Fields, cache_dir=DEFAULT_CACHE_DIR) -> Columns:
+  """Fields of services of one log as arrays, one entry per event, plus each service's logMonoTime.
+
+  Every column is cached in ~/.commacache as a .npy file, so repeated reads don't touch capnp.
+  Only services with uncached columns are read from the log.
+  """
+  columns_dir = cache_path_for_file_path(fn, cache_dir) + ".columns"
+  meta_path = os.path.join(columns_dir, "meta")
+  stat = source_stat(fn)
+
+  valid = False
+  if os.path.exists(meta_path):
+    with open(meta_path, "rb") as f:
+      meta = pickle.load(f)
+    valid = meta['version'] == LOG_COLUMNS_VERSION and meta['source_stat'] == stat
+
+  columns: Columns = {}
+  missing: Fields = {}
+  for service, names in fields.items():
+    paths = [_column_path(columns_dir, service, field) for field in ['logMonoTime', *names]]
+    if valid and all(os.path.exists(p) for p in paths):
+      columns[service] = {field: np.load(p, allow_pickle=True) for field, p in zip(['logMonoTime', *names], paths)}
+    else:
+      missing[service] = names
+
+  if missing:
+    extracted = _extract_columns(fn, missing)
+    if not valid:
+      # drop columns of an older version of the log
+      rm_tree_or_link(columns_dir)
+      mkdirs_exists_ok(columns_dir)
+      with atomic_write_in_dir(meta_path, mode="wb", overwrite=True) as f:
+        pickle.dump({'version': LOG_COLUMNS_VERSION, 'source_stat': stat}, f, -1)
+    for service, cols in extracted.items():
+      for field, arr in cols.items():
+        with atomic_write_in_dir(_column_path(columns_dir, service, field), mode="wb", overwrite=True) as f:
+          np.save(f, arr, allow_pickle=arr.dtype == object)
+    columns.update(extracted)
+
+  return columns
+
+
+def route_columns(log_paths, fields: Fields, cache_dir=DEFAULT_CACHE_DIR, workers: Optional[int] = None) -> Columns:
+  """segment_columns of all logs of a route concatenated, optionally extracting segments in a process pool"""
+  log_paths = [p for p in log_paths if p is not None]
+  if workers is not None and workers > 1:
+    with ProcessPoolExecutor(workers) as pool:
+      segments = list(pool.map(segment_columns, log_paths, [fields] * len(log_paths), [cache_dir] * len(log_paths)))
+  else:
+    segments = [segment_columns(fn, fields, cache_dir) for fn in log_paths]
+
+  columns: Columns = {}
+  for service, names in fields.items():
+    columns[service] = {}
+    for field in ['logMonoTime', *names]:
+      arrs = [seg[service][field] for seg in segments]
+      columns[service][field] = np.concatenate(arrs) if len(arrs) else np.empty(0)
+  return columns
+
+
+def columns_from_route_or_segment(r, fields: Fields, cache_dir=DEFAULT_CACHE_DIR, workers: Optional[int] = None) -> Columns:
+  sn = SegmentName(r, allow_route_name=True)
+  route = Route(sn.route_name.canonical_name)
+  if sn.segment_num < 0:
+    return route_columns(route.log_paths(), fields, cache_dir, workers)
+  else:
+    return segment_columns(route.log_paths()[sn.segment_num], fields, cache_dir)
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Extract log fields into arrays, e.g. carState.vEgo carState.steeringAngleDeg")
+  parser.add_argument("route_or_segment")
+  parser.add_argument("fields", nargs="+", help="service.field")
+  parser.add_argument("--workers", type=int, default=None)
+  args = parser.parse_args()
+
+  fields: Fields = defaultdict(list)
+  for f in args.fields:
+    service, field = f.split('.', 1)
+    fields[service].append(field)
+
+  columns = columns_from_route_or_segment(args.route_or_segment, dict(fields), workers=args.workers)
+  for service, cols in columns.items():
+    for field, arr in cols.items():
+      print(f"{service}.{field}: {arr.dtype} {arr.shape}")
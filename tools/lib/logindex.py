@@ -0,0 +1,113 @@
+import os
+import pickle
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from openpilot.common.file_helpers import atomic_write_in_dir
+from openpilot.tools.lib.cache import cache_path_for_file_path, source_stat, DEFAULT_CACHE_DIR
+
+LOG_INDEX_VERSION = 1
+
+
+class LogIndex:
+  """Index of a single log file with one entry per event, in file order.
+
+  Stores logMonoTime, byte offset and size in the decompressed capnp stream,
+  and service of each event, so time and service queries are binary searches.
+  """
+  def __init__(self, mono_times, offsets, sizes, service_ids, services: List[str]):
+    self.mono_times = np.asarray(mono_times, dtype=np.uint64)
+    self.offsets = np.asarray(offsets, dtype=np.uint64)
+    self.sizes = np.asarray(sizes, dtype=np.uint32)
+    self.service_ids = np.asarray(service_ids, dtype=np.uint16)
+    self.services = list(services)
+
+    # logs are only roughly sorted by logMonoTime. Every event before the first one whose running
+    # max reaches a time is earlier, and every event from the first one whose min over the rest
+    # of the log reaches it is later, so both bound a time window with a binary search.
+    self._mono_times_max = np.maximum.accumulate(self.mono_times) if len(self.mono_times) else self.mono_times
+    self._mono_times_rest_min = np.minimum.accumulate(self.mono_times[::-1])[::-1] if len(self.mono_times) else self.mono_times
+    self._service_positions: Dict[str, np.ndarray] = {}
+
+  def __len__(self):
+    return len(self.mono_times)
+
+  def seek(self, mono_time) -> int:
+    """Position of the first event at or after mono_time, len(self) if there is none"""
+    return int(np.searchsorted(self._mono_times_max, mono_time, side='left'))
+
+  def service_positions(self, service: str) -> np.ndarray:
+    if service not in self._service_positions:
+      if service in self.services:
+        positions = np.flatnonzero(self.service_ids == self.services.index(service))
+      else:
+        positions = np.empty(0, dtype=np.int64)
+      self._service_positions[service] = positions
+    return self._service_positions[service]
+
+  def positions(self, services: Optional[Sequence[str]] = None, start_time=None, end_time=None) -> np.ndarray:
+    """Sorted positions of the events of services with start_time <= logMonoTime < end_time"""
+    lo = 0 if start_time is None else self.seek(start_time)
+    hi = len(self) if end_time is None else int(np.searchsorted(self._mono_times_rest_min, end_time, side='left'))
+
+    if services is None:
+      positions = np.arange(lo, hi)
+    else:
+      positions = [p[np.searchsorted(p, lo):np.searchsorted(p, hi)] for p in map(self.service_positions, services)]
+      positions = np.sort(np.concatenate(positions)) if len(positions) else np.empty(0, dtype=np.int64)
+
+    # the running max bounds the window, but events inside it can still be out of order
+    mask = np.ones(len(positions), dtype=bool)
+    if start_time is not None:
+      mask &= self.mono_times[positions] >= start_time
+    if end_time is not None:
+      mask &= self.mono_times[positions] < end_time
+    return positions[mask]
+
+
+class LogIndexBuilder:
+  def __init__(self):
+    self.mono_times: List[int] = []
+    self.sizes: List[int] = []
+    self.service_ids: List[int] = []
+    self.services: Dict[str, int] = {}
+
+  def add(self, size: int, mono_time: int, service: str):
+    self.mono_times.append(mono_time)
+    self.sizes.append(size)
+    self.service_ids.append(self.services.setdefault(service, len(self.services)))
+
+  def build(self) -> LogIndex:
+    sizes = np.array(self.sizes, dtype=np.uint64)
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]) if len(sizes) else sizes
+    return LogIndex(self.mono_times, offsets, sizes, self.service_ids, list(self.services))
+
+
+def log_index_cache_path(fn, cache_dir=DEFAULT_CACHE_DIR):
+  return cache_path_for_file_path(fn, cache_dir) + ".logindex"
+
+
+def get_log_index(fn, build, cache_dir=DEFAULT_CACHE_DIR) -> LogIndex:
+  """Loads the index of fn from the cache, calling build() to create it on a miss"""
+  cache_path = log_index_cache_path(fn, cache_dir)
+  stat = source_stat(fn)
+
+  if os.path.exists(cache_path):
+    with open(cache_path, "rb") as cache_file:
+      dat = pickle.load(cache_file)
+    if dat['version'] == LOG_INDEX_VERSION and dat['source_stat'] == stat:
+      return LogIndex(dat['mono_times'], dat['offsets'], dat['sizes'], dat['service_ids'], dat['services'])
+
+  index = build()
+  with atomic_write_in_dir(cache_path, mode="wb", overwrite=True) as cache_file:
+    pickle.dump({
+      'version': LOG_INDEX_VERSION,
+      'source_stat': stat,
+      'mono_times': index.mono_times,
+      'offsets': index.offsets,
+      'sizes': index.sizes,
+      'service_ids': index.service_ids,
+      'services': index.services,
+    }, cache_file, -1)
+  return index
@@ -2,116 +2,375 @@
 import os
 import sys
 import bz2
+import heapq
+import struct
 import urllib.parse
 import capnp
 import warnings
+import numpy as np
 
-from typing import Iterable, Iterator
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from itertools import islice
+from operator import itemgetter
+from typing import Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
 from cereal import log as capnp_log
+from openpilot.tools.lib.cache import DEFAULT_CACHE_DIR
 from openpilot.tools.lib.filereader import FileReader
+from openpilot.tools.lib.logindex import LogIndex, LogIndexBuilder, get_log_index
 from openpilot.tools.lib.route import Route, SegmentName
 
 LogIterable = Iterable[capnp._DynamicStructReader]
 
+# compressed bytes read from the underlying file per step when streaming
+STREAM_CHUNK_SIZE = 1 << 20
+NO_TRAVERSAL_LIMIT = 2**64-1
+
+# looked up once, reading the schema costs more than reading the discriminant itself
+_EVENT_DISCRIMINANT_OFFSET = capnp_log.Event.schema.node.struct.discriminantOffset * 2
+_unpack_u16 = struct.Struct('<H').unpack_from
+_unpack_u32 = struct.Struct('<I').unpack_from
+_unpack_u64 = struct.Struct('<Q').unpack_from
+
+
+def _decompressed_chunks(f, compressed: bool) -> Iterator[bytes]:
+  decompressor = bz2.BZ2Decompressor() if compressed else None
+  while True:
+    dat = f.read(STREAM_CHUNK_SIZE)
+    if not dat:
+      break
+    if decompressor is None:
+      yield dat
+      continue
+
+    # bz2 files may consist of multiple concatenated streams
+    while dat:
+      yield decompressor.decompress(dat)
+      if not decompressor.eof:
+        break
+      dat = decompressor.unused_data
+      decompressor = bz2.BZ2Decompressor()
+
+
+def _capnp_message_size(buf, pos: int) -> Optional[int]:
+  """Size in bytes of the framed capnp message starting at pos, None if the header isn't complete yet"""
+  if len(buf) - pos < 4:
+    return None
+  segment_count = _unpack_u32(buf, pos)[0] + 1
+  header_size = (4 * (segment_count + 1) + 7) & ~7
+  if len(buf) - pos < header_size:
+    return None
+  if segment_count == 1:
+    # nearly every event
+    return header_size + 8 * _unpack_u32(buf, pos + 4)[0]
+  segment_sizes = struct.unpack_from(f'<{segment_count}I', buf, pos + 4)
+  return header_size + 8 * sum(segment_sizes)
+
+
+def _split_capnp_messages(chunks: Iterable[bytes]) -> Iterator[bytes]:
+  """Splits a stream of capnp framed data into single messages, holding at most one chunk plus a partial message"""
+  buf = bytearray()
+  for chunk in chunks:
+    buf += chunk
+    pos = 0
+    while True:
+      size = _capnp_message_size(buf, pos)
+      if size is None or len(buf) - pos < size:
+        break
+      yield bytes(buf[pos:pos + size])
+      pos += size
+    del buf[:pos]
+
+  if len(buf):
+    warnings.warn("Corrupted events detected", RuntimeWarning, stacklevel=1)
+
+
+def _decode_event(dat: bytes) -> capnp._DynamicStructReader:
+  with capnp_log.Event.from_bytes(dat, traversal_limit_in_words=NO_TRAVERSAL_LIMIT) as evt:
+    return evt
+
+
+def _decode_events(messages: Iterable[bytes]) -> Iterator[capnp._DynamicStructReader]:
+  for dat in messages:
+    try:
+      evt = _decode_event(dat)
+    except capnp.KjException:
+      warnings.warn("Corrupted events detected", RuntimeWarning, stacklevel=1)
+      return
+    yield evt
+
+
+def _event_discriminant(dat: bytes) -> Optional[int]:
+  """Reads the Event union discriminant straight from a framed message, None if it can't be found without capnp"""
+  segment_count = _unpack_u32(dat, 0)[0] + 1
+  segment_start = (4 * (segment_count + 1) + 7) & ~7
+  root = _unpack_u64(dat, segment_start)[0]
+  if root == 0 or root & 3 != 0:
+    # null or far pointer
+    return None
+
+  offset = (root & 0xffffffff) >> 2
+  if offset & (1 << 29):
+    offset -= 1 << 30
+  data_size = ((root >> 32) & 0xffff) * 8
+  if _EVENT_DISCRIMINANT_OFFSET + 2 > data_size:
+    # data section was truncated by an older writer, default value
+    return 0
+  return _unpack_u16(dat, segment_start + 8 * (offset + 1) + _EVENT_DISCRIMINANT_OFFSET)[0]
+
+
+def _service_discriminants(services: Iterable[str]) -> Set[int]:
+  schema = capnp_log.Event.schema
+  unknown = set(services) - set(schema.union_fields)
+  if unknown:
+    raise ValueError(f"unknown services: {', '.join(sorted(unknown))}")
+  return {schema.fields[s].proto.discriminantValue for s in services}
+
+
+def _filter_messages(messages: Iterable[bytes], services: Set[str]) -> Iterator[bytes]:
+  discriminants = _service_discriminants(services)
+  for dat in messages:
+    discriminant = _event_discriminant(dat)
+    if discriminant is None:
+      try:
+        if _decode_event(dat).which() not in services:
+          continue
+      except capnp.KjException:
+        pass
+    elif discriminant not in discriminants:
+      continue
+    yield dat
+
+
 # this is an iterator itself, and uses private variables from LogReader
 class MultiLogIterator:
-  def __init__(self, log_paths, sort_by_time=False):
+  def __init__(self, log_paths, sort_by_time=False, services=None, cache_dir=DEFAULT_CACHE_DIR):
     self._log_paths = log_paths
     self.sort_by_time = sort_by_time
+    self.services = services
+    self.cache_dir = cache_dir
 
     self._first_log_idx = next(i for i in range(len(log_paths)) if log_paths[i] is not None)
-    self._current_log = self._first_log_idx
     self._idx = 0
     self._log_readers = [None]*len(log_paths)
-    self.start_time = self._log_reader(self._first_log_idx)._ts[0]
+    self._log_indexes: List[Optional[LogIndex]] = [None]*len(log_paths)
+    # with services, segments can be left without any events
+    self._current_log = self._next_log(self._first_log_idx)
+    self.start_time = self._log_reader(self._current_log)._ts[0] if self._current_log < len(log_paths) else 0
 
   def _log_reader(self, i):
     if self._log_readers[i] is None and self._log_paths[i] is not None:
       log_path = self._log_paths[i]
-      self._log_readers[i] = LogReader(log_path, sort_by_time=self.sort_by_time)
+      self._log_readers[i] = LogReader(log_path, sort_by_time=self.sort_by_time, stream=False, services=self.services)
 
     return self._log_readers[i]
 
   def __iter__(self) -> Iterator[capnp._DynamicStructReader]:
     return self
 
+  def _next_log(self, i):
+    """First segment from i on with events, len(self._log_paths) if there is none"""
+    return next((j for j in range(i, len(self._log_paths)) if self._log_paths[j] is not None and len(self._log_reader(j)._ents)),
+                len(self._log_paths))
+
   def _inc(self):
     lr = self._log_reader(self._current_log)
     if self._idx < len(lr._ents)-1:
       self._idx += 1
     else:
       self._idx = 0
-      self._current_log = next(i for i in range(self._current_log + 1, len(self._log_readers) + 1)
-                               if i == len(self._log_readers) or self._log_paths[i] is not None)
-      if self._current_log == len(self._log_readers):
-        raise StopIteration
+      self._current_log = self._next_log(self._current_log + 1)
 
   def __next__(self):
-    while 1:
-      lr = self._log_reader(self._current_log)
-      ret = lr._ents[self._idx]
-      self._inc()
-      return ret
+    if self._current_log == len(self._log_readers):
+      raise StopIteration
+    ret = self._log_reader(self._current_log)._ents[self._idx]
+    self._inc()
+    return ret
 
   def tell(self):
     # returns seconds from start of log
     return (self._log_reader(self._current_log)._ts[self._idx] - self.start_time) * 1e-9
 
+  def _log_index(self, i) -> LogIndex:
+    if self._log_indexes[i] is None:
+      # a streaming reader doesn't load the log, the index is read from the cache once it was built
+      self._log_indexes[i] = LogReader(self._log_paths[i]).index(self.cache_dir)
+    return self._log_indexes[i]
+
+  def _seek_idx(self, i, mono_time) -> Tuple[int, int]:
+    """Position of the first event at or after mono_time in segment i's events, and their number, from its log index"""
+    index = self._log_index(i)
+    positions = None if self.services is None else index.positions(self.services)
+    if self.sort_by_time:
+      mono_times = index.mono_times if positions is None else index.mono_times[positions]
+      return int(np.count_nonzero(mono_times < mono_time)), len(mono_times)
+
+    p = index.seek(mono_time)
+    if positions is None:
+      return p, len(index)
+    # the events before p are all earlier, the ones after it can still be out of order
+    start = int(np.searchsorted(positions, p))
+    later = index.mono_times[positions[start:]] >= mono_time
+    return start + (int(later.argmax()) if later.any() else len(later)), len(positions)
+
   def seek(self, ts):
-    # seek to nearest minute
+    # seek to nearest minute, then on to the first event at or after ts by the segments' log indexes,
+    # so only the segment seeked to is loaded
     minute = int(ts/60)
     if minute >= len(self._log_paths) or self._log_paths[minute] is None:
       return False
 
-    self._current_log = minute
+    mono_time = self.start_time + ts * 1e9
+    for i in range(minute, len(self._log_paths)):
+      if self._log_paths[i] is not None:
+        idx, count = self._seek_idx(i, mono_time)
+        if idx < count:
+          self._current_log, self._idx = i, idx
+          return True
 
-    # HACK: O(n) seek afterward
-    self._idx = 0
-    while self.tell() < ts:
-      self._inc()
+    # past the last event
+    self._current_log, self._idx = len(self._log_paths), 0
     return True
 
   def reset(self):
-    self.__init__(self._log_paths, sort_by_time=self.sort_by_time)
+    self.__init__(self._log_paths, sort_by_time=self.sort_by_time, services=self.services, cache_dir=self.cache_dir)
 
 
 class LogReader:
-  def __init__(self, fn, canonicalize=True, only_union_types=False, sort_by_time=False, dat=None):
+  """Reads rlogs/qlogs, either streaming (default) or fully loaded into memory.
+
+  In streaming mode the file is decompressed and parsed incrementally on every
+  iteration, so only a small window of the log is held in memory. Pass stream=False
+  (implied by sort_by_time) to load all events into a list for random access.
+
+  services limits the events to the given services. The union discriminant is read
+  from the raw message, so events of other services are never decoded.
+  """
+  def __init__(self, fn, canonicalize=True, only_union_types=False, sort_by_time=False, dat=None, stream=True,
+               services: Optional[Iterable[str]] = None):
     self.data_version = None
     self._only_union_types = only_union_types
+    self._services = set(services) if services is not None else None
+    if self._services is not None:
+      # fail here rather than on the first iteration of a streaming reader
+      _service_discriminants(self._services)
+    self._fn = fn
+    self._dat = dat
+    self._stream = stream and not sort_by_time
+    self._index: Optional[LogIndex] = None
 
-    ext = None
+    self._compressed = False
     if not dat:
       _, ext = os.path.splitext(urllib.parse.urlparse(fn).path)
       if ext not in ('', '.bz2'):
         # old rlogs weren't bz2 compressed
         raise Exception(f"unknown extension {ext}")
+      self._compressed = ext == ".bz2"
 
-      with FileReader(fn) as f:
-        dat = f.read()
+    if not self._stream:
+      _ents = list(self._read_events())
+      self._ents = list(sorted(_ents, key=lambda x: x.logMonoTime) if sort_by_time else _ents)
+      self._ts = [x.logMonoTime for x in self._ents]
 
-    if ext == ".bz2" or dat.startswith(b'BZh9'):
-      dat = bz2.decompress(dat)
+  @classmethod
+  def from_bytes(cls, dat, **kwargs):
+    return cls("", dat=dat, **kwargs)
 
-    ents = capnp_log.Event.read_multiple_bytes(dat)
+  def _open(self):
+    if self._dat:
+      return BytesIO(self._dat)
+    return FileReader(self._fn)
 
-    _ents = []
-    try:
-      for e in ents:
-        _ents.append(e)
-    except capnp.KjException:
-      warnings.warn("Corrupted events detected", RuntimeWarning, stacklevel=1)
+  def _is_compressed(self, f) -> bool:
+    head = f.read(4)
+    f.seek(0)
+    return self._compressed or head.startswith(b'BZh9')
 
-    self._ents = list(sorted(_ents, key=lambda x: x.logMonoTime) if sort_by_time else _ents)
-    self._ts = [x.logMonoTime for x in self._ents]
+  def _read_messages(self) -> Iterator[bytes]:
+    with self._open() as f:
+      yield from _split_capnp_messages(_decompressed_chunks(f, self._is_compressed(f)))
 
-  @classmethod
-  def from_bytes(cls, dat):
-    return cls("", dat=dat)
+  def _read_filtered_messages(self) -> Iterator[bytes]:
+    messages = self._read_messages()
+    if self._services is not None:
+      messages = _filter_messages(messages, self._services)
+    return messages
+
+  def _read_events(self) -> Iterator[capnp._DynamicStructReader]:
+    return _decode_events(self._read_filtered_messages())
+
+  def raw_messages(self, services: Optional[Iterable[str]] = None) -> Iterator[bytes]:
+    """Yields the undecoded capnp message of each event, in file order.
+
+    Filtered to services, or to the reader's services if not given. For consumers that
+    parse the events themselves, like the C++ CAN parser.
+    """
+    if services is None:
+      return self._read_filtered_messages()
+    services = set(services)
+    _service_discriminants(services)
+    return _filter_messages(self._read_messages(), services)
+
+  def _build_index(self) -> LogIndex:
+    builder = LogIndexBuilder()
+    for dat in self._read_messages():
+      try:
+        evt = _decode_event(dat)
+      except capnp.KjException:
+        warnings.warn("Corrupted events detected", RuntimeWarning, stacklevel=1)
+        break
+      try:
+        service = evt.which()
+      except capnp.KjException:
+        # union types unknown to this version of the schema
+        service = ""
+      builder.add(len(dat), evt.logMonoTime, service)
+    return builder.build()
+
+  def index(self, cache_dir=DEFAULT_CACHE_DIR) -> LogIndex:
+    """Index of the log's events, cached on disk next to the other tools/lib caches"""
+    if self._index is None:
+      if self._dat:
+        self._index = self._build_index()
+      else:
+        self._index = get_log_index(self._fn, self._build_index, cache_dir)
+    return self._index
+
+  def query(self, services: Optional[Sequence[str]] = None, start_time=None, end_time=None,
+            cache_dir=DEFAULT_CACHE_DIR) -> Iterator[capnp._DynamicStructReader]:
+    """Yields events of services with start_time <= logMonoTime < end_time, in file order.
+
+    Uses the log index, so only the matching events are decoded. Uncompressed logs are
+    read with random access, compressed ones still have to be decompressed up to the last match.
+    """
+    index = self.index(cache_dir)
+    positions = index.positions(services, start_time, end_time)
+    if not len(positions):
+      return
+
+    with self._open() as f:
+      if not self._is_compressed(f):
+        for p in positions:
+          f.seek(int(index.offsets[p]))
+          yield _decode_event(f.read(int(index.sizes[p])))
+        return
+
+      wanted = iter(positions)
+      want = next(wanted)
+      for i, dat in enumerate(_split_capnp_messages(_decompressed_chunks(f, True))):
+        if i == want:
+          yield _decode_event(dat)
+          want = next(wanted, None)
+          if want is None:
+            break
 
   def __iter__(self) -> Iterator[capnp._DynamicStructReader]:
-    for ent in self._ents:
+    ents = self._read_events() if self._stream else self._ents
+    for ent in ents:
       if self._only_union_types:
         try:
           ent.which()
@@ -121,13 +380,73 @@ class LogReader:
       else:
         yield ent
 
-def logreader_from_route_or_segment(r, sort_by_time=False):
+def _load_segment_messages(fn, sort_by_time, services) -> List[Tuple[int, bytes]]:
+  # runs in a worker process, capnp readers can't be pickled so raw messages are sent back
+  lr = LogReader(fn, services=services)
+  msgs = [(_decode_event(dat).logMonoTime, dat) for dat in lr._read_filtered_messages()]
+  if sort_by_time:
+    msgs.sort(key=itemgetter(0))
+  return msgs
+
+
+class ParallelLogReader:
+  """Reads the logs of a route in order, decompressing up to readahead segments in a process pool.
+
+  With sort_by_time, events are ordered by logMonoTime across segment boundaries too.
+  """
+  def __init__(self, log_paths, sort_by_time=False, services=None, workers=None, readahead=None):
+    self._log_paths = [p for p in log_paths if p is not None]
+    self.sort_by_time = sort_by_time
+    self.services = services
+    self.workers = workers or os.cpu_count() or 1
+    self.readahead = max(readahead or 2 * self.workers, 1)
+
+  def _segments(self) -> Iterator[List[Tuple[int, bytes]]]:
+    pool = ProcessPoolExecutor(self.workers)
+    try:
+      paths = iter(self._log_paths)
+      futures = deque(pool.submit(_load_segment_messages, fn, self.sort_by_time, self.services)
+                      for fn in islice(paths, self.readahead))
+      while futures:
+        msgs = futures.popleft().result()
+        fn = next(paths, None)
+        if fn is not None:
+          futures.append(pool.submit(_load_segment_messages, fn, self.sort_by_time, self.services))
+        yield msgs
+    finally:
+      pool.shutdown(wait=True, cancel_futures=True)
+
+  def _ordered_messages(self) -> Iterator[Tuple[int, bytes]]:
+    if not self.sort_by_time:
+      for msgs in self._segments():
+        yield from msgs
+      return
+
+    # segments overlap slightly, so hold back the events of the previous segment that
+    # aren't before the start of the current one and merge them in
+    carry: List[Tuple[int, bytes]] = []
+    for msgs in self._segments():
+      if not msgs:
+        continue
+      i = bisect_left(carry, msgs[0][0], key=itemgetter(0))
+      yield from carry[:i]
+      carry = list(heapq.merge(carry[i:], msgs, key=itemgetter(0)))
+    yield from carry
+
+  def __iter__(self) -> Iterator[capnp._DynamicStructReader]:
+    for _, dat in self._ordered_messages():
+      yield _decode_event(dat)
+
+
+def logreader_from_route_or_segment(r, sort_by_time=False, services=None, workers=None):
   sn = SegmentName(r, allow_route_name=True)
   route = Route(sn.route_name.canonical_name)
   if sn.segment_num < 0:
-    return MultiLogIterator(route.log_paths(), sort_by_time=sort_by_time)
+    if workers is not None:
+      return ParallelLogReader(route.log_paths(), sort_by_time=sort_by_time, services=services, workers=workers)
+    return MultiLogIterator(route.log_paths(), sort_by_time=sort_by_time, services=services)
   else:
-    return LogReader(route.log_paths()[sn.segment_num], sort_by_time=sort_by_time)
+    return LogReader(route.log_paths()[sn.segment_num], sort_by_time=sort_by_time, services=services)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+import argparse
+import bz2
+import time
+
+from cereal import log as capnp_log
+from openpilot.tools.lib.logreader import LogReader
+
+
+def make_can_segment(seconds=60):
+  # roughly the mix of an rlog: CAN at 100Hz with ~50 frames per event, carState at 100Hz
+  msgs = []
+  for i in range(seconds * 100):
+    can = capnp_log.Event.new_message()
+    can.logMonoTime = i * 10_000_000
+    frames = can.init('can', 50)
+    for j, frame in enumerate(frames):
+      frame.address = 0x100 + j
+      frame.dat = bytes(8)
+    msgs.append(can.to_bytes())
+
+    cs = capnp_log.Event.new_message()
+    cs.logMonoTime = i * 10_000_000 + 1
+    cs.init('carState').vEgo = i
+    msgs.append(cs.to_bytes())
+  return b"".join(msgs)
+
+
+def bench(name, fn, n):
+  t = time.monotonic()
+  for _ in range(n):
+    cnt = fn()
+  dt = (time.monotonic() - t) / n
+  print(f"{name:<30} {dt*1e3:8.1f} ms  ({cnt} events)")
+  return dt
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Compare filtering services after decoding with LogReader(services=...)")
+  parser.add_argument("log", nargs="?", help="rlog to read, defaults to a synthetic CAN-dominated segment")
+  parser.add_argument("--services", nargs="+", default=["carState"])
+  parser.add_argument("-n", type=int, default=3)
+  args = parser.parse_args()
+
+  dat = open(args.log, "rb").read() if args.log else bz2.compress(make_can_segment())
+  if dat.startswith(b"BZh"):
+    logs = {"bz2": dat, "uncompressed": bz2.decompress(dat)}
+  else:
+    logs = {"uncompressed": dat}
+
+  # bz2 decompression is the same for both and dominates on compressed logs
+  for name, log in logs.items():
+    print(name)
+    base = bench("which() filter", lambda: sum(1 for m in LogReader.from_bytes(log) if m.which() in args.services), args.n)
+    fast = bench("services= filter", lambda: sum(1 for _ in LogReader.from_bytes(log, services=args.services)), args.n)
+    print(f"speedup: {base / fast:.2f}x")
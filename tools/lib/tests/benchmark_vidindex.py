@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+import argparse
+import time
+
+from openpilot.tools.lib.filereader import FileReader
+from openpilot.tools.lib.vidindex import HevcIndexer, hevc_index
+
+TEST_VIDEO = "https://github.com/commaai/comma2k19/blob/master/Example_1/b0c9d2329ad1606b%7C2018-08-02--08-34-47/40/video.hevc?raw=true"
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Time indexing a full segment's video, at once and as a growing file")
+  parser.add_argument("video", nargs="?", default=TEST_VIDEO, help="1 minute hevc video")
+  parser.add_argument("--chunk-size", type=int, default=1024*1024)
+  parser.add_argument("-n", type=int, default=5)
+  args = parser.parse_args()
+
+  with FileReader(args.video) as f:
+    dat = f.read()
+  print(f"{args.video}: {len(dat) / 1e6:.1f} MB")
+
+  t = time.monotonic()
+  for _ in range(args.n):
+    frame_types, _, _ = hevc_index(args.video)
+  dt = (time.monotonic() - t) / args.n
+  print(f"hevc_index:  {dt*1e3:8.1f} ms ({len(frame_types)} frames, includes reading the file)")
+
+  t = time.monotonic()
+  for _ in range(args.n):
+    indexer = HevcIndexer()
+    for i in range(0, len(dat), args.chunk_size):
+      indexer.feed(dat[i:i+args.chunk_size])
+    result = indexer.finish()
+  dt = (time.monotonic() - t) / args.n
+  print(f"incremental: {dt*1e3:8.1f} ms ({args.chunk_size} byte feeds)")
+  assert result[0] == frame_types
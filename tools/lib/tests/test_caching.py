@@ -1,14 +1,47 @@
 #!/usr/bin/env python3
 import os
+import tempfile
+import threading
+import time
 import unittest
 
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 from parameterized import parameterized
 from unittest import mock
 
 from openpilot.system.hardware.hw import Paths
+from openpilot.tools.lib.cache import CacheSizeLimit
 from openpilot.tools.lib.url_file import URLFile
 
+CHUNK_SIZE = 1000
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+  """Serves the server's data with range requests, every range is logged before it is sent"""
+  protocol_version = "HTTP/1.1"
+
+  def log_message(self, *args):
+    pass
+
+  def do_HEAD(self):
+    self.send_response(200)
+    self.send_header("Content-Length", str(len(self.server.data)))
+    self.end_headers()
+
+  def do_GET(self):
+    start, end = map(int, self.headers["Range"].split("=")[1].split("-"))
+    if self.server.barrier is not None:
+      # only passes if all the ranges are requested at the same time
+      self.server.barrier.wait()
+    with self.server.lock:
+      self.server.ranges.append((start, end))
+    dat = self.server.data[start:end + 1]
+    self.send_response(206)
+    self.send_header("Content-Length", str(len(dat)))
+    self.end_headers()
+    self.wfile.write(dat)
+
 
 class TestFileDownload(unittest.TestCase):
 
@@ -93,6 +126,74 @@ class TestFileDownload(unittest.TestCase):
         tempfile_length.unlink()
       patch_length.stop()
 
+  def test_cache_eviction(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      cache = CacheSizeLimit(limit=1000)
+      for i in range(10):
+        with open(os.path.join(tmp, str(i)), "wb") as f:
+          f.write(bytes(200))
+        os.utime(os.path.join(tmp, str(i)), (time.time() + i, time.time() + i))
+        cache.add(tmp, 200)
+
+      remaining = sorted(int(f) for f in os.listdir(tmp))
+      self.assertLessEqual(len(remaining) * 200, 1000)
+      # the most recently used files are kept
+      self.assertEqual(remaining, list(range(10 - len(remaining), 10)))
+
+
+class TestConcurrentDownload(unittest.TestCase):
+  def setUp(self):
+    self.server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    self.server.data = bytes(i % 251 for i in range(6 * CHUNK_SIZE))
+    self.server.ranges = []
+    self.server.lock = threading.Lock()
+    self.server.barrier = None
+    threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    self.addCleanup(self.server.server_close)
+    self.addCleanup(self.server.shutdown)
+    self.url = f"http://127.0.0.1:{self.server.server_address[1]}/fcamera.hevc"
+
+    cache_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(cache_dir.cleanup)
+    for patcher in (mock.patch.dict(os.environ, {"COMMA_CACHE": cache_dir.name}),
+                    mock.patch("openpilot.tools.lib.url_file.CHUNK_SIZE", CHUNK_SIZE)):
+      patcher.start()
+      self.addCleanup(patcher.stop)
+
+  def chunks(self):
+    # waits for the chunks read ahead in the background
+    for fut in list(URLFile._inflight.values()):
+      fut.result()
+    return sorted(start // CHUNK_SIZE for start, _ in self.server.ranges)
+
+  @parameterized.expand([(True, ), (False, )])
+  def test_concurrent_chunks(self, cache_enabled):
+    self.server.barrier = threading.Barrier(3, timeout=5)
+    f = URLFile(self.url, cache=cache_enabled, readahead=0)
+    f.seek(CHUNK_SIZE // 2)
+    # three chunks when caching, three chunk sized ranges when not
+    self.assertEqual(f.read(ll=5 * CHUNK_SIZE // 2), self.server.data[CHUNK_SIZE // 2:3 * CHUNK_SIZE])
+    self.assertEqual(self.chunks(), [0, 1, 2])
+
+  def test_readahead(self):
+    f = URLFile(self.url, cache=True, readahead=2)
+    self.assertEqual(f.read(ll=CHUNK_SIZE), self.server.data[:CHUNK_SIZE])
+    self.assertEqual(self.chunks(), [0, 1, 2])
+
+    # sequential reads keep the read-ahead window full
+    self.assertEqual(f.read(ll=CHUNK_SIZE), self.server.data[CHUNK_SIZE:2 * CHUNK_SIZE])
+    self.assertEqual(self.chunks(), [0, 1, 2, 3])
+
+    # seeking isn't sequential, only the chunk read is fetched
+    f.seek(5 * CHUNK_SIZE)
+    self.assertEqual(f.read(), self.server.data[5 * CHUNK_SIZE:])
+    self.assertEqual(self.chunks(), [0, 1, 2, 3, 5])
+
+    # a new file reads the chunks from the cache
+    f = URLFile(self.url, cache=True, readahead=0)
+    self.assertEqual(f.read(ll=4 * CHUNK_SIZE), self.server.data[:4 * CHUNK_SIZE])
+    self.assertEqual(self.chunks(), [0, 1, 2, 3, 5])
+
 
 if __name__ == "__main__":
   unittest.main()
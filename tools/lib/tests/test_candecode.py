@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+import bz2
+import random
+import tempfile
+import unittest
+
+import numpy as np
+from unittest import mock
+
+from cereal import log as capnp_log
+from opendbc.can.packer import CANPacker
+from opendbc.can.parser import CANParser
+from openpilot.tools.lib.candecode import route_can_series, segment_can_series
+from openpilot.tools.lib.logreader import LogReader
+
+DBC = "hyundai_kia_generic"
+SIGNALS = [("CLU11", "CF_Clu_Vanz"), ("WHL_SPD11", "WHL_SPD_FL"), (902, "WHL_SPD_RR"), ("TCS13", "aBasis")]
+MESSAGES = [("CLU11", 0), ("WHL_SPD11", 0), ("TCS13", 0)]
+
+
+def make_log(start, n, seed):
+  rnd = random.Random(seed)
+  packer = CANPacker(DBC)
+  msgs = []
+  for i in range(n):
+    msg = capnp_log.Event.new_message()
+    msg.logMonoTime = start + i * 10
+    if i % 5 == 0:
+      msg.init('carState').vEgo = i
+      msgs.append(msg.to_bytes())
+      continue
+
+    frames = []
+    for _ in range(rnd.randint(0, 4)):
+      bus = rnd.choice((0, 0, 1))
+      if rnd.random() < 0.5:
+        frames.append(packer.make_can_msg("CLU11", bus, {"CF_Clu_Vanz": rnd.randint(0, 500) / 2}))
+      else:
+        speed = rnd.randint(0, 8000) / 32
+        frames.append(packer.make_can_msg("WHL_SPD11", bus, {"WHL_SPD_FL": speed, "WHL_SPD_RR": speed / 2}))
+    can = msg.init('can', len(frames))
+    for c, (address, _, dat, src) in zip(can, frames):
+      c.address = address
+      c.dat = dat
+      c.src = src
+    msgs.append(msg.to_bytes())
+  return bz2.compress(b"".join(msgs))
+
+
+def update_strings_series(dat):
+  # reference: every can event through update_strings on its own
+  cp = CANParser(DBC, MESSAGES, 0)
+  series = {key: ([], []) for key in SIGNALS}
+  for evt in LogReader.from_bytes(dat):
+    if evt.which() != 'can':
+      continue
+    cp.update_strings([evt.as_builder().to_bytes()])
+    for msg, sig in SIGNALS:
+      values = cp.vl_all[msg][sig]
+      series[(msg, sig)][0].extend([evt.logMonoTime] * len(values))
+      series[(msg, sig)][1].extend(values)
+  return series
+
+
+class TestCanDecode(unittest.TestCase):
+  def assertSeriesEqual(self, series, expected):
+    self.assertEqual(list(series), SIGNALS)
+    for key in SIGNALS:
+      ts, values = series[key]
+      self.assertEqual(ts.dtype, np.uint64)
+      self.assertEqual(values.dtype, np.float64)
+      np.testing.assert_array_equal(ts, expected[key][0])
+      np.testing.assert_array_equal(values, expected[key][1])
+
+  def test_segment_parity(self):
+    dat = make_log(1000, 500, 0)
+    expected = update_strings_series(dat)
+    self.assertGreater(len(expected[SIGNALS[0]][1]), 0)
+    self.assertEqual(len(expected[("TCS13", "aBasis")][1]), 0)
+
+    for batch_size in (7, 10000):
+      with mock.patch('openpilot.tools.lib.candecode.BATCH_SIZE', batch_size):
+        self.assertSeriesEqual(segment_can_series(LogReader.from_bytes(dat), DBC, SIGNALS), expected)
+
+  def test_route_parity(self):
+    segments = [make_log(i * 10000, 300, i) for i in range(3)]
+    expected = {key: ([], []) for key in SIGNALS}
+    for dat in segments:
+      for key, (ts, values) in update_strings_series(dat).items():
+        expected[key][0].extend(ts)
+        expected[key][1].extend(values)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+      paths = []
+      for i, dat in enumerate(segments):
+        paths.append(f"{tmpdir}/rlog{i}.bz2")
+        with open(paths[-1], "wb") as f:
+          f.write(dat)
+
+      for workers in (None, 2):
+        self.assertSeriesEqual(route_can_series(paths + [None], DBC, SIGNALS, workers=workers), expected)
+
+
+if __name__ == "__main__":
+  unittest.main()
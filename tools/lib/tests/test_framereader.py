@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+import os
+import subprocess
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+from unittest import mock
+
+from openpilot.tools.lib.framereader import FrameReader, GOPCache, GOPReader, GOPFrameReader, decompress_video_data, \
+                                            decompress_video_data_into, frame_shape
+
+GOP_SIZE = 10
+PIX_FMT = "yuv420p"
+
+
+class FakeFrameReader(GOPReader, GOPFrameReader):
+  """GOP based reader over synthetic GOPs, every pixel of frame i is set to i"""
+  def __init__(self, fn, frame_count=40, gate=None, barrier=None, **kwargs):
+    self.fn = fn
+    self.vid_fmt = "hevc"
+    self.w, self.h = 8, 4
+    self.frame_count = frame_count
+    # decoding ahead blocks on the gate and the barrier, decoding on demand never does
+    self.gate = gate
+    self.barrier = barrier
+    self.decoding_ahead = threading.Event()
+    self.decoded = []
+    GOPFrameReader.__init__(self, **kwargs)
+
+  def get_gop_range(self, num):
+    frame_b = num - num % GOP_SIZE
+    return frame_b, min(frame_b + GOP_SIZE, self.frame_count)
+
+  def get_gop(self, num):
+    frame_b, frame_e = self.get_gop_range(num)
+    return frame_b, frame_e - frame_b, 0, (frame_b, frame_e)
+
+  def decompress(self, rawdat, vid_fmt, w, h, pix_fmt):
+    if threading.current_thread() is not threading.main_thread():
+      self.decoding_ahead.set()
+      if self.gate is not None:
+        self.gate.wait()
+      if self.barrier is not None:
+        self.barrier.wait()
+    frame_b, frame_e = rawdat
+    self.decoded.append(frame_b)
+    frames = np.empty((frame_e - frame_b, *frame_shape(pix_fmt, w, h)), dtype=np.uint8)
+    for i in range(frames.shape[0]):
+      frames[i] = frame_b + i
+    return frames
+
+
+class TestReadahead(unittest.TestCase):
+  def setUp(self):
+    self.fn = tempfile.NamedTemporaryFile()
+    self.fn.write(b"\x00" * 100)
+    self.fn.flush()
+
+  def tearDown(self):
+    self.fn.close()
+
+  def _reader(self, **kwargs):
+    fr = FakeFrameReader(self.fn.name, readahead=True, **kwargs)
+    patcher = mock.patch('openpilot.tools.lib.framereader.decompress_video_data', side_effect=fr.decompress)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+    self.addCleanup(fr.close)
+    return fr
+
+  def _check_frame(self, fr, num):
+    frame = fr.get(num, pix_fmt=PIX_FMT)[0]
+    self.assertTrue(np.all(frame == num))
+
+  def test_workers(self):
+    # the GOPs read ahead are only decoded if the workers run at the same time
+    barrier = threading.Barrier(3, timeout=5)
+    fr = self._reader(barrier=barrier, readahead_workers=3, readahead_gops=4)
+    self._check_frame(fr, 0)
+
+    futures = list(fr.readahead_futures.values())
+    self.assertEqual(len(futures), 3)
+    for fut in futures:
+      fut.result()
+    self.assertEqual(sorted(fr.decoded), [0, 10, 20, 30])
+    self.assertEqual(fr.readahead_pool._max_workers, 3)
+
+  def test_counters(self):
+    gate = threading.Event()
+    fr = self._reader(gate=gate, readahead_workers=1, readahead_gops=2)
+    self.addCleanup(gate.set)
+    for i in range(GOP_SIZE):
+      self._check_frame(fr, i)
+
+    # GOP 10 is still blocked in the worker
+    threading.Timer(0.1, gate.set).start()
+    for i in range(GOP_SIZE, 2*GOP_SIZE):
+      self._check_frame(fr, i)
+
+    # GOP 20 is fully decoded before it is read
+    fr.readahead_futures[(2*GOP_SIZE, PIX_FMT)].result()
+    for i in range(2*GOP_SIZE, 3*GOP_SIZE):
+      self._check_frame(fr, i)
+
+    self.assertEqual(fr.readahead_stats, {'cached': 3*GOP_SIZE - 3, 'hits': 1, 'waits': 1, 'misses': 1, 'cancelled': 0})
+
+  def test_seek_cancels(self):
+    gate = threading.Event()
+    fr = self._reader(gate=gate, readahead_workers=1, readahead_gops=3)
+    self.addCleanup(gate.set)
+    self._check_frame(fr, 0)
+    pending = dict(fr.readahead_futures)
+    self.assertEqual(set(pending), {(10, PIX_FMT), (20, PIX_FMT)})
+    self.assertTrue(fr.decoding_ahead.wait(5))
+
+    # GOP 30 doesn't need the pending GOPs, the queued one never gets decoded
+    self._check_frame(fr, 35)
+    self.assertEqual(fr.readahead_futures, {})
+    self.assertTrue(pending[(20, PIX_FMT)].cancelled())
+    # GOP 10 is already decoding and isn't counted as cancelled
+    self.assertFalse(pending[(10, PIX_FMT)].cancelled())
+    gate.set()
+    fr.close()
+
+    self.assertEqual(fr.decoded, [0, 30, 10])
+    self.assertEqual(fr.readahead_stats, {'cached': 0, 'hits': 0, 'waits': 0, 'misses': 2, 'cancelled': 1})
+
+
+class TestGOPCache(unittest.TestCase):
+  def setUp(self):
+    self.fn = tempfile.NamedTemporaryFile()
+    self.fn.write(b"\x00" * 100)
+    self.fn.flush()
+    self.cache_dir = tempfile.TemporaryDirectory()
+    self.cache = GOPCache(self.cache_dir.name)
+
+  def tearDown(self):
+    self.fn.close()
+    self.cache_dir.cleanup()
+
+  def _reader(self):
+    fr = FakeFrameReader(self.fn.name, gop_cache=self.cache)
+    patcher = mock.patch('openpilot.tools.lib.framereader.decompress_video_data', side_effect=fr.decompress)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+    return fr
+
+  def _cache_files(self):
+    return [os.path.join(self.cache_dir.name, f) for f in os.listdir(self.cache_dir.name)]
+
+  def test_hit(self):
+    fr = self._reader()
+    frames = fr.get_batch(0, 2*GOP_SIZE, pix_fmt=PIX_FMT)
+    self.assertEqual(fr.decoded, [0, 10])
+
+    # a new reader reads the same video from the cache
+    fr = self._reader()
+    np.testing.assert_array_equal(fr.get_batch(0, 2*GOP_SIZE, pix_fmt=PIX_FMT), frames)
+    self.assertEqual(fr.decoded, [])
+
+  def test_key(self):
+    frames = np.zeros((GOP_SIZE, *frame_shape(PIX_FMT, 8, 4)), dtype=np.uint8)
+    self.cache.put(self.fn.name, 0, PIX_FMT, 8, 4, frames)
+    self.assertIsNotNone(self.cache.get(self.fn.name, 0, PIX_FMT, 8, 4, GOP_SIZE))
+
+    self.assertIsNone(self.cache.get(self.fn.name, 10, PIX_FMT, 8, 4, GOP_SIZE))
+    self.assertIsNone(self.cache.get(self.fn.name, 0, "nv12", 8, 4, GOP_SIZE))
+    self.assertIsNone(self.cache.get(self.fn.name, 0, PIX_FMT, 4, 8, GOP_SIZE))
+
+    # rewriting the video changes its size and mtime
+    self.fn.write(b"\x00")
+    self.fn.flush()
+    self.assertIsNone(self.cache.get(self.fn.name, 0, PIX_FMT, 8, 4, GOP_SIZE))
+
+  def test_truncated(self):
+    fr = self._reader()
+    frames = fr.get_batch(0, GOP_SIZE, pix_fmt=PIX_FMT)
+    path, = self._cache_files()
+    size = os.path.getsize(path)
+
+    # a partial frame, a missing frame and an empty file are all decoded again
+    for truncated_size in (size - 1, size - frames[0].nbytes, 0):
+      with open(path, "r+b") as f:
+        f.truncate(truncated_size)
+      self.assertIsNone(self.cache.get(self.fn.name, 0, PIX_FMT, 8, 4, GOP_SIZE))
+
+      fr = self._reader()
+      np.testing.assert_array_equal(fr.get_batch(0, GOP_SIZE, pix_fmt=PIX_FMT), frames)
+      self.assertEqual(fr.decoded, [0])
+      self.assertEqual(os.path.getsize(path), size)
+
+
+class TestStreamFrameReader(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    # 25 frames in GOPs of 10, the last one shorter
+    cls.tmpdir = tempfile.TemporaryDirectory()
+    cls.fn = os.path.join(cls.tmpdir.name, "fcamera.hevc")
+    subprocess.check_call(["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "testsrc=size=64x48:rate=20", "-frames:v", "25",
+                           "-c:v", "libx265", "-x265-params", "keyint=10:min-keyint=10:scenecut=0:bframes=0:log-level=error",
+                           "-f", "hevc", cls.fn])
+
+  @classmethod
+  def tearDownClass(cls):
+    cls.tmpdir.cleanup()
+
+  def _reader(self, **kwargs):
+    fr = FrameReader(self.fn, cache_dir=self.tmpdir.name, **kwargs)
+    self.addCleanup(fr.close)
+    return fr
+
+  def test_get_batch(self):
+    fr = self._reader()
+    self.assertEqual((fr.frame_count, fr.w, fr.h), (25, 64, 48))
+    self.assertEqual([fr.get_gop_range(i) for i in (0, 10, 24)], [(0, 10), (10, 20), (20, 25)])
+
+    # within a GOP, from the middle of one across the next, and up to the end
+    for pix_fmt in ("yuv420p", "rgb24"):
+      for num, count in ((0, 1), (3, 4), (7, 15), (0, 25), (24, 1)):
+        frames = np.stack(fr.get(num, count, pix_fmt=pix_fmt))
+        np.testing.assert_array_equal(fr.get_batch(num, count, pix_fmt=pix_fmt), frames)
+
+        out = np.empty_like(frames)
+        self.assertIs(fr.get_batch(num, count, pix_fmt=pix_fmt, out=out), out)
+        np.testing.assert_array_equal(out, frames)
+
+  def test_decompress_into(self):
+    fr = self._reader()
+    _, num_frames, _, rawdat = fr.get_gop(0)
+    frames = decompress_video_data(rawdat, fr.vid_fmt, fr.w, fr.h, PIX_FMT)
+    self.assertEqual(frames.shape[0], num_frames)
+
+    # decoding stops once out is full
+    out = np.zeros((4, *frame_shape(PIX_FMT, fr.w, fr.h)), dtype=np.uint8)
+    written = decompress_video_data_into(rawdat, fr.vid_fmt, fr.w, fr.h, PIX_FMT, out, skip_frames=3)
+    self.assertEqual(written, 4)
+    np.testing.assert_array_equal(out, frames[3:7])
+
+    # or once the GOP ends
+    written = decompress_video_data_into(rawdat, fr.vid_fmt, fr.w, fr.h, PIX_FMT, out, skip_frames=8)
+    self.assertEqual(written, 2)
+    np.testing.assert_array_equal(out[:2], frames[8:])
+
+  def test_readahead_options(self):
+    fr = self._reader(readahead=True, readahead_workers=1, readahead_gops=3)
+    self.assertEqual((fr.readahead_pool._max_workers, fr.readahead_gops), (1, 3))
+    frames = fr.get(0, 10, pix_fmt=PIX_FMT)
+    np.testing.assert_array_equal(np.stack(fr.get(10, 15, pix_fmt=PIX_FMT)), fr.get_batch(10, 15, pix_fmt=PIX_FMT))
+    np.testing.assert_array_equal(np.stack(frames), fr.get_batch(0, 10, pix_fmt=PIX_FMT))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+import bz2
+import random
+import tempfile
+import unittest
+
+from cereal import log as capnp_log
+from openpilot.tools.lib.logcolumns import segment_columns
+from openpilot.tools.lib.logreader import LogReader, MultiLogIterator, ParallelLogReader
+
+
+def make_log(n=1000):
+  msgs = []
+  for i in range(n):
+    msg = capnp_log.Event.new_message()
+    msg.logMonoTime = n - i
+    if i % 2:
+      msg.init('carState').vEgo = i
+    else:
+      msg.init('can', 1)
+    msgs.append(msg.to_bytes())
+  return b"".join(msgs)
+
+
+def make_can_log(start, n):
+  msgs = []
+  for i in range(n):
+    msg = capnp_log.Event.new_message()
+    msg.logMonoTime = start + i
+    msg.init('can', 1)
+    msgs.append(msg.to_bytes())
+  return b"".join(msgs)
+
+
+class TestLogReader(unittest.TestCase):
+  def setUp(self):
+    self.dat = make_log()
+
+  def test_stream_matches_list(self):
+    for compress in (False, True):
+      dat = bz2.compress(self.dat) if compress else self.dat
+      with tempfile.NamedTemporaryFile(suffix=".bz2" if compress else "") as f:
+        f.write(dat)
+        f.flush()
+
+        streamed = [m.as_builder().to_bytes() for m in LogReader(f.name)]
+        loaded = [m.as_builder().to_bytes() for m in LogReader(f.name, stream=False)]
+        self.assertEqual(len(streamed), 1000)
+        self.assertEqual(streamed, loaded)
+
+        # streaming readers can be iterated more than once
+        lr = LogReader(f.name)
+        self.assertEqual(len(list(lr)), len(list(lr)))
+
+  def test_services_filter(self):
+    lr = LogReader.from_bytes(bz2.compress(self.dat))
+    for services in (['carState'], ['can'], ['can', 'carState'], ['controlsState']):
+      expected = [m.logMonoTime for m in lr if m.which() in services]
+      filtered = LogReader.from_bytes(bz2.compress(self.dat), services=services)
+      self.assertEqual([m.logMonoTime for m in filtered], expected)
+
+  def test_raw_messages(self):
+    lr = LogReader.from_bytes(bz2.compress(self.dat))
+    raw = list(lr.raw_messages())
+    self.assertEqual(b"".join(raw), self.dat)
+
+    for services in (['carState'], ['can', 'carState']):
+      expected = [m.logMonoTime for m in lr if m.which() in services]
+      raw = b"".join(lr.raw_messages(services))
+      self.assertEqual([m.logMonoTime for m in LogReader.from_bytes(raw)], expected)
+
+    # the reader's services unless others are given
+    lr = LogReader.from_bytes(self.dat, services=['carState'])
+    self.assertEqual(len(list(lr.raw_messages())), 500)
+    self.assertEqual(len(list(lr.raw_messages(['can']))), 500)
+    with self.assertRaisesRegex(ValueError, "carStat"):
+      lr.raw_messages(['carStat'])
+
+  def test_unknown_service(self):
+    with self.assertRaisesRegex(ValueError, "carStat"):
+      LogReader.from_bytes(self.dat, services=['carStat'])
+    with self.assertRaisesRegex(ValueError, "logMonoTime"):
+      LogReader.from_bytes(self.dat, services=['can', 'logMonoTime'])
+
+  def test_multi_log_empty_segments(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      paths = [f"{tmp}/{i}.bz2" for i in range(3)]
+      for i, dat in enumerate((make_can_log(0, 100), make_log(100), make_can_log(200 * 10**9, 100))):
+        with open(paths[i], "wb") as f:
+          f.write(bz2.compress(dat))
+
+      # only the middle segment has carState
+      expected = [m.logMonoTime for m in LogReader(paths[1], services=['carState'])]
+      lr = MultiLogIterator(paths + [None], services=['carState'])
+      self.assertEqual(lr.start_time, expected[0])
+      self.assertEqual([m.logMonoTime for m in lr], expected)
+
+      self.assertTrue(lr.seek(0))
+      self.assertEqual(next(lr).logMonoTime, expected[0])
+      self.assertFalse(MultiLogIterator(paths, services=['carState']).seek(200))
+      # past the last event
+      for ts in (119, 150):
+        lr = MultiLogIterator(paths, services=['carState'])
+        self.assertTrue(lr.seek(ts))
+        self.assertEqual(list(lr), [])
+
+  def test_multi_log_seek(self):
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as tmp:
+      paths = []
+      for seg in range(3):
+        msgs = []
+        for i in range(600):
+          msg = capnp_log.Event.new_message()
+          # roughly sorted by time, as logs are
+          msg.logMonoTime = 10**12 + seg * 60 * 10**9 + i * 10**8 + random.randint(-3 * 10**8, 3 * 10**8)
+          if i % 3:
+            msg.init('can', 1)
+          else:
+            msg.init('carState').vEgo = i
+          msgs.append(msg.to_bytes())
+        paths.append(f"{tmp}/{seg}.bz2")
+        with open(paths[-1], "wb") as f:
+          f.write(bz2.compress(b"".join(msgs)))
+
+      for sort_by_time in (False, True):
+        for services in (None, ['carState']):
+          lr = MultiLogIterator(paths, sort_by_time=sort_by_time, services=services, cache_dir=tmp)
+          events = [(seg, m.logMonoTime) for seg, p in enumerate(paths)
+                    for m in LogReader(p, sort_by_time=sort_by_time, services=services)]
+          for ts in (0, 0.05, 12.34, 59.99, 60, 61.5, 130, 179.9, 179.99):
+            # as stepping through the events from the start of the minute's segment
+            mono_time = lr.start_time + ts * 1e9
+            expected = next((t for seg, t in events if seg >= int(ts / 60) and t >= mono_time), None)
+            self.assertTrue(lr.seek(ts))
+            self.assertEqual(getattr(next(lr, None), 'logMonoTime', None), expected, (sort_by_time, services, ts))
+          self.assertFalse(lr.seek(180))
+
+      with self.assertRaises(StopIteration):
+        next(MultiLogIterator(paths, services=['controlsState']))
+
+  def test_sort_by_time(self):
+    lr = LogReader.from_bytes(bz2.compress(self.dat), sort_by_time=True)
+    ts = [m.logMonoTime for m in lr]
+    self.assertEqual(ts, sorted(ts))
+
+  def test_query(self):
+    with tempfile.TemporaryDirectory() as cache_dir:
+      for compress in (False, True):
+        with tempfile.NamedTemporaryFile(suffix=".bz2" if compress else "") as f:
+          f.write(bz2.compress(self.dat) if compress else self.dat)
+          f.flush()
+
+          lr = LogReader(f.name)
+          index = lr.index(cache_dir=cache_dir)
+          self.assertEqual(len(index), 1000)
+          self.assertEqual(sorted(index.services), ['can', 'carState'])
+
+          expected = [m.logMonoTime for m in lr if m.which() == 'carState' and 100 <= m.logMonoTime < 200]
+          result = [m.logMonoTime for m in lr.query(['carState'], start_time=100, end_time=200)]
+          self.assertEqual(result, expected)
+
+          # cached index is reused
+          self.assertEqual(LogReader(f.name).index(cache_dir=cache_dir).services, index.services)
+
+  def test_parallel_reader(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      paths = []
+      for i in range(4):
+        paths.append(f"{tmp}/{i}.bz2")
+        with open(paths[-1], "wb") as f:
+          f.write(bz2.compress(make_log(100 * (i + 1))))
+
+      expected = [m.logMonoTime for p in paths for m in LogReader(p)]
+      self.assertEqual([m.logMonoTime for m in ParallelLogReader(paths, workers=2, readahead=1)], expected)
+
+      expected_sorted = sorted(expected)
+      self.assertEqual([m.logMonoTime for m in ParallelLogReader(paths + [None], sort_by_time=True, workers=2)], expected_sorted)
+
+  def test_columns(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      fn = f"{tmp}/rlog.bz2"
+      with open(fn, "wb") as f:
+        f.write(bz2.compress(self.dat))
+
+      expected = [(m.logMonoTime, m.carState.vEgo) for m in LogReader(fn, services=['carState'])]
+      for _ in range(2):
+        columns = segment_columns(fn, {'carState': ['vEgo']}, cache_dir=tmp)
+        self.assertEqual(list(zip(columns['carState']['logMonoTime'], columns['carState']['vEgo'], strict=True)), expected)
+
+  def test_truncated_log(self):
+    with self.assertWarns(RuntimeWarning):
+      msgs = list(LogReader.from_bytes(self.dat[:-10]))
+    self.assertEqual(len(msgs), 999)
+
+
+if __name__ == "__main__":
+  unittest.main()
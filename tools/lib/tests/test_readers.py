@@ -52,6 +52,10 @@ class TestReaders(unittest.TestCase):
       assert np.all(frame_first_30[0] == frame_0[0])
       assert np.all(frame_first_30[15] == frame_15[0])
 
+      batch = np.empty((20, f.h * f.w * 3 // 2), dtype=np.uint8)
+      f.get_batch(10, 20, out=batch)
+      assert np.all(batch == np.stack(frame_first_30[10:30]))
+
     with tempfile.NamedTemporaryFile(suffix=".hevc") as fp:
       r = requests.get("https://github.com/commaai/comma2k19/blob/master/Example_1/b0c9d2329ad1606b%7C2018-08-02--08-34-47/40/video.hevc?raw=true", timeout=10)
       fp.write(r.content)
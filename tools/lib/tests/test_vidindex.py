@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+import os
+import tempfile
+import unittest
+
+from openpilot.tools.lib.vidindex import HevcIndexer, HevcNalUnitType, hevc_index, get_ue
+
+HEVC_SLICE_P = 1
+HEVC_SLICE_I = 2
+
+
+def nal_unit(nal_unit_type, payload):
+  return b"\x00\x00\x01" + bytes([nal_unit_type << 1, 1]) + payload
+
+
+def payload(n):
+  # random data with emulation prevention, so it can't contain start codes
+  return os.urandom(n).replace(b"\x00\x00", b"\x00\x00\x03")
+
+
+def make_stream(frames=100, gop=20):
+  dat = b"\x00" + nal_unit(HevcNalUnitType.VPS_NUT, payload(20)) + nal_unit(HevcNalUnitType.SPS_NUT, payload(30)) + \
+        nal_unit(HevcNalUnitType.PPS_NUT, payload(5))
+  expected = []
+  for i in range(frames):
+    if i % gop == 0:
+      # first_slice_segment_in_pic_flag, no_output_of_prior_pics_flag, pps id 0, slice type I
+      # the index points at the 3 byte start code after the leading zero byte
+      expected.append((HEVC_SLICE_I, len(dat) + 1))
+      dat += b"\x00" + nal_unit(HevcNalUnitType.IDR_W_RADL, b"\xac" + payload(2000))
+    else:
+      # first_slice_segment_in_pic_flag, pps id 0, slice type P, followed by a second slice
+      expected.append((HEVC_SLICE_P, len(dat)))
+      dat += nal_unit(HevcNalUnitType.TRAIL_R, b"\xd0" + payload(500))
+      dat += nal_unit(HevcNalUnitType.TRAIL_R, b"\x40" + payload(500))
+  return dat, expected
+
+
+class TestVidIndex(unittest.TestCase):
+  def test_get_ue(self):
+    self.assertEqual(get_ue(b"\x80", 0, 0), (0, 1))
+    self.assertEqual(get_ue(b"\x40", 0, 0), (1, 3))
+    self.assertEqual(get_ue(b"\x30", 0, 1), (2, 3))
+    # longer than the initial window
+    self.assertEqual(get_ue(b"\x00" * 4 + b"\x80" + b"\x00" * 4, 0, 0), (2**32 - 1, 65))
+
+  def test_hevc_index(self):
+    dat, expected = make_stream()
+    with tempfile.NamedTemporaryFile(suffix=".hevc") as f:
+      f.write(dat)
+      f.flush()
+      frame_types, dat_len, prefix = hevc_index(f.name)
+
+    self.assertEqual(frame_types, expected)
+    self.assertEqual(dat_len, len(dat))
+    self.assertTrue(prefix.startswith(b"\x00\x00\x01"))
+    self.assertEqual(prefix.count(b"\x00\x00\x01"), 3)
+
+  def test_incremental(self):
+    dat, _ = make_stream()
+    with tempfile.NamedTemporaryFile(suffix=".hevc") as f:
+      f.write(dat)
+      f.flush()
+      expected = hevc_index(f.name)
+
+    for chunk_size in (1, 3, 1000, 4096):
+      indexer = HevcIndexer()
+      for i in range(0, len(dat), chunk_size):
+        indexer.feed(dat[i:i+chunk_size])
+      self.assertEqual(indexer.finish(), expected)
+
+
+if __name__ == "__main__":
+  unittest.main()
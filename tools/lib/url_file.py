@@ -2,15 +2,25 @@ import os
 import time
 import threading
 import pycurl
+from concurrent.futures import Future, ThreadPoolExecutor
 from hashlib import sha256
 from io import BytesIO
+from typing import Dict, Optional
 from tenacity import retry, wait_random_exponential, stop_after_attempt
 from openpilot.common.file_helpers import mkdirs_exists_ok, atomic_write_in_dir
+from openpilot.tools.lib.cache import CacheSizeLimit
 from openpilot.system.hardware.hw import Paths
 #  Cache chunk size
 K = 1000
 CHUNK_SIZE = 1000 * K
 
+#  Number of concurrent range requests, each thread keeps its own keep-alive curl handle
+DOWNLOAD_THREADS = int(os.environ.get("URLFILE_THREADS", "8"))
+#  Number of chunks fetched ahead of sequential reads when caching
+READAHEAD_CHUNKS = int(os.environ.get("URLFILE_READAHEAD", "2"))
+#  Size cap of the download cache in bytes, least recently used chunks are evicted first. 0 disables the cap
+CACHE_SIZE_LIMIT = int(os.environ.get("URLFILE_CACHE_LIMIT", str(10 * 1000 * 1000 * K)))
+
 
 def hash_256(link):
   hsh = str(sha256((link.split("?")[0]).encode('utf-8')).hexdigest())
@@ -23,25 +33,42 @@ class URLFileException(Exception):
 
 class URLFile:
   _tlocal = threading.local()
+  _pool: Optional[ThreadPoolExecutor] = None
+  _pool_lock = threading.Lock()
+  _inflight: Dict[str, Future] = {}
+  _download_cache = CacheSizeLimit(CACHE_SIZE_LIMIT)
 
-  def __init__(self, url, debug=False, cache=None):
+  def __init__(self, url, debug=False, cache=None, readahead=READAHEAD_CHUNKS):
     self._url = url
     self._pos = 0
     self._length = None
     self._local_file = None
     self._debug = debug
+    self._readahead = readahead
+    self._next_chunk = None
     #  True by default, false if FILEREADER_CACHE is defined, but can be overwritten by the cache input
     self._force_download = not int(os.environ.get("FILEREADER_CACHE", "0"))
     if cache is not None:
       self._force_download = not cache
 
-    try:
-      self._curl = self._tlocal.curl
-    except AttributeError:
-      self._curl = self._tlocal.curl = pycurl.Curl()
     if not self._force_download:
       mkdirs_exists_ok(Paths.download_cache_root())
 
+  @classmethod
+  def _get_curl(cls):
+    try:
+      return cls._tlocal.curl
+    except AttributeError:
+      cls._tlocal.curl = pycurl.Curl()
+      return cls._tlocal.curl
+
+  @classmethod
+  def _get_pool(cls) -> ThreadPoolExecutor:
+    with cls._pool_lock:
+      if cls._pool is None:
+        cls._pool = ThreadPoolExecutor(max_workers=DOWNLOAD_THREADS, thread_name_prefix="urlfile")
+      return cls._pool
+
   def __enter__(self):
     return self
 
@@ -53,7 +80,7 @@ class URLFile:
 
   @retry(wait=wait_random_exponential(multiplier=1, max=5), stop=stop_after_attempt(3), reraise=True)
   def get_length_online(self):
-    c = self._curl
+    c = self._get_curl()
     c.reset()
     c.setopt(pycurl.NOSIGNAL, 1)
     c.setopt(pycurl.TIMEOUT_MS, 500000)
@@ -82,6 +109,52 @@ class URLFile:
         file_length.write(str(self._length))
     return self._length
 
+  def _chunk_path(self, chunk):
+    # float chunk numbers are kept for compatibility with existing caches
+    file_name = hash_256(self._url) + "_" + str(float(chunk))
+    return os.path.join(Paths.download_cache_root(), file_name)
+
+  def _download_chunk(self, chunk, path):
+    try:
+      data = self._fetch(chunk * CHUNK_SIZE, min((chunk + 1) * CHUNK_SIZE, self.get_length()) - 1)
+      with atomic_write_in_dir(path, mode="wb", overwrite=True) as new_cached_file:
+        new_cached_file.write(data)
+      self._download_cache.add(Paths.download_cache_root(), len(data))
+      return data
+    finally:
+      with self._pool_lock:
+        self._inflight.pop(path, None)
+
+  def _get_chunk(self, chunk):
+    """Returns the chunk's data if it's cached, otherwise a future downloading it"""
+    path = self._chunk_path(chunk)
+    with self._pool_lock:
+      fut = self._inflight.get(path)
+    if fut is not None:
+      return fut
+
+    if os.path.exists(path):
+      try:
+        with open(path, "rb") as cached_file:
+          data = cached_file.read()
+        self._download_cache.touch(path)
+        return data
+      except FileNotFoundError:
+        # evicted in the meantime
+        pass
+
+    pool = self._get_pool()
+    with self._pool_lock:
+      fut = self._inflight.get(path)
+      if fut is None:
+        fut = self._inflight[path] = pool.submit(self._download_chunk, chunk, path)
+    return fut
+
+  def _prefetch(self, first_chunk, last_chunk):
+    for chunk in range(first_chunk, last_chunk + 1):
+      if not os.path.exists(self._chunk_path(chunk)):
+        self._get_chunk(chunk)
+
   def read(self, ll=None):
     if self._force_download:
       return self.read_aux(ll=ll)
@@ -89,35 +162,33 @@ class URLFile:
     file_begin = self._pos
     file_end = self._pos + ll if ll is not None else self.get_length()
     assert file_end != -1, f"Remote file is empty or doesn't exist: {self._url}"
-    #  We have to align with chunks we store. Position is the begginiing of the latest chunk that starts before or at our file
-    position = (file_begin // CHUNK_SIZE) * CHUNK_SIZE
-    response = b""
-    while True:
-      self._pos = position
-      chunk_number = self._pos / CHUNK_SIZE
-      file_name = hash_256(self._url) + "_" + str(chunk_number)
-      full_path = os.path.join(Paths.download_cache_root(), str(file_name))
-      data = None
-      #  If we don't have a file, download it
-      if not os.path.exists(full_path):
-        data = self.read_aux(ll=CHUNK_SIZE)
-        with atomic_write_in_dir(full_path, mode="wb") as new_cached_file:
-          new_cached_file.write(data)
-      else:
-        with open(full_path, "rb") as cached_file:
-          data = cached_file.read()
+    file_end = min(file_end, self.get_length())
+    if file_end <= file_begin:
+      return b""
 
-      response += data[max(0, file_begin - position): min(CHUNK_SIZE, file_end - position)]
+    #  We have to align with chunks we store, all missing chunks are downloaded concurrently
+    first_chunk = file_begin // CHUNK_SIZE
+    last_chunk = (file_end - 1) // CHUNK_SIZE
+    chunks = [self._get_chunk(c) for c in range(first_chunk, last_chunk + 1)]
 
-      position += CHUNK_SIZE
-      if position >= file_end:
-        self._pos = file_end
-        return response
+    #  Sequential access, fetch the following chunks in the background
+    if self._readahead > 0 and first_chunk in (self._next_chunk, 0):
+      last_file_chunk = (self.get_length() - 1) // CHUNK_SIZE
+      self._prefetch(last_chunk + 1, min(last_chunk + self._readahead, last_file_chunk))
+    self._next_chunk = last_chunk + 1 if file_end % CHUNK_SIZE == 0 else last_chunk
+
+    response = []
+    for chunk, data in zip(range(first_chunk, last_chunk + 1), chunks):
+      if isinstance(data, Future):
+        data = data.result()
+      position = chunk * CHUNK_SIZE
+      response.append(data[max(0, file_begin - position): min(CHUNK_SIZE, file_end - position)])
+
+    self._pos = file_end
+    return b"".join(response)
 
-  @retry(wait=wait_random_exponential(multiplier=1, max=5), stop=stop_after_attempt(3), reraise=True)
   def read_aux(self, ll=None):
-    download_range = False
-    headers = ["Connection: keep-alive"]
+    start, end = self._pos, None
     if self._pos != 0 or ll is not None:
       if ll is None:
         end = self.get_length() - 1
@@ -125,11 +196,28 @@ class URLFile:
         end = min(self._pos + ll, self.get_length()) - 1
       if self._pos >= end:
         return b""
-      headers.append(f"Range: bytes={self._pos}-{end}")
-      download_range = True
+
+    if end is not None and end - start + 1 > CHUNK_SIZE:
+      # split large ranges into concurrent requests
+      starts = range(start, end + 1, CHUNK_SIZE)
+      ends = [min(s + CHUNK_SIZE, end + 1) - 1 for s in starts]
+      ret = b"".join(self._get_pool().map(self._fetch, starts, ends))
+    else:
+      ret = self._fetch(start, end)
+
+    self._pos += len(ret)
+    return ret
+
+  @retry(wait=wait_random_exponential(multiplier=1, max=5), stop=stop_after_attempt(3), reraise=True)
+  def _fetch(self, start=0, end=None):
+    download_range = end is not None
+    headers = ["Connection: keep-alive"]
+    if download_range:
+      headers.append(f"Range: bytes={start}-{end}")
 
     dats = BytesIO()
-    c = self._curl
+    c = self._get_curl()
+    c.reset()
     c.setopt(pycurl.URL, self._url)
     c.setopt(pycurl.WRITEDATA, dats)
     c.setopt(pycurl.NOSIGNAL, 1)
@@ -168,9 +256,7 @@ class URLFile:
     if (not download_range) and response_code != 200:  # OK
       raise URLFileException(f"Error {response_code} {headers} ({self._url}): {repr(dats.getvalue())[:500]}")
 
-    ret = dats.getvalue()
-    self._pos += len(ret)
-    return ret
+    return dats.getvalue()
 
   def seek(self, pos):
     self._pos = pos
@@ -3,7 +3,9 @@ import argparse
 import os
 import struct
 from enum import IntEnum
-from typing import Tuple
+from typing import List, Optional, Tuple
+
+import numpy as np
 
 from openpilot.tools.lib.filereader import FileReader
 
@@ -121,30 +123,24 @@ class VideoFileInvalid(Exception):
   pass
 
 def get_ue(dat: bytes, start_idx: int, skip_bits: int) -> Tuple[int, int]:
-  prefix_val = 0
-  prefix_len = 0
-  suffix_val = 0
-  suffix_len = 0
-
-  i = start_idx
-  while i < len(dat):
-    j = 7
-    while j >= 0:
-      if skip_bits > 0:
-        skip_bits -= 1
-      elif prefix_val == 0:
-        prefix_val = (dat[i] >> j) & 1
-        prefix_len += 1
-      else:
-        suffix_val = (suffix_val << 1) | ((dat[i] >> j) & 1)
-        suffix_len += 1
-      j -= 1
-
-      if prefix_val == 1 and prefix_len - 1 == suffix_len:
-        val = 2**(prefix_len-1) - 1 + suffix_val
-        size = prefix_len + suffix_len
-        return val, size
-    i += 1
+  # read a window of bits as one integer and count the leading zeros of the exp-golomb prefix,
+  # widening the window for long codes
+  window = 8
+  while True:
+    end = min(start_idx + window, len(dat))
+    avail = 8 * (end - start_idx) - skip_bits
+    if avail <= 0:
+      break
+    bits = int.from_bytes(dat[start_idx:end], "big") & ((1 << avail) - 1)
+    leading_zeros = avail - bits.bit_length()
+    size = 2 * leading_zeros + 1
+    if bits and size <= avail:
+      # the code is 1 followed by leading_zeros suffix bits, its value minus one is the decoded value
+      val = (bits >> (avail - size)) - 1
+      return val, size
+    if end == len(dat):
+      break
+    window *= 2
 
   raise VideoFileInvalid("invalid exponential-golomb code")
 
@@ -259,38 +255,127 @@ def get_hevc_slice_type(dat: bytes, nal_unit_start: int, nal_unit_type: HevcNalU
     raise VideoFileInvalid("slice_type must be 0, 1, or 2")
   return slice_type, is_first_slice
 
-def hevc_index(hevc_file_name: str, allow_corrupt: bool=False) -> Tuple[list, int, bytes]:
-  with FileReader(hevc_file_name) as f:
-    dat = f.read()
-
-  if len(dat) < NAL_UNIT_START_CODE_SIZE + 1:
-    raise VideoFileInvalid("data is too short")
+def find_nal_unit_starts(dat, start: int = 0) -> List[int]:
+  """Indices of all NAL unit start codes in dat at or after start"""
+  # bytes.find is a memchr based scan, much faster than walking the data in python or
+  # comparing the whole buffer with numpy since 0x000001 is rare in entropy coded data
+  starts = []
+  pos = dat.find(NAL_UNIT_START_CODE, start)
+  while pos != -1:
+    starts.append(pos)
+    pos = dat.find(NAL_UNIT_START_CODE, pos + NAL_UNIT_START_CODE_SIZE)
+  return starts
+
+
+class HevcIndexer:
+  """Builds the frame index of a HEVC stream from data fed incrementally, e.g. of a file that's still being written.
+
+  Only the last, possibly incomplete, NAL unit is kept in memory between feeds.
+  """
+  def __init__(self, allow_corrupt: bool = False):
+    self.allow_corrupt = allow_corrupt
+    self.frame_types: List[Tuple[int, int]] = []
+    self.prefix_dat = b""
+    self.length = 0  # bytes fed so far
+
+    self._buf = b""
+    self._buf_offset = 0  # stream offset of _buf[0]
+    self._nal_start: Optional[int] = None  # start of the current NAL unit in _buf, None until the stream start is checked
+    self._scanned = 0  # _buf has been searched for start codes up to here
+    self._failed = False
+
+  def _process_nal_unit(self, i: int, nal_unit_len: int, frame_types, prefix_dat: bytes) -> bytes:
+    nal_unit_type = get_hevc_nal_unit_type(self._buf, i)
+    if nal_unit_type in HEVC_PARAMETER_SET_NAL_UNITS:
+      prefix_dat += bytes(self._buf[i:i+nal_unit_len])
+    elif nal_unit_type in HEVC_CODED_SLICE_SEGMENT_NAL_UNITS:
+      slice_type, is_first_slice = get_hevc_slice_type(self._buf, i, nal_unit_type)
+      if is_first_slice:
+        frame_types.append((slice_type, self._buf_offset + i))
+    return prefix_dat
+
+  def _select_nal_units(self, positions: List[int]) -> List[int]:
+    # parameter sets and first slices of a picture are the only NAL units that matter, filter with
+    # their headers in bulk so only those go through the parsing below
+    if not len(positions):
+      return []
+    arr = np.frombuffer(self._buf, dtype=np.uint8)
+    pos = np.array(positions)
+    nal_unit_types = (arr[pos + NAL_UNIT_START_CODE_SIZE] >> 1) & 0x3F
+    is_first_slice = (arr[pos + NAL_UNIT_START_CODE_SIZE + NAL_UNIT_HEADER_SIZE] >> 7) == 1
+    keep = np.isin(nal_unit_types, HEVC_PARAMETER_SET_NAL_UNITS) | \
+           (np.isin(nal_unit_types, HEVC_CODED_SLICE_SEGMENT_NAL_UNITS) & is_first_slice)
+    return np.flatnonzero(keep).tolist()
+
+  def _error(self, e: Exception, i: int) -> None:
+    self._failed = True
+    if not self.allow_corrupt:
+      raise e
+    print(f"ERROR: NAL unit skipped @ {self._buf_offset + i}\n", str(e))
+
+  def feed(self, dat: bytes) -> None:
+    if self._failed or not len(dat):
+      return
+    # concatenating bytes only copies the leftover NAL unit when the buffer isn't empty
+    self._buf = self._buf + bytes(dat) if len(self._buf) else bytes(dat)
+    self.length += len(dat)
+
+    i = self._nal_start or 0
+    try:
+      if self._nal_start is None:
+        if len(self._buf) < NAL_UNIT_START_CODE_SIZE + 1:
+          return
+        if self._buf[0] != 0x00:
+          raise VideoFileInvalid("first byte must be 0x00")
+        require_nal_unit_start(self._buf, 1)
+        i = self._nal_start = 1 # skip past first byte 0x00
+
+      # NAL units end where the next start code begins, which can straddle the previous feed
+      starts = find_nal_unit_starts(self._buf, max(self._scanned - 2, i + NAL_UNIT_START_CODE_SIZE))
+      self._scanned = len(self._buf)
+      bounds = [i] + starts
+      for j in self._select_nal_units(bounds[:-1]):
+        i = bounds[j]
+        self.prefix_dat = self._process_nal_unit(i, bounds[j+1] - i, self.frame_types, self.prefix_dat)
+      i = bounds[-1]
+    except Exception as e:
+      self._error(e, i)
+
+    # only keep the unfinished NAL unit
+    self._buf = self._buf[i:]
+    self._buf_offset += i
+    self._scanned = max(self._scanned - i, 0)
+    if self._nal_start is not None:
+      self._nal_start = 0
+
+  def finish(self) -> Tuple[list, int, bytes]:
+    """Index of all data fed so far, treating its end as the end of the stream"""
+    if self.length < NAL_UNIT_START_CODE_SIZE + 1:
+      raise VideoFileInvalid("data is too short")
+
+    frame_types = list(self.frame_types)
+    prefix_dat = self.prefix_dat
+    if not self._failed and self._nal_start is not None:
+      try:
+        prefix_dat = self._process_nal_unit(self._nal_start, len(self._buf) - self._nal_start, frame_types, prefix_dat)
+      except Exception as e:
+        if not self.allow_corrupt:
+          raise
+        print(f"ERROR: NAL unit skipped @ {self._buf_offset + self._nal_start}\n", str(e))
+
+    return frame_types, self.length, prefix_dat
+
+  def feed_file(self, f) -> None:
+    """Feeds the data appended to the file since the last call"""
+    f.seek(self.length)
+    self.feed(f.read())
 
-  if dat[0] != 0x00:
-    raise VideoFileInvalid("first byte must be 0x00")
 
-  prefix_dat = b""
-  frame_types = list()
-
-  i = 1 # skip past first byte 0x00
-  try:
-    while i < len(dat):
-      require_nal_unit_start(dat, i)
-      nal_unit_len = get_hevc_nal_unit_length(dat, i)
-      nal_unit_type = get_hevc_nal_unit_type(dat, i)
-      if nal_unit_type in HEVC_PARAMETER_SET_NAL_UNITS:
-        prefix_dat += dat[i:i+nal_unit_len]
-      elif nal_unit_type in HEVC_CODED_SLICE_SEGMENT_NAL_UNITS:
-        slice_type, is_first_slice = get_hevc_slice_type(dat, i, nal_unit_type)
-        if is_first_slice:
-          frame_types.append((slice_type, i))
-      i += nal_unit_len
-  except Exception as e:
-    if not allow_corrupt:
-      raise
-    print(f"ERROR: NAL unit skipped @ {i}\n", str(e))
-
-  return frame_types, len(dat), prefix_dat
+def hevc_index(hevc_file_name: str, allow_corrupt: bool=False) -> Tuple[list, int, bytes]:
+  indexer = HevcIndexer(allow_corrupt)
+  with FileReader(hevc_file_name) as f:
+    indexer.feed(f.read())
+  return indexer.finish()
 
 def main() -> None:
   parser = argparse.ArgumentParser()